@@ -3,3 +3,12 @@ from django.apps import AppConfig
 
 class ApiConfig(AppConfig):
     name = 'api'
+
+    def ready(self):
+        from django.core.signals import request_started
+
+        from .db.pool import check_persistent_connections
+        from .signals import connect_signals
+
+        connect_signals()
+        request_started.connect(check_persistent_connections)
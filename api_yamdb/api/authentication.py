@@ -0,0 +1,111 @@
+"""JWT-аутентификация без запроса к базе на каждый вызов.
+
+Токен доступа содержит id, username, роль, признак активности
+пользователя и штамп его последнего изменения. Пока штамп в кеше
+совпадает со штампом в токене, пользователь собирается из claims.
+После изменения пользователя (например, смены роли через UserViewset)
+штамп в кеше меняется, и роль берётся из короткоживущего кеша
+пользователя или из базы. Если штампа в кеше нет (вытеснен,
+перезапуск, другой воркер с локальным кешем), claims не принимаются.
+
+При нескольких воркерах кеш должен быть общим (см. CACHE_BACKEND).
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import (AuthenticationFailed,
+                                                 InvalidToken)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .routers import reads_from_replica
+
+User = get_user_model()
+
+USER_CLAIMS = ('username', 'role', 'is_superuser', 'is_active')
+STAMP_CLAIM = 'auth_stamp'
+STAMP_KEY = 'yamdb:auth:stamp:{}'
+USER_KEY = 'yamdb:auth:user:{}'
+
+
+def get_user_stamp(user_id):
+    """Штамп пользователя или None, если его нет в кеше."""
+    return cache.get(STAMP_KEY.format(user_id))
+
+
+def get_stamp_timeout():
+    return api_settings.ACCESS_TOKEN_LIFETIME.total_seconds()
+
+
+def mark_user_changed(user_id):
+    """Отзывает claims выданных токенов и сбрасывает кеш пользователя."""
+    cache.set(
+        STAMP_KEY.format(user_id), time.time(), timeout=get_stamp_timeout())
+    cache.delete(USER_KEY.format(user_id))
+
+
+def get_access_token(user):
+    token = AccessToken.for_user(user)
+    for claim in USER_CLAIMS:
+        token[claim] = getattr(user, claim)
+    # Новый штамп, если в кеше его нет: токены, выданные до
+    # вытеснения, с ним не совпадут.
+    cache.add(
+        STAMP_KEY.format(user.pk), time.time(), timeout=get_stamp_timeout())
+    token[STAMP_CLAIM] = get_user_stamp(user.pk)
+    return token
+
+
+def build_user(user_id, state):
+    """Собирает пользователя без обращения к базе.
+
+    Заполнены только id, username, role, is_superuser и is_active:
+    объект годится для проверки прав и как значение внешнего ключа,
+    но для чтения или изменения профиля пользователя нужно загрузить
+    из базы.
+    """
+    user = User(pk=user_id, **state)
+    user._state.adding = False
+    return user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWT-аутентификация по claims токена с кешем пользователя."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(
+                'Token contained no recognizable user identification')
+
+        claims = validated_token.payload
+        stamp = get_user_stamp(user_id)
+        if (stamp is not None and claims.get(STAMP_CLAIM) == stamp
+                and all(claim in claims for claim in USER_CLAIMS)):
+            state = {claim: claims[claim] for claim in USER_CLAIMS}
+            return self.check_active(build_user(user_id, state))
+
+        key = USER_KEY.format(user_id)
+        state = cache.get(key)
+        if state is None:
+            user = super().get_user(validated_token)
+            state = {
+                claim: getattr(user, claim) for claim in USER_CLAIMS
+            }
+            # Отставшая реплика вернула бы состояние до изменения,
+            # которое mark_user_changed только что сбросил.
+            if not reads_from_replica():
+                cache.set(
+                    key, state, timeout=settings.AUTH_USER_CACHE_TIMEOUT)
+        return self.check_active(build_user(user_id, state))
+
+    def check_active(self, user):
+        # Скрытые до удаления пользователи тоже неактивны.
+        if not user.is_active:
+            raise AuthenticationFailed(
+                'User is inactive', code='user_inactive')
+        return user
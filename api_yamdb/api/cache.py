@@ -0,0 +1,123 @@
+"""Версионированный кеш ответов API.
+
+У каждого ресурса (titles, genres, ...) есть номер версии в кеше.
+Ключ закешированного ответа включает версию, поэтому для инвалидации
+достаточно увеличить номер: старые записи перестают читаться
+и вытесняются по таймауту.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+
+from .routers import reads_from_replica
+
+VERSION_KEY = 'yamdb:version:{}'
+RESPONSE_KEY = 'yamdb:response:{}:{}:{}'
+QUERY_KEY = 'yamdb:query:{}:{}:{}'
+
+# Строки небольших справочников в памяти процесса:
+# model -> (версия, время загрузки, строки).
+_slug_tables = {}
+
+
+def _initial_version():
+    # Версия, пересозданная после вытеснения из кеша, не должна
+    # совпасть с одной из прежних, поэтому отсчёт идёт от времени.
+    return int(time.time() * 1000)
+
+
+def get_version(resource):
+    key = VERSION_KEY.format(resource)
+    version = cache.get(key)
+    if version is not None:
+        return version
+    cache.add(key, _initial_version(), timeout=None)
+    return cache.get(key)
+
+
+def incr_version(resource):
+    """Увеличивает версию ресурса и возвращает новую.
+
+    None — версии не было в кеше, и она создана заново.
+    """
+    key = VERSION_KEY.format(resource)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, _initial_version(), timeout=None)
+        return None
+
+
+def bump_version(*resources):
+    for resource in resources:
+        incr_version(resource)
+
+
+def bump_version_on_commit(*resources):
+    """Меняет версию сразу и ещё раз после фиксации транзакции.
+
+    Второе изменение не даёт закешировать данные, прочитанные
+    параллельным запросом до фиксации.
+    """
+    bump_version(*resources)
+    transaction.on_commit(lambda: bump_version(*resources))
+
+
+def get_response_cache_key(resource, request):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return RESPONSE_KEY.format(resource, get_version(resource), path)
+
+
+def get_query_cache_key(prefix, resources, queryset):
+    """Ключ значения, посчитанного по SQL-запросу queryset.
+
+    Включает версии ресурсов, от которых зависит результат, поэтому
+    запись в них делает значение недействительным.
+    """
+    sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+    query = hashlib.md5(repr((sql, params)).encode()).hexdigest()
+    versions = '.'.join(str(get_version(resource)) for resource in resources)
+    return QUERY_KEY.format(prefix, versions, query)
+
+
+def get_cached_response_data(key):
+    return cache.get(key)
+
+
+def set_cached_response_data(key, data):
+    # Ключ содержит текущую версию, а реплика могла не получить
+    # последнюю запись: такие данные жили бы в кеше до следующей.
+    if not reads_from_replica():
+        cache.set(key, data, timeout=settings.RESPONSE_CACHE_TIMEOUT)
+
+
+def get_slug_objects(model, resource, slugs):
+    """Объекты справочника по slug без запроса к базе.
+
+    Таблица целиком хранится в памяти процесса и перечитывается одним
+    запросом, когда версия ресурса изменилась или прошло
+    SLUG_TABLE_TIMEOUT секунд. Версию меняют сигналы записи в справочник
+    и load_from_csv, поэтому при общем кеше копии в остальных воркерах
+    тоже сбрасываются, а таймаут ограничивает отставание, когда версия
+    до воркера не доходит.
+    """
+    names = [field.attname for field in model._meta.concrete_fields]
+    version = get_version(resource)
+    now = time.monotonic()
+    cached = _slug_tables.get(model)
+    if (cached is None or cached[0] != version
+            or now - cached[1] > settings.SLUG_TABLE_TIMEOUT):
+        slug_index = names.index('slug')
+        cached = _slug_tables[model] = (version, now, {
+            row[slug_index]: row
+            for row in model.objects.order_by().values_list(*names)
+        })
+    rows = cached[2]
+    db = router.db_for_read(model)
+    return {
+        slug: model.from_db(db, names, rows[slug])
+        for slug in slugs if slug in rows
+    }
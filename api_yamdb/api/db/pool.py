@@ -0,0 +1,228 @@
+"""Пул соединений с базой данных внутри процесса.
+
+Бэкенды api.db.postgresql и api.db.sqlite3 берут соединения из пула
+вместо открытия нового и возвращают их туда при закрытии, поэтому
+потоки воркера переиспользуют соединения между запросами. Перед выдачей
+соединение проверяется запросом SELECT 1, соединения старше MAX_AGE
+пересоздаются. Параметры пула задаются ключом POOL в DATABASES.
+"""
+import os
+import threading
+import time
+from collections import Counter
+
+from django.db import connections
+from django.db.utils import OperationalError
+
+from ..metrics import registry
+
+# Ключи POOL в настройках базы и значения по умолчанию.
+POOL_DEFAULTS = {
+    'SIZE': 10,
+    'TIMEOUT': 10,
+    'MAX_AGE': 1800,
+    'CHECK_AFTER': 0,
+}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(OperationalError):
+    """Свободное соединение не появилось за TIMEOUT секунд."""
+
+
+def is_usable(connection):
+    try:
+        cursor = connection.cursor()
+        try:
+            cursor.execute('SELECT 1')
+        finally:
+            cursor.close()
+        connection.rollback()
+    except Exception:
+        return False
+    return True
+
+
+def close_quietly(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+class ConnectionPool:
+    """Пул соединений одной базы.
+
+    connect открывает новое соединение DB-API. Одновременно открыто
+    не больше size соединений, остальные потоки ждут до timeout секунд.
+    Простаивавшее дольше check_after секунд соединение проверяется
+    перед выдачей.
+    """
+
+    def __init__(self, connect, size, timeout, max_age, check_after):
+        self.connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.max_age = max_age
+        self.check_after = check_after
+        self.condition = threading.Condition()
+        # (соединение, время возврата), последнее возвращённое — в конце.
+        self.idle = []
+        self.created = {}
+        self.opened = 0
+        self.events = Counter()
+        self.pid = os.getpid()
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            entry = self._take(deadline)
+            if entry is None:
+                return self._open()
+            connection, released = entry
+            now = time.monotonic()
+            if now - self.created[connection] > self.max_age:
+                self.discard(connection, 'expired')
+            elif (now - released >= self.check_after
+                    and not is_usable(connection)):
+                self.discard(connection, 'unhealthy')
+            else:
+                self.events['reused'] += 1
+                return connection
+
+    def _take(self, deadline):
+        with self.condition:
+            while True:
+                if self.idle:
+                    return self.idle.pop()
+                if self.opened < self.size:
+                    self.opened += 1
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.events['timeout'] += 1
+                    raise PoolTimeout(
+                        f'Нет свободного соединения за {self.timeout} с')
+                self.events['wait'] += 1
+                self.condition.wait(remaining)
+
+    def _open(self):
+        try:
+            connection = self.connect()
+        except Exception:
+            with self.condition:
+                self.opened -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.created[connection] = time.monotonic()
+            self.events['created'] += 1
+        return connection
+
+    def release(self, connection):
+        try:
+            # Незавершённая транзакция не должна достаться другому потоку.
+            connection.rollback()
+        except Exception:
+            self.discard(connection, 'broken')
+            return
+        with self.condition:
+            self.idle.append((connection, time.monotonic()))
+            self.condition.notify()
+
+    def discard(self, connection, reason):
+        close_quietly(connection)
+        with self.condition:
+            self.created.pop(connection, None)
+            self.opened -= 1
+            self.events[reason] += 1
+            self.condition.notify()
+
+    def close(self):
+        with self.condition:
+            idle, self.idle = self.idle, []
+        for connection, _ in idle:
+            self.discard(connection, 'closed')
+
+    def stats(self):
+        with self.condition:
+            return {
+                'size': self.size,
+                'opened': self.opened,
+                'idle': len(self.idle),
+                'in_use': self.opened - len(self.idle),
+                **self.events,
+            }
+
+
+def get_pool(alias, connect, options):
+    """Пул базы alias в текущем процессе, создаётся при первом вызове."""
+    with _pools_lock:
+        pool = _pools.get(alias)
+        # После fork соединения родителя не переиспользуются.
+        if pool is None or pool.pid != os.getpid():
+            options = {**POOL_DEFAULTS, **options}
+            _pools[alias] = ConnectionPool(
+                connect, size=options['SIZE'], timeout=options['TIMEOUT'],
+                max_age=options['MAX_AGE'],
+                check_after=options['CHECK_AFTER'])
+        return _pools[alias]
+
+
+def get_pool_stats():
+    """Статистика пулов процесса: alias -> словарь счётчиков."""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {alias: pool.stats() for alias, pool in pools.items()}
+
+
+def pool_samples():
+    for alias, stats in get_pool_stats().items():
+        for state in ('idle', 'in_use'):
+            yield ('yamdb_db_pool_connections',
+                   (('database', alias), ('state', state)), stats[state])
+        for event in ('created', 'reused', 'expired', 'unhealthy', 'broken',
+                      'wait', 'timeout'):
+            yield ('yamdb_db_pool_events_total',
+                   (('database', alias), ('event', event)),
+                   stats.get(event, 0))
+
+
+registry.collectors.append(pool_samples)
+
+
+class PooledDatabaseWrapperMixin:
+    """Подмешивается к DatabaseWrapper бэкенда Django."""
+
+    def get_new_connection(self, conn_params):
+        parent = super()
+        self.pool = get_pool(
+            self.alias, lambda: parent.get_new_connection(conn_params),
+            self.settings_dict.get('POOL', {}))
+        return self.pool.acquire()
+
+    def _close(self):
+        if self.connection is None:
+            return
+        if self.in_atomic_block:
+            # Обёртка сохранит ссылку на соединение, в пул его не вернуть.
+            self.pool.discard(self.connection, 'broken')
+        else:
+            self.pool.release(self.connection)
+
+
+def check_persistent_connections(**kwargs):
+    """Закрывает неработающие постоянные соединения перед запросом.
+
+    Включается ключом CONN_HEALTH_CHECKS настроек базы, соединения
+    из пула проверяются самим пулом.
+    """
+    for connection in connections.all():
+        if (connection.connection is not None
+                and connection.settings_dict.get('CONN_HEALTH_CHECKS')
+                and connection.settings_dict['CONN_MAX_AGE'] != 0
+                and not connection.in_atomic_block
+                and not connection.is_usable()):
+            connection.close()
@@ -0,0 +1,306 @@
+"""Фасетный индекс произведений в памяти процесса.
+
+Для каждого жанра, категории и года хранится битовая карта — целое
+число, в котором бит n установлен у произведения с id n. Фильтры по
+нескольким жанрам и диапазону лет и числа объектов по фасетам
+считаются операциями & и | без запросов к базе.
+
+Сигналы записи меняют индекс своего процесса после фиксации транзакции
+и увеличивают версию INDEX_RESOURCE в кеше. Индекс, отставший больше
+чем на одно изменение (запись в другом процессе, массовая операция),
+перестраивается двумя запросами при следующем обращении. Версия
+в кеше видна только процессам с общим кешем, поэтому индекс старше
+TITLE_FACET_INDEX_MAX_AGE секунд тоже перестраивается.
+"""
+import threading
+import time
+from collections import defaultdict
+from functools import reduce
+from itertools import islice
+from operator import and_, or_
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from reviews.models import Category, Genre, GenresTitle, Title
+from .cache import get_version, incr_version
+
+INDEX_RESOURCE = 'title-index'
+
+
+def popcount(bitmap):
+    return bin(bitmap).count('1')
+
+
+def to_bitmap(ids):
+    ids = list(ids)
+    if not ids:
+        return 0
+    # Сборка через bytearray линейна, а | по одному биту — квадратична.
+    buffer = bytearray(max(ids) // 8 + 1)
+    for pk in ids:
+        buffer[pk >> 3] |= 1 << (pk & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+def iter_ids(bitmap, start=0):
+    """id из битовой карты по возрастанию, начиная с бита start."""
+    bitmap >>= start
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')
+    for index, byte in enumerate(data):
+        while byte:
+            low = byte & -byte
+            yield start + index * 8 + low.bit_length() - 1
+            byte ^= low
+
+
+def nth_bit(bitmap, n):
+    """Номер n-го (с нуля) установленного бита."""
+    low, high = 0, bitmap.bit_length()
+    while low < high:
+        middle = (low + high) // 2
+        if popcount(bitmap & ((2 << middle) - 1)) > n:
+            high = middle
+        else:
+            low = middle + 1
+    return low
+
+
+class BitmapIds:
+    """id выборки по возрастанию как последовательность для пагинатора."""
+
+    def __init__(self, bitmap):
+        self.bitmap = bitmap
+        self.length = popcount(bitmap)
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        return iter_ids(self.bitmap)
+
+    def __getitem__(self, item):
+        start, stop, _ = item.indices(self.length)
+        if start >= stop:
+            return []
+        return list(islice(
+            iter_ids(self.bitmap, nth_bit(self.bitmap, start)),
+            stop - start))
+
+
+def clear_bit(bitmaps, bit):
+    for key, bitmap in bitmaps.items():
+        if bitmap & bit:
+            bitmaps[key] = bitmap & ~bit
+
+
+def count_by(bitmap, bitmaps, labels):
+    counts = {}
+    for key, label in sorted(labels.items(), key=lambda item: item[1]):
+        count = popcount(bitmap & bitmaps.get(key, 0))
+        if count:
+            counts[label] = count
+    return counts
+
+
+class TitleIndex:
+    """Битовые карты видимых произведений по жанрам, категориям и годам.
+
+    Карты жанров хранят и скрытые произведения, результат выборки
+    всегда ограничивается картой titles.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.version = None
+        self.built_at = None
+        self.titles = 0
+        self.genres = {}
+        self.categories = {}
+        self.years = {}
+        self.genre_ids = {}
+        self.category_ids = {}
+
+    def build(self):
+        # Версия читается до данных: запись, зафиксированная между
+        # ними, сменит версию, и индекс перестроится ещё раз. Данные
+        # читаются из основной базы: отставшая реплика получила бы
+        # текущую версию.
+        version = get_version(INDEX_RESOURCE)
+        started = time.monotonic()
+        titles, categories, years = [], defaultdict(list), defaultdict(list)
+        for pk, category_id, year in Title.objects.using(
+            DEFAULT_DB_ALIAS
+        ).visible().order_by().values_list('pk', 'category_id', 'year'):
+            titles.append(pk)
+            years[year].append(pk)
+            if category_id is not None:
+                categories[category_id].append(pk)
+        genres = defaultdict(list)
+        for title_id, genre_id in GenresTitle.objects.using(
+            DEFAULT_DB_ALIAS
+        ).filter(genre__isnull=False).order_by().values_list(
+                'title_id', 'genre_id'):
+            genres[genre_id].append(title_id)
+        self.genre_ids = dict(Genre.objects.using(
+            DEFAULT_DB_ALIAS).values_list('slug', 'pk'))
+        self.category_ids = dict(Category.objects.using(
+            DEFAULT_DB_ALIAS).values_list('slug', 'pk'))
+        self.titles = to_bitmap(titles)
+        self.genres = {key: to_bitmap(ids) for key, ids in genres.items()}
+        self.categories = {
+            key: to_bitmap(ids) for key, ids in categories.items()}
+        self.years = {key: to_bitmap(ids) for key, ids in years.items()}
+        self.version = version
+        self.built_at = started
+
+    def refresh(self):
+        """Перестраивает индекс, если версия в кеше изменилась
+        или он построен больше TITLE_FACET_INDEX_MAX_AGE секунд назад.
+        """
+        with self.lock:
+            if (self.version != get_version(INDEX_RESOURCE)
+                    or time.monotonic() - self.built_at
+                    > settings.TITLE_FACET_INDEX_MAX_AGE):
+                self.build()
+
+    def select(self, genres=(), genre_mode='or', categories=(), year=None,
+               year_min=None, year_max=None):
+        """Битовая карта произведений, подходящих под все условия.
+
+        genre_mode: or — есть любой из жанров, and — есть все.
+        """
+        with self.lock:
+            result = self.titles
+            if genres:
+                result &= reduce(and_ if genre_mode == 'and' else or_, [
+                    self.genres.get(self.genre_ids.get(slug), 0)
+                    for slug in genres
+                ])
+            if categories:
+                result &= reduce(or_, [
+                    self.categories.get(self.category_ids.get(slug), 0)
+                    for slug in categories
+                ])
+            if year is not None:
+                result &= self.years.get(year, 0)
+            if year_min is not None or year_max is not None:
+                result &= reduce(or_, [
+                    bitmap for key, bitmap in self.years.items()
+                    if (year_min is None or key >= year_min)
+                    and (year_max is None or key <= year_max)
+                ], 0)
+            return result
+
+    def facets(self, bitmap):
+        """Число произведений выборки по каждому жанру, категории и году."""
+        with self.lock:
+            bitmap &= self.titles
+            return {
+                'genre': count_by(bitmap, self.genres, {
+                    pk: slug for slug, pk in self.genre_ids.items()}),
+                'category': count_by(bitmap, self.categories, {
+                    pk: slug for slug, pk in self.category_ids.items()}),
+                'year': count_by(bitmap, self.years, {
+                    year: str(year) for year in self.years}),
+            }
+
+    def put_title(self, pk, category_id, year, is_hidden):
+        bit = 1 << pk
+        self.titles &= ~bit
+        clear_bit(self.categories, bit)
+        clear_bit(self.years, bit)
+        if is_hidden:
+            return
+        self.titles |= bit
+        self.years[year] = self.years.get(year, 0) | bit
+        if category_id is not None:
+            self.categories[category_id] = (
+                self.categories.get(category_id, 0) | bit)
+
+    def remove_title(self, pk):
+        self.put_title(pk, None, None, True)
+        clear_bit(self.genres, 1 << pk)
+
+    def clear_title_genres(self, pk):
+        clear_bit(self.genres, 1 << pk)
+
+    def clear_genre(self, genre_id):
+        self.genres.pop(genre_id, None)
+
+    def link_genres(self, pairs, linked):
+        for title_id, genre_id in pairs:
+            bit = 1 << title_id
+            bitmap = self.genres.get(genre_id, 0)
+            self.genres[genre_id] = bitmap | bit if linked else bitmap & ~bit
+
+    def apply(self, change=None, *args):
+        """Применяет change(*args) и увеличивает версию индекса.
+
+        Если версия в кеше ушла вперёд не только из-за этого изменения
+        или change не задан, индекс помечается устаревшим.
+        """
+        with self.lock:
+            version = incr_version(INDEX_RESOURCE)
+            if (change is None or self.version is None or version is None
+                    or version != self.version + 1):
+                self.version = None
+                return
+            change(*args)
+            self.version = version
+
+    def apply_on_commit(self, change=None, *args):
+        transaction.on_commit(lambda: self.apply(change, *args))
+
+
+title_index = TitleIndex()
+
+
+def index_title_saved(sender, instance, **kwargs):
+    title_index.apply_on_commit(
+        title_index.put_title, instance.pk, instance.category_id,
+        int(instance.year), instance.is_hidden)
+
+
+def index_title_deleted(sender, instance, **kwargs):
+    title_index.apply_on_commit(title_index.remove_title, instance.pk)
+
+
+def index_genre_link_saved(sender, instance, created, **kwargs):
+    if created and instance.genre_id is not None:
+        title_index.apply_on_commit(
+            title_index.link_genres,
+            [(instance.title_id, instance.genre_id)], True)
+    else:
+        # Прежний жанр связи неизвестен.
+        title_index.apply_on_commit()
+
+
+def index_genre_link_deleted(sender, instance, **kwargs):
+    if instance.genre_id is not None:
+        title_index.apply_on_commit(
+            title_index.link_genres,
+            [(instance.title_id, instance.genre_id)], False)
+
+
+def index_genres_changed(sender, instance, action, reverse, pk_set,
+                         **kwargs):
+    if action == 'post_clear':
+        if reverse:
+            title_index.apply_on_commit(
+                title_index.clear_genre, instance.pk)
+        else:
+            title_index.apply_on_commit(
+                title_index.clear_title_genres, instance.pk)
+    elif action in ('post_add', 'post_remove'):
+        pairs = [
+            (pk, instance.pk) if reverse else (instance.pk, pk)
+            for pk in pk_set
+        ]
+        title_index.apply_on_commit(
+            title_index.link_genres, pairs, action == 'post_add')
+
+
+def invalidate_title_index(sender=None, **kwargs):
+    """Сбрасывает индекс после изменений, которые он не отслеживает."""
+    title_index.apply_on_commit()
@@ -1,14 +1,82 @@
 import django_filters
+from rest_framework import filters
 
-from reviews.models import Title
+from reviews.models import GenresTitle, Title
+from reviews.search import search_titles
+
+
+def split_slugs(value):
+    return [slug for slug in (part.strip() for part in value.split(','))
+            if slug]
 
 
 class TitleFilter(django_filters.FilterSet):
-    """Фильтр для Произведений"""
-    category = django_filters.CharFilter(field_name='category__slug')
-    genre = django_filters.CharFilter(field_name='genre__slug')
+    """Фильтр для Произведений
+
+    genre и category принимают несколько slug через запятую. Жанры
+    объединяются по genre_mode: or — любой из жанров, and — все сразу.
+    """
+    category = django_filters.CharFilter(method='filter_category')
+    genre = django_filters.CharFilter(method='filter_genre')
+    genre_mode = django_filters.ChoiceFilter(
+        choices=(('or', 'or'), ('and', 'and')), method='filter_nothing')
     name = django_filters.CharFilter(field_name='name', lookup_expr='contains')
+    year_min = django_filters.NumberFilter(
+        field_name='year', lookup_expr='gte')
+    year_max = django_filters.NumberFilter(
+        field_name='year', lookup_expr='lte')
 
     class Meta:
         model = Title
         fields = ('genre', 'category', 'name', 'year')
+
+    def filter_category(self, queryset, name, value):
+        slugs = split_slugs(value)
+        if not slugs:
+            return queryset
+        return queryset.filter(category__slug__in=slugs)
+
+    def filter_genre(self, queryset, name, value):
+        slugs = split_slugs(value)
+        links = GenresTitle.objects.values('title_id')
+        if self.form.cleaned_data.get('genre_mode') == 'and':
+            for slug in slugs:
+                queryset = queryset.filter(
+                    pk__in=links.filter(genre__slug=slug))
+            return queryset
+        if not slugs:
+            return queryset
+        return queryset.filter(pk__in=links.filter(genre__slug__in=slugs))
+
+    def filter_nothing(self, queryset, name, value):
+        return queryset
+
+    def get_index_criteria(self):
+        """Условия для TitleIndex.select, None — фильтр не по индексу."""
+        data = self.form.cleaned_data
+        if data.get('name'):
+            return None
+        criteria = {
+            'genres': split_slugs(data.get('genre') or ''),
+            'genre_mode': data.get('genre_mode'),
+            'categories': split_slugs(data.get('category') or ''),
+            'year': data.get('year'),
+            'year_min': data.get('year_min'),
+            'year_max': data.get('year_max'),
+        }
+        return {
+            key: value for key, value in criteria.items()
+            if value not in (None, '', [])
+        }
+
+
+class TitleSearchFilter(filters.BaseFilterBackend):
+    """Полнотекстовый поиск по произведениям с ранжированием."""
+
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        return search_titles(queryset, query)
@@ -0,0 +1,240 @@
+"""Метрики запросов в формате Prometheus.
+
+Каждый процесс копит метрики в памяти и не чаще раза в
+METRICS_FLUSH_INTERVAL секунд сбрасывает их в свой файл в METRICS_DIR.
+Эндпоинт /metrics складывает файлы всех процессов, поэтому метрики
+агрегируются по воркерам gunicorn без внешнего сервиса.
+"""
+import atexit
+import glob
+import json
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Имя -> (тип, описание, границы корзин гистограммы).
+METRICS = {
+    'yamdb_requests_total': (
+        'counter', 'Количество запросов', None),
+    'yamdb_request_duration_seconds': (
+        'histogram', 'Время обработки запроса', DURATION_BUCKETS),
+    'yamdb_response_size_bytes': (
+        'histogram', 'Размер тела ответа', SIZE_BUCKETS),
+    'yamdb_db_queries': (
+        'histogram', 'Количество SQL-запросов на запрос', QUERY_BUCKETS),
+    'yamdb_db_pool_connections': (
+        'gauge', 'Соединения пула базы данных', None),
+    'yamdb_db_pool_events_total': (
+        'counter', 'События пула соединений', None),
+}
+
+
+class Registry:
+    """Метрики процесса в памяти."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.last_flush = 0.0
+        # Функции, которые при сбросе отдают текущие значения
+        # (имя, метки, значение), например статистику пула соединений.
+        self.collectors = []
+
+    def inc(self, name, labels, value=1):
+        key = (name, labels)
+        with self.lock:
+            self.samples[key] = self.samples.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = (name, labels)
+        with self.lock:
+            sample = self.samples.get(key)
+            if sample is None:
+                # Счётчики по корзинам (последняя — +Inf), сумма.
+                sample = self.samples[key] = [0] * (len(buckets) + 1) + [0]
+            sample[bisect_left(buckets, value)] += 1
+            sample[-1] += value
+
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+
+    def path(self):
+        return os.path.join(
+            settings.METRICS_DIR, f'metrics-{os.getpid()}.json')
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        interval = settings.METRICS_FLUSH_INTERVAL
+        if not force and now - self.last_flush < interval:
+            return
+        self.last_flush = now
+        with self.lock:
+            data = [
+                [name, list(labels), value]
+                for (name, labels), value in self.samples.items()
+            ]
+        for collector in self.collectors:
+            data.extend(
+                [name, list(labels), value]
+                for name, labels, value in collector())
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        path = self.path()
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(data, file)
+        os.replace(temporary, path)
+
+
+registry = Registry()
+
+
+def process_alive(path):
+    pid = os.path.basename(path)[len('metrics-'):-len('.json')]
+    try:
+        os.kill(int(pid), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect():
+    """Сумма метрик всех процессов из METRICS_DIR."""
+    registry.flush(force=True)
+    totals = {}
+    pattern = os.path.join(settings.METRICS_DIR, 'metrics-*.json')
+    for path in glob.glob(pattern):
+        alive = process_alive(path)
+        try:
+            with open(path, encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            continue
+        for name, labels, value in data:
+            # Значения gauge завершившихся процессов устарели.
+            if name not in METRICS or (
+                    METRICS[name][0] == 'gauge' and not alive):
+                continue
+            key = (name, tuple(tuple(pair) for pair in labels))
+            if isinstance(value, list):
+                total = totals.setdefault(key, [0] * len(value))
+                totals[key] = [a + b for a, b in zip(total, value)]
+            else:
+                totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def format_labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', r'\\').replace('"', r'\"'))
+        for name, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def format_bound(bound):
+    return '+Inf' if math.isinf(bound) else repr(float(bound))
+
+
+def render(totals):
+    lines = []
+    for name, (kind, description, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        for (sample_name, labels), value in sorted(totals.items()):
+            if sample_name != name:
+                continue
+            if kind != 'histogram':
+                lines.append(f'{name}{format_labels(labels)} {value}')
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets + (math.inf,), value[:-1]):
+                cumulative += count
+                lines.append(
+                    f'{name}_bucket'
+                    f'{format_labels(labels, le=format_bound(bound))} '
+                    f'{cumulative}')
+            lines.append(f'{name}_sum{format_labels(labels)} {value[-1]}')
+            lines.append(f'{name}_count{format_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    token = settings.METRICS_TOKEN
+    if token and not constant_time_compare(
+            request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        render(collect()), content_type='text/plain; version=0.0.4')
+
+
+def get_view_name(view_func, method):
+    """Имя вида «TitleViewSet.list» для вьюсетов и функций DRF."""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return f'{view_func.__module__}.{view_func.__name__}'
+    actions = getattr(view_func, 'actions', None)
+    if actions:
+        action = actions.get(method.lower(), method.lower())
+    else:
+        action = method.lower()
+    return f'{cls.__name__}.{action}'
+
+
+class MetricsMiddleware:
+    """Собирает метрики каждого запроса по действию вьюсета."""
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        atexit.register(registry.flush, force=True)
+
+    def __call__(self, request):
+        queries = [0]
+
+        def count(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(count))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+        view = getattr(request, '_metrics_view', 'unmatched')
+        labels = (('view', view),)
+        registry.inc('yamdb_requests_total', labels + (
+            ('method', request.method),
+            ('status', str(response.status_code))))
+        registry.observe('yamdb_request_duration_seconds', labels, duration)
+        registry.observe('yamdb_db_queries', labels, queries[0])
+        if not response.streaming:
+            registry.observe(
+                'yamdb_response_size_bytes', labels, len(response.content))
+        registry.flush()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_view = get_view_name(view_func, request.method)
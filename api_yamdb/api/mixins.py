@@ -1,9 +1,311 @@
-from rest_framework import filters, mixins, viewsets
+import calendar
+import hashlib
 
-from .permissions import AdminOrReadOnly
+from django.conf import settings
+from django.db.models import Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import filters, mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
 
+from .cache import (get_cached_response_data, get_response_cache_key,
+                    get_version, set_cached_response_data)
+from .facets import BitmapIds, popcount, to_bitmap
+from .permissions import AdminOrReadOnly, IsAdminPermission
+from .signals import RESOURCES_BY_MODEL
 
-class CreateListDestroyMixinSet(mixins.CreateModelMixin,
+
+class ResponseCacheMixin:
+    """Кеширование успешных GET-ответов по версии ресурса.
+
+    Ответы не зависят от пользователя, поэтому анонимные
+    и авторизованные запросы читают одну запись кеша. Вместе с данными
+    хранятся ETag и Last-Modified, так что условный запрос к
+    закешированному ответу не обращается к базе.
+    """
+
+    cache_resource = None
+    cached_headers = ('ETag', 'Last-Modified')
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        if request.method != 'GET' or self.cache_resource is None:
+            return handler(request, *args, **kwargs)
+        key = get_response_cache_key(self.cache_resource, request)
+        cached = get_cached_response_data(key)
+        if cached is not None:
+            data, headers = cached
+            response = get_conditional_response(
+                request, etag=headers.get('ETag'),
+                last_modified=parse_http_date_safe(
+                    headers.get('Last-Modified')))
+            if response is None:
+                response = Response(data, status=status.HTTP_200_OK)
+            for header, value in headers.items():
+                response[header] = value
+            return response
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            headers = {
+                header: response[header] for header in self.cached_headers
+                if response.has_header(header)
+            }
+            set_cached_response_data(key, (response.data, headers))
+        return response
+
+
+class CachedListMixin(ResponseCacheMixin):
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().list, request, *args, **kwargs)
+
+
+class CachedRetrieveMixin(ResponseCacheMixin):
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs)
+
+
+class ConditionalGetMixin:
+    """Условные GET-запросы по ETag и Last-Modified.
+
+    Валидаторы считаются небольшими запросами к updated_at, без
+    сериализации. При совпадении ответ 304 отдаётся без тела.
+    """
+
+    # Удаление строки не меняет Max(updated_at) списка. Поэтому
+    # Last-Modified у списка отдаётся, только если удаление отмечает
+    # родительский объект (см. get_list_last_modified).
+    list_last_modified = False
+
+    def get_list_last_modified(self):
+        return None
+
+    def get_list_state(self):
+        """Число строк и Max(updated_at) выборки списка.
+
+        Число нужно, только если его считает пагинатор, и берётся из
+        его кеша. С ?count=false и в курсорном режиме COUNT
+        не выполняется: удаления и так меняют версии ресурсов в ETag.
+        """
+        queryset = self.filter_queryset(self.get_queryset()).order_by()
+        count = None
+        counts = getattr(self.paginator, 'counts_rows', None)
+        if counts is not None and counts(self.request):
+            count = self.paginator.get_count(queryset)
+        return {
+            'count': count,
+            'last_modified': queryset.aggregate(
+                last_modified=Max('updated_at'))['last_modified'],
+        }
+
+    def get_list_conditions(self):
+        state = self.get_list_state()
+        last_modified = None
+        if self.list_last_modified:
+            last_modified = max(filter(None, (
+                state['last_modified'], self.get_list_last_modified()
+            )), default=None)
+        versions = [
+            get_version(resource) for resource in RESOURCES_BY_MODEL.get(
+                self.get_queryset().model, ())
+        ]
+        return [state['count'], state['last_modified'], last_modified,
+                *versions], last_modified
+
+    def get_object_conditions(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        state = self.get_queryset().prefetch_related(None).filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        ).values_list('pk', 'updated_at').first()
+        if state is None:
+            return None, None
+        return list(state), state[1]
+
+    def get_conditional_response(self, handler, conditions, request,
+                                 *args, **kwargs):
+        if request.method != 'GET':
+            return handler(request, *args, **kwargs)
+        parts, last_modified = conditions()
+        if parts is None:
+            return handler(request, *args, **kwargs)
+        if getattr(self, 'cache_resource', None):
+            parts.append(get_version(self.cache_resource))
+        parts.append(request.get_full_path())
+        etag = quote_etag(hashlib.md5(
+            repr(parts).encode()).hexdigest())
+        etag = f'W/{etag}'
+        timestamp = None
+        if last_modified is not None:
+            timestamp = calendar.timegm(last_modified.utctimetuple())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK,
+                                    status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+        return response
+
+
+class ConditionalListMixin(ConditionalGetMixin):
+
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            super().list, self.get_list_conditions, request, *args, **kwargs)
+
+
+class ConditionalRetrieveMixin(ConditionalGetMixin):
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            super().retrieve, self.get_object_conditions, request,
+            *args, **kwargs)
+
+
+class FacetIndexMixin:
+    """Фильтрация списка по фасетному индексу в памяти (api/facets.py).
+
+    Если все фильтры запроса есть в индексе, выборка и её размер
+    считаются на битовых картах, а из базы читается только страница по
+    первичному ключу. Иначе работают обычные фильтры. С ?facets=true
+    в ответ добавляются числа объектов выборки по значениям фасетов.
+    Должен стоять в цепочке до ConditionalListMixin.
+    """
+
+    facet_index = None
+    # Параметры фильтров, которых нет в индексе.
+    unindexed_query_params = ()
+    facets_query_param = 'facets'
+
+    def facets_requested(self):
+        return self.request.query_params.get(
+            self.facets_query_param) in ('true', '1')
+
+    def get_index_bitmap(self):
+        """Битовая карта выборки или None, если индекс неприменим."""
+        if not hasattr(self, '_index_bitmap'):
+            self._index_bitmap = self.select_from_index()
+        return self._index_bitmap
+
+    def select_from_index(self):
+        params = self.request.query_params
+        if (self.action != 'list' or self.paginator is None
+                or not settings.TITLE_FACET_INDEX
+                or any(param in params
+                       for param in self.unindexed_query_params)):
+            return None
+        filterset = DjangoFilterBackend().get_filterset(
+            self.request, self.get_queryset(), self)
+        if not filterset.is_valid():
+            return None
+        criteria = filterset.get_index_criteria()
+        if criteria is None or not (criteria or self.facets_requested()):
+            return None
+        self.facet_index.refresh()
+        return self.facet_index.select(**criteria)
+
+    def filter_queryset(self, queryset):
+        if self.get_index_bitmap() is None:
+            return super().filter_queryset(queryset)
+        return queryset
+
+    def paginate_queryset(self, queryset):
+        bitmap = self.get_index_bitmap()
+        if bitmap is None:
+            return super().paginate_queryset(queryset)
+        page = super().paginate_queryset(BitmapIds(bitmap))
+        return list(queryset.filter(pk__in=page).order_by('pk'))
+
+    def get_list_state(self):
+        bitmap = self.get_index_bitmap()
+        if bitmap is None:
+            return super().get_list_state()
+        # Версия ресурса в ETag меняется при любой записи в список.
+        return {'count': popcount(bitmap), 'last_modified': None}
+
+    def get_facets(self):
+        bitmap = self.get_index_bitmap()
+        if bitmap is None:
+            bitmap = to_bitmap(self.filter_queryset(
+                self.get_queryset()).order_by().values_list('pk', flat=True))
+        self.facet_index.refresh()
+        return self.facet_index.facets(bitmap)
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if (self.facets_requested()
+                and response.status_code == status.HTTP_200_OK
+                and isinstance(response.data, dict)):
+            response.data['facets'] = self.get_facets()
+        return response
+
+
+class ValuesListMixin:
+    """Список через облегчённый сериализатор из read_serializers.
+
+    Фильтрация и пагинация работают как обычно, но страница читается
+    через .values() и не создаёт экземпляры моделей.
+    """
+
+    values_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if self.values_serializer_class is None:
+            return super().list(request, *args, **kwargs)
+        serializer = self.values_serializer_class()
+        rows = serializer.get_rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(
+                serializer.to_representation(page))
+        return Response(serializer.to_representation(rows))
+
+
+class HideOnDestroyMixin:
+    """Удаление скрытием, если включено BACKGROUND_DELETION.
+
+    Объект сразу пропадает из API, а связанные отзывы и комментарии
+    удаляются пачками командой purge_hidden без загрузки в память.
+    """
+
+    def perform_destroy(self, instance):
+        if settings.BACKGROUND_DELETION:
+            instance.hide()
+        else:
+            super().perform_destroy(instance)
+
+
+class BulkCreateMixin:
+    """Пакетное создание: POST списка объектов на .../bulk/."""
+
+    bulk_serializer_class = None
+
+    def get_serializer_class(self):
+        if self.action == 'bulk':
+            return self.bulk_serializer_class
+        return super().get_serializer_class()
+
+    @action(
+        methods=['POST'], detail=False,
+        permission_classes=(IsAdminPermission,))
+    def bulk(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        self.perform_bulk_create(serializer)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def perform_bulk_create(self, serializer):
+        serializer.save()
+
+
+class CreateListDestroyMixinSet(CachedListMixin,
+                                mixins.CreateModelMixin,
                                 mixins.ListModelMixin,
                                 mixins.DestroyModelMixin,
                                 viewsets.GenericViewSet):
@@ -0,0 +1,227 @@
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connections
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .cache import get_query_cache_key, set_cached_response_data
+from .signals import RESOURCES_BY_MODEL
+
+
+def estimate_count(queryset):
+    """Оценка числа строк планировщиком PostgreSQL, иначе None."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class CachedCountPagination(LimitOffsetPagination):
+    """Пагинация limit/offset без COUNT(*) на каждой странице.
+
+    Число объектов кешируется для каждого SQL-запроса списка, то есть
+    для каждого сочетания фильтров. Ключ включает версии ресурсов модели
+    из RESOURCES_BY_MODEL, поэтому запись в модель сбрасывает счётчики.
+    Если планировщик оценивает выборку больше чем в
+    PAGINATION_ESTIMATE_THRESHOLD строк, вместо точного числа
+    отдаётся оценка с признаком count_estimated. С ?count=false число
+    не считается вовсе, наличие следующей страницы определяется по
+    лишней строке выборки.
+    """
+
+    count_query_param = 'count'
+    count_estimated = False
+    counted = None
+
+    def counts_rows(self, request):
+        """Будет ли посчитано число объектов для этого запроса."""
+        return request.query_params.get(self.count_query_param) not in (
+            'false', '0')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        self.offset = self.get_offset(request)
+        self.request = request
+        self.count_estimated = False
+        if not self.counts_rows(request):
+            self.count = None
+            page = list(queryset[self.offset:self.offset + self.limit + 1])
+            self.has_next = len(page) > self.limit
+            return page[:self.limit]
+        self.count = self.get_count(queryset)
+        self.has_next = self.offset + self.limit < self.count
+        if self.count > self.limit and self.template is not None:
+            self.display_page_controls = True
+        if not self.count_estimated and (
+                self.count == 0 or self.offset > self.count):
+            return []
+        return list(queryset[self.offset:self.offset + self.limit])
+
+    def get_count(self, queryset):
+        if not hasattr(queryset, 'query'):
+            # Выборка из индекса в памяти (facets.BitmapIds).
+            return len(queryset)
+        # Пагинатор создаётся на запрос, а число для ETag
+        # (ConditionalGetMixin) и для страницы одно и то же.
+        if self.counted is None:
+            self.counted = self.get_cached_count(queryset.order_by())
+        count, self.count_estimated = self.counted
+        return count
+
+    def get_cached_count(self, queryset):
+        """Пара (число, признак оценки) из кеша или из базы."""
+        resources = RESOURCES_BY_MODEL.get(queryset.model)
+        if resources is None:
+            return self.count_queryset(queryset), self.count_estimated
+        key = get_query_cache_key('count', resources, queryset)
+        cached = cache.get(key)
+        if cached is None:
+            cached = (self.count_queryset(queryset), self.count_estimated)
+            set_cached_response_data(key, cached)
+        return cached
+
+    def count_queryset(self, queryset):
+        threshold = settings.PAGINATION_ESTIMATE_THRESHOLD
+        if threshold:
+            estimate = estimate_count(queryset)
+            if estimate is not None and estimate > threshold:
+                self.count_estimated = True
+                return estimate
+        return queryset.count()
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(
+            url, self.offset_query_param, self.offset + self.limit)
+
+    def get_paginated_response(self, data):
+        response = OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ])
+        if self.count_estimated:
+            response['count_estimated'] = True
+        return Response(response)
+
+
+class PubDateCursorPagination(CursorPagination):
+    """Курсорная пагинация по дате публикации.
+
+    Стоимость выборки страницы не зависит от глубины прокрутки:
+    вместо OFFSET используется условие по ключу сортировки,
+    COUNT не выполняется. CursorPagination из DRF сравнивает только
+    первое поле сортировки и пропускает строки с той же датой через
+    OFFSET, поэтому позиция здесь — пара (pub_date, id), и страница
+    начинается строго после неё.
+    """
+
+    ordering = ('pub_date', 'id')
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        offset, reverse, position = self.cursor or (0, False, None)
+        ordering = self.ordering
+        if reverse:
+            ordering = [
+                name[1:] if name.startswith('-') else f'-{name}'
+                for name in ordering
+            ]
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = self.filter_after(queryset, ordering, position)
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = results[:self.page_size]
+        following = None
+        if len(results) > self.page_size:
+            following = self._get_position_from_instance(
+                results[-1], self.ordering)
+        self.previous_position = self.next_position = None
+        if reverse:
+            self.page.reverse()
+            self.has_next = position is not None or offset > 0
+            self.has_previous = following is not None
+            self.next_position, self.previous_position = position, following
+        else:
+            self.has_next = following is not None
+            self.has_previous = position is not None or offset > 0
+            self.next_position, self.previous_position = following, position
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def filter_after(self, queryset, ordering, position):
+        """Строки после позиции: (дата, id) > позиции в порядке выборки."""
+        date_field, id_field = (name.lstrip('-') for name in ordering)
+        after, seen = ('lt', 'gte') if ordering[0].startswith('-') else (
+            'gt', 'lte')
+        date, _, pk = position.rpartition('|')
+        try:
+            date = queryset.model._meta.get_field(date_field).to_python(date)
+            pk = int(pk)
+        except (ValidationError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        # Условие по дате использует индекс (..., pub_date, id),
+        # исключение отбрасывает уже показанные строки с той же датой.
+        return queryset.filter(**{f'{date_field}__{after}e': date}).exclude(
+            **{date_field: date, f'{id_field}__{seen}': pk})
+
+    def _get_position_from_instance(self, instance, ordering):
+        date_field, id_field = (name.lstrip('-') for name in ordering)
+        if not isinstance(instance, dict):
+            instance = vars(instance)
+        return f'{instance[date_field].isoformat()}|{instance[id_field]}'
+
+
+class LimitOffsetOrCursorPagination(CachedCountPagination):
+    """Пагинация limit/offset с курсорным режимом.
+
+    Курсорный режим включается параметром cursor, первая страница
+    запрашивается с пустым значением: ?cursor=
+    """
+
+    cursor_pagination_class = PubDateCursorPagination
+
+    def counts_rows(self, request):
+        cursor_param = self.cursor_pagination_class.cursor_query_param
+        return (cursor_param not in request.query_params
+                and super().counts_rows(request))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        cursor_param = self.cursor_pagination_class.cursor_query_param
+        if cursor_param in request.query_params:
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view)
+        self.cursor_paginator = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
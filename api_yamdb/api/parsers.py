@@ -0,0 +1,27 @@
+"""JSON-парсер на orjson с откатом на стандартный json."""
+from django.conf import settings
+from rest_framework import parsers
+from rest_framework.exceptions import ParseError
+
+from .renderers import FastJSONRenderer, orjson
+
+
+class FastJSONParser(parsers.JSONParser):
+    """Разбирает JSON через orjson, если он установлен.
+
+    orjson принимает только UTF-8 и, как строгий режим DRF, отвергает
+    NaN и Infinity.
+    """
+
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if (orjson is None or not self.strict
+                or encoding.lower().replace('-', '') != 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
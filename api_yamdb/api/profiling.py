@@ -0,0 +1,211 @@
+"""Профилирование запросов: время SQL, аутентификации, сериализации
+и рендеринга в заголовке Server-Timing и в структурированном логе.
+
+Включается настройкой PROFILING_ENABLED. Выключенный middleware
+удаляется из цепочки при старте и ничего не стоит.
+"""
+import cProfile
+import functools
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework import serializers
+from rest_framework.exceptions import APIException
+from rest_framework.views import APIView
+
+from .read_serializers import ValuesSerializer
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class RequestProfile:
+    """Замеры одного запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.active = set()
+        self.db_time = 0.0
+        self.queries = 0
+
+    def add(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+    def timings(self):
+        """Длительности в миллисекундах для Server-Timing и лога."""
+        result = {'db': self.db_time * 1000}
+        result.update(
+            (phase, seconds * 1000) for phase, seconds in self.phases.items())
+        result['total'] = (time.perf_counter() - self.started) * 1000
+        return result
+
+
+def profiled(phase):
+    """Учитывает время вызова в фазе текущего запроса.
+
+    Вложенные вызовы той же фазы (например, сериализатор внутри
+    списка) не суммируются повторно.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profile = getattr(_local, 'profile', None)
+            if profile is None or phase in profile.active:
+                return func(*args, **kwargs)
+            profile.active.add(phase)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profile.active.discard(phase)
+                profile.add(phase, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def instrument():
+    """Оборачивает точки DRF, время которых попадает в отчёт.
+
+    Вызывается один раз при создании включённого middleware, поэтому
+    без профилирования классы DRF остаются нетронутыми.
+    """
+    if getattr(APIView, '_profiling_instrumented', False):
+        return
+    APIView._profiling_instrumented = True
+    APIView.perform_authentication = profiled('auth')(
+        APIView.perform_authentication)
+    serializers.BaseSerializer.is_valid = profiled('serialize')(
+        serializers.BaseSerializer.is_valid)
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        cls.data = property(profiled('serialize')(cls.data.fget))
+    ValuesSerializer.to_representation = profiled('serialize')(
+        ValuesSerializer.to_representation)
+
+
+class ProfilingMiddleware:
+    """Замеряет запрос и отдаёт результат в Server-Timing и в лог.
+
+    cProfile включается для доли запросов PROFILING_SAMPLE_RATE или
+    по заголовку PROFILING_HEADER от администратора. Статистика
+    попадает в лог, а при заданном PROFILING_DIR сохраняется в .prof.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.header = 'HTTP_' + settings.PROFILING_HEADER.upper().replace(
+            '-', '_')
+        instrument()
+
+    def __call__(self, request):
+        profile = _local.profile = RequestProfile()
+        profiler = cProfile.Profile() if self.should_sample(request) else None
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(
+                        profile.execute_wrapper))
+                if profiler is not None:
+                    profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if profiler is not None:
+                        profiler.disable()
+        finally:
+            _local.profile = None
+        timings = profile.timings()
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={value:.2f}' + (
+                f';desc="{profile.queries} queries"' if name == 'db' else '')
+            for name, value in timings.items())
+        self.log(request, response, profile, timings, profiler)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._profiling_view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # DRF отдаёт ещё не отрендеренный ответ: здесь заканчивается
+        # работа view и начинается рендеринг.
+        profile = getattr(_local, 'profile', None)
+        started = getattr(request, '_profiling_view_started', None)
+        if profile is None or started is None:
+            return response
+        rendering = time.perf_counter()
+        profile.add('view', rendering - started)
+        response.add_post_render_callback(
+            lambda rendered: profile.add(
+                'render', time.perf_counter() - rendering))
+        return response
+
+    def should_sample(self, request):
+        if self.header in request.META:
+            return self.is_admin(request)
+        rate = settings.PROFILING_SAMPLE_RATE
+        return rate > 0 and random.random() < rate
+
+    @staticmethod
+    def is_admin(request):
+        from .authentication import CachedJWTAuthentication
+
+        try:
+            authenticated = CachedJWTAuthentication().authenticate(request)
+        except APIException:
+            return False
+        return authenticated is not None and authenticated[0].is_admin
+
+    def log(self, request, response, profile, timings, profiler):
+        match = request.resolver_match
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'queries': profile.queries,
+            'timings_ms': {
+                name: round(value, 2) for name, value in timings.items()},
+        }
+        if profiler is not None:
+            record['profile'] = self.profile_summary(profiler)
+            if settings.PROFILING_DIR:
+                record['profile_file'] = self.dump_profile(profiler)
+        logger.info(json.dumps(record, ensure_ascii=False))
+
+    @staticmethod
+    def profile_summary(profiler, limit=20):
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats(
+            'cumulative').print_stats(limit)
+        return stream.getvalue()
+
+    @staticmethod
+    def dump_profile(profiler):
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+        path = os.path.join(
+            settings.PROFILING_DIR,
+            f'{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}-'
+            f'{random.getrandbits(32):08x}.prof')
+        profiler.dump_stats(path)
+        return path
@@ -0,0 +1,103 @@
+"""Облегчённые сериализаторы для списков.
+
+Строят словари прямо из строк .values() без полей DRF и выдают тот же
+JSON, что TitleSerializer, ReviewSerializer и CommentSerializer.
+Соответствие проверяется в tests/test_read_serializers.py, поэтому
+при изменении обычных сериализаторов эти нужно менять вместе с ними.
+"""
+from collections import defaultdict
+
+from rest_framework import serializers
+
+from reviews.models import Genre
+
+# Даты форматирует сам DRF, чтобы совпадали часовой пояс и формат.
+datetime_to_representation = serializers.DateTimeField().to_representation
+
+
+class ValuesSerializer:
+    """Базовый класс: строки .values() -> словари ответа."""
+
+    values_fields = ()
+
+    def get_rows(self, queryset):
+        return queryset.prefetch_related(None).values(*self.values_fields)
+
+    def to_representation(self, rows):
+        rows = list(rows)
+        self.prepare(rows)
+        return [self.to_dict(row) for row in rows]
+
+    def prepare(self, rows):
+        """Догружает связанные данные для всей страницы."""
+
+    def to_dict(self, row):
+        raise NotImplementedError
+
+
+class TitleValuesSerializer(ValuesSerializer):
+    """Список произведений в формате TitleSerializer."""
+
+    values_fields = (
+        'id', 'name', 'year', 'rating_sum', 'rating_count', 'description',
+        'category__name', 'category__slug',
+    )
+
+    def prepare(self, rows):
+        self.genres = defaultdict(list)
+        # Один запрос за жанрами всей страницы, в порядке Genre.Meta.
+        for title_id, name, slug in Genre.objects.filter(
+            title__in=[row['id'] for row in rows]
+        ).values_list('title', 'name', 'slug'):
+            self.genres[title_id].append({'name': name, 'slug': slug})
+
+    def to_dict(self, row):
+        count = row['rating_count']
+        category = None
+        if row['category__slug'] is not None:
+            category = {
+                'name': row['category__name'],
+                'slug': row['category__slug'],
+            }
+        return {
+            'id': row['id'],
+            'name': row['name'],
+            'year': row['year'],
+            'rating': int(row['rating_sum'] / count) if count else None,
+            'description': row['description'],
+            'genre': self.genres.get(row['id'], []),
+            'category': category,
+        }
+
+
+class ReviewValuesSerializer(ValuesSerializer):
+    """Список отзывов в формате ReviewSerializer."""
+
+    values_fields = (
+        'id', 'author__username', 'title_id', 'text', 'score', 'pub_date')
+
+    def to_dict(self, row):
+        return {
+            'id': row['id'],
+            'author': row['author__username'],
+            'title': row['title_id'],
+            'text': row['text'],
+            'score': row['score'],
+            'pub_date': datetime_to_representation(row['pub_date']),
+        }
+
+
+class CommentValuesSerializer(ValuesSerializer):
+    """Список комментариев в формате CommentSerializer."""
+
+    values_fields = (
+        'id', 'author__username', 'review_id', 'text', 'pub_date')
+
+    def to_dict(self, row):
+        return {
+            'id': row['id'],
+            'author': row['author__username'],
+            'review': row['review_id'],
+            'text': row['text'],
+            'pub_date': datetime_to_representation(row['pub_date']),
+        }
@@ -0,0 +1,51 @@
+"""JSON-рендерер на orjson с откатом на стандартный json.
+
+Вывод совпадает с rest_framework.renderers.JSONRenderer: даты, время,
+Decimal и прочие типы вне JSON кодирует тот же JSONEncoder DRF,
+U+2028 и U+2029 экранируются. Без orjson или с отступами (indent)
+рендеринг выполняет сам JSONRenderer.
+"""
+from rest_framework import renderers
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Даты, время и dataclass передаются в JSONEncoder DRF, чтобы формат
+# совпадал со стандартным рендерером.
+ORJSON_OPTIONS = orjson and (
+    orjson.OPT_PASSTHROUGH_DATETIME
+    | orjson.OPT_PASSTHROUGH_DATACLASS
+    | orjson.OPT_NON_STR_KEYS
+)
+
+LINE_SEPARATORS = (
+    ('\u2028'.encode(), b'\\u2028'),
+    ('\u2029'.encode(), b'\\u2029'),
+)
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """Быстрый рендерер JSON с тем же выводом, что у DRF."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or not self.compact:
+            return super().render(
+                data, accepted_media_type, renderer_context)
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is not None:
+            return super().render(
+                data, accepted_media_type, renderer_context)
+        try:
+            result = orjson.dumps(
+                data, default=self.encoder_class().default,
+                option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # Например, целые больше 64 бит.
+            return super().render(
+                data, accepted_media_type, renderer_context)
+        for separator, escaped in LINE_SEPARATORS:
+            if separator in result:
+                result = result.replace(separator, escaped)
+        return result
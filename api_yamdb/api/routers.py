@@ -0,0 +1,77 @@
+"""Чтение с реплик базы данных.
+
+ReplicaRoutingMiddleware разрешает читать с реплики запросам с
+безопасными методами (GET, HEAD, OPTIONS), ReplicaRouter направляет
+туда их чтения. Запись всегда идёт в основную базу, а после неё
+клиент на REPLICA_PIN_SECONDS закрепляется за основной базой, чтобы
+сразу видеть свои изменения, пока реплика догоняет.
+"""
+import hashlib
+import random
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+PIN_KEY = 'yamdb:replica-pin:{}'
+
+_local = threading.local()
+
+
+def get_pin_key(request):
+    # Клиент определяется по токену, а без него по IP.
+    client = (request.META.get('HTTP_AUTHORIZATION')
+              or request.META.get('REMOTE_ADDR', ''))
+    return PIN_KEY.format(hashlib.md5(client.encode()).hexdigest())
+
+
+def reads_from_replica():
+    """Читает ли текущий запрос с реплики."""
+    return getattr(_local, 'replica', None) is not None
+
+
+class ReplicaRouter:
+    """Чтения запроса с безопасным методом уходят на его реплику."""
+
+    def db_for_read(self, model, **hints):
+        return getattr(_local, 'replica', None)
+
+    def db_for_write(self, model, **hints):
+        # Дальнейшие чтения запроса должны видеть эту запись.
+        _local.replica = None
+        _local.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Все базы проекта — основная и её копии.
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    """Выбирает реплику для запроса и закрепляет писавших клиентов."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas:
+            return self.get_response(request)
+        key = get_pin_key(request)
+        if request.method in SAFE_METHODS and not cache.get(key):
+            _local.replica = random.choice(replicas)
+        _local.wrote = False
+        try:
+            return self.get_response(request)
+        finally:
+            self.finish(key)
+
+    def finish(self, key):
+        """Сбрасывает выбор реплики и закрепляет писавшего клиента."""
+        wrote = _local.wrote
+        _local.replica = None
+        _local.wrote = False
+        if wrote:
+            cache.set(key, True, timeout=settings.REPLICA_PIN_SECONDS)
@@ -1,14 +1,170 @@
 from django.contrib.auth import get_user_model
+from django.db import connections, router, transaction
+from django.db.models import prefetch_related_objects
 from django.shortcuts import get_object_or_404
+from django.utils.encoding import smart_str
 from rest_framework import serializers
-from rest_framework.relations import SlugRelatedField
+from rest_framework.relations import (MANY_RELATION_KWARGS,
+                                      ManyRelatedField, SlugRelatedField)
 
 from reviews.models import Category, Comment, Genre, Review, Title
+from .cache import bump_version_on_commit, get_slug_objects
+from .facets import invalidate_title_index
+from .signals import RESOURCES_BY_MODEL
 
 
 User = get_user_model()
 
 
+class PrefetchedSlugRelatedField(SlugRelatedField):
+    """Слаговое поле, которое ищет объекты пачкой.
+
+    Объекты берутся из словаря, загруженного BulkListSerializer для всего
+    пакета, из кеша справочника cache_resource или одним IN-запросом.
+    С many=True все слаги списка разрешаются разом.
+    """
+
+    def __init__(self, cache_resource=None, **kwargs):
+        self.cache_resource = cache_resource
+        super().__init__(**kwargs)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return ManySlugRelatedField(**list_kwargs)
+
+    def get_objects(self, slugs):
+        prefetched = self.context.get('prefetched_slugs', {}).get(
+            (self.queryset.model, self.slug_field))
+        if prefetched is not None:
+            return prefetched
+        if self.cache_resource is not None:
+            return get_slug_objects(
+                self.queryset.model, self.cache_resource, slugs)
+        return {
+            getattr(obj, self.slug_field): obj
+            for obj in self.get_queryset().filter(
+                **{f'{self.slug_field}__in': set(slugs)})
+        }
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str):
+            self.fail('invalid')
+        try:
+            return self.get_objects([data])[data]
+        except KeyError:
+            self.fail(
+                'does_not_exist', slug_name=self.slug_field,
+                value=smart_str(data))
+
+
+class ManySlugRelatedField(ManyRelatedField):
+    """Список слагов, разрешаемый одним обращением к базе или кешу."""
+
+    default_error_messages = {
+        'does_not_exist': 'Не найдены объекты с {slug_name}: {value}.',
+    }
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        slugs = list(data)
+        if not all(isinstance(slug, str) for slug in slugs):
+            self.child_relation.fail('invalid')
+        objects = self.child_relation.get_objects(slugs)
+        missing = [slug for slug in slugs if slug not in objects]
+        if missing:
+            self.fail(
+                'does_not_exist',
+                slug_name=self.child_relation.slug_field,
+                value=', '.join(missing))
+        return [objects[slug] for slug in slugs]
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    """Пакетное создание объектов одной транзакцией.
+
+    Ошибки возвращаются списком по элементам пакета, при любой ошибке
+    не создаётся ничего.
+    """
+
+    max_items = 5000
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            if len(data) > self.max_items:
+                raise serializers.ValidationError({
+                    'non_field_errors': [
+                        f'Не больше {self.max_items} объектов за запрос'
+                    ]
+                })
+            self.prefetch_slugs(data)
+        return super().to_internal_value(data)
+
+    def prefetch_slugs(self, data):
+        prefetched = self.context.setdefault('prefetched_slugs', {})
+        for name, field in self.child.fields.items():
+            relation = getattr(field, 'child_relation', field)
+            if (field.read_only
+                    or not isinstance(relation, PrefetchedSlugRelatedField)
+                    or relation.cache_resource is not None):
+                continue
+            slugs = set()
+            for item in data:
+                value = item.get(name) if isinstance(item, dict) else None
+                values = value if isinstance(value, list) else [value]
+                slugs.update(slug for slug in values if isinstance(slug, str))
+            prefetched[relation.queryset.model, relation.slug_field] = (
+                relation.get_objects(slugs))
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        m2m_fields = model._meta.many_to_many
+        instances, related = [], []
+        for attrs in validated_data:
+            related.append({
+                field: dict.fromkeys(attrs.pop(field.name, ()))
+                for field in m2m_fields
+            })
+            instances.append(model(**attrs))
+        connection = connections[router.db_for_write(model)]
+        with transaction.atomic(using=connection.alias):
+            if connection.features.can_return_ids_from_bulk_insert:
+                model.objects.bulk_create(instances)
+            else:
+                # Без RETURNING у bulk_create нет id для связей.
+                for instance in instances:
+                    instance.save()
+            for field in m2m_fields:
+                through = field.remote_field.through
+                through.objects.bulk_create([
+                    through(**{
+                        field.m2m_field_name(): instance,
+                        field.m2m_reverse_field_name(): value,
+                    })
+                    for instance, values in zip(instances, related)
+                    for value in values[field]
+                ])
+            bulk_created = getattr(self.child, 'bulk_created', None)
+            if bulk_created is not None:
+                bulk_created(instances)
+            bump_version_on_commit(*RESOURCES_BY_MODEL.get(model, ()))
+        return instances
+
+    def to_representation(self, data):
+        if isinstance(data, list) and data:
+            prefetch_related_objects(data, *(
+                field.name for field in self.child.Meta.model._meta
+                .many_to_many if field.name in self.child.fields
+            ))
+        return super().to_representation(data)
+
+
 class ReviewSerializer(serializers.ModelSerializer):
     """Сериализатор отзывов."""
 
@@ -37,10 +193,43 @@ class ReviewSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Review
-        fields = '__all__'
+        fields = ('id', 'author', 'title', 'text', 'score', 'pub_date')
         read_only_fields = ('author', 'pub_date', 'title')
 
 
+class ReviewBulkSerializer(serializers.ModelSerializer):
+    """Сериализатор пакетной загрузки отзывов от имени авторов."""
+
+    author = PrefetchedSlugRelatedField(
+        queryset=User.objects.filter(is_hidden=False), slug_field='username')
+    title = SlugRelatedField(slug_field='pk', read_only=True)
+
+    def validate(self, data):
+        # Авторы с отзывами на произведение загружаются один раз на пакет.
+        reviewed = self.context.get('reviewed_author_ids')
+        if reviewed is None:
+            reviewed = self.context['reviewed_author_ids'] = set(
+                self.context['view'].get_title().reviews.values_list(
+                    'author_id', flat=True))
+        if data['author'].pk in reviewed:
+            raise serializers.ValidationError(
+                'Автор уже оставлял обзор на данное произведение'
+            )
+        reviewed.add(data['author'].pk)
+        return data
+
+    def bulk_created(self, reviews):
+        Title.objects.filter(
+            pk__in={review.title_id for review in reviews}
+        ).refresh_ratings()
+
+    class Meta:
+        model = Review
+        fields = ('id', 'author', 'title', 'text', 'score', 'pub_date')
+        read_only_fields = ('pub_date', 'title')
+        list_serializer_class = BulkListSerializer
+
+
 class CommentSerializer(serializers.ModelSerializer):
     """Сериализатор комментариев."""
 
@@ -55,10 +244,24 @@ class CommentSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Comment
-        fields = '__all__'
+        fields = ('id', 'author', 'review', 'text', 'pub_date')
         read_only_fields = ('author', 'pub_date', 'review')
 
 
+class CommentBulkSerializer(serializers.ModelSerializer):
+    """Сериализатор пакетной загрузки комментариев от имени авторов."""
+
+    author = PrefetchedSlugRelatedField(
+        queryset=User.objects.filter(is_hidden=False), slug_field='username')
+    review = SlugRelatedField(slug_field='pk', read_only=True)
+
+    class Meta:
+        model = Comment
+        fields = ('id', 'author', 'review', 'text', 'pub_date')
+        read_only_fields = ('pub_date', 'review')
+        list_serializer_class = BulkListSerializer
+
+
 class UserSerializer(serializers.ModelSerializer):
     """Сериализатор вывода юзеров."""
 
@@ -117,11 +320,18 @@ class TitleSerializer(serializers.ModelSerializer):
 class TitleCOESerializer(serializers.ModelSerializer):
     """Сериализатор создания и изменения произведений"""
 
-    genre = serializers.SlugRelatedField(
-        queryset=Genre.objects.all(), slug_field='slug', many=True)
-    category = serializers.SlugRelatedField(
-        queryset=Category.objects.all(), slug_field='slug')
+    genre = PrefetchedSlugRelatedField(
+        queryset=Genre.objects.all(), slug_field='slug', many=True,
+        cache_resource='genres')
+    category = PrefetchedSlugRelatedField(
+        queryset=Category.objects.all(), slug_field='slug',
+        cache_resource='categories')
+
+    def bulk_created(self, titles):
+        # Связи с жанрами вставлены bulk_create, без сигналов.
+        invalidate_title_index()
 
     class Meta:
         model = Title
         fields = ('id', 'name', 'year', 'description', 'genre', 'category')
+        list_serializer_class = BulkListSerializer
@@ -0,0 +1,73 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from reviews.models import (Category, Comment, Genre, GenresTitle, Review,
+                            Title)
+from reviews.signals import rows_loaded, rows_purged
+from .authentication import mark_user_changed
+from .cache import bump_version_on_commit
+from .facets import (index_genre_link_deleted, index_genre_link_saved,
+                     index_genres_changed, index_title_deleted,
+                     index_title_saved, invalidate_title_index)
+
+User = get_user_model()
+
+# Ресурсы API, ответы которых зависят от модели.
+RESOURCES_BY_MODEL = {
+    Category: ('categories', 'titles'),
+    Genre: ('genres', 'titles'),
+    Title: ('titles',),
+    GenresTitle: ('titles',),
+    Review: ('titles', 'reviews'),
+    Comment: ('comments',),
+    User: ('users',),
+}
+
+
+def bump_resource_versions(sender, **kwargs):
+    bump_version_on_commit(*RESOURCES_BY_MODEL[sender])
+
+
+def bump_title_versions_on_genre_change(sender, action, **kwargs):
+    if action.startswith('post_'):
+        bump_version_on_commit(*RESOURCES_BY_MODEL[Title])
+
+
+def bump_content_versions_on_hide(sender, instance, update_fields,
+                                  **kwargs):
+    # Отзывы и комментарии скрытого пользователя пропадают из списков,
+    # а рейтинги произведений пересчитываются без его оценок.
+    if update_fields and 'is_hidden' in update_fields:
+        bump_version_on_commit(*RESOURCES_BY_MODEL[Review], 'comments')
+
+
+def revoke_user_claims(sender, instance, **kwargs):
+    mark_user_changed(instance.pk)
+
+
+def connect_signals():
+    for model in RESOURCES_BY_MODEL:
+        post_save.connect(bump_resource_versions, sender=model)
+        post_delete.connect(bump_resource_versions, sender=model)
+        rows_loaded.connect(bump_resource_versions, sender=model)
+    m2m_changed.connect(
+        bump_title_versions_on_genre_change, sender=Title.genre.through)
+    for model in (Review, Comment):
+        rows_purged.connect(bump_resource_versions, sender=model)
+    post_save.connect(revoke_user_claims, sender=User)
+    post_save.connect(bump_content_versions_on_hide, sender=User)
+    post_delete.connect(revoke_user_claims, sender=User)
+    connect_index_signals()
+
+
+def connect_index_signals():
+    post_save.connect(index_title_saved, sender=Title)
+    post_delete.connect(index_title_deleted, sender=Title)
+    post_save.connect(index_genre_link_saved, sender=GenresTitle)
+    post_delete.connect(index_genre_link_deleted, sender=GenresTitle)
+    m2m_changed.connect(index_genres_changed, sender=Title.genre.through)
+    for model in (Category, Genre):
+        post_save.connect(invalidate_title_index, sender=model)
+        post_delete.connect(invalidate_title_index, sender=model)
+    for model in (Category, Genre, Title, GenresTitle):
+        rows_loaded.connect(invalidate_title_index, sender=model)
@@ -0,0 +1,191 @@
+"""Ограничение частоты запросов со счётчиками в общем SQLite-файле.
+
+Счётчики хранятся в файле THROTTLE_DATABASE, поэтому лимиты общие для
+всех воркеров gunicorn на машине и не требуют внешнего сервиса.
+Используется приближённое скользящее окно: количество запросов
+в предыдущем окне учитывается с весом оставшейся доли окна.
+"""
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from rest_framework import permissions, throttling
+
+
+class SlidingWindowStorage:
+    """Счётчики запросов по окнам фиксированной длины."""
+
+    cleanup_probability = 0.001
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+
+    def get_connection(self):
+        # Соединение нельзя переносить через fork, поэтому оно
+        # создаётся заново в каждом процессе и потоке.
+        if getattr(self.local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None,
+                check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS throttle ('
+                'key TEXT NOT NULL, window INTEGER NOT NULL, '
+                'hits INTEGER NOT NULL, expires REAL NOT NULL, '
+                'PRIMARY KEY (key, window)) WITHOUT ROWID')
+            self.local.connection = connection
+            self.local.pid = os.getpid()
+        return self.local.connection
+
+    def hit(self, key, limit, duration, now=None):
+        """Учитывает запрос, если лимит не исчерпан.
+
+        Возвращает пару (разрешён ли запрос, сколько секунд ждать).
+        Счётчики читаются без блокировки, а увеличивает их одна
+        условная вставка: блокировка записи берётся только для
+        разрешённых запросов и на один оператор, а условие не даёт
+        параллельным воркерам превысить лимит.
+        """
+        now = time.time() if now is None else now
+        window = int(now // duration)
+        elapsed = now / duration - window
+        connection = self.get_connection()
+        hits = dict(connection.execute(
+            'SELECT window, hits FROM throttle '
+            'WHERE key = ? AND window >= ?', (key, window - 1)))
+        current = hits.get(window, 0)
+        previous = hits.get(window - 1, 0)
+        # Сколько запросов помещается в текущее окно с учётом прошлого.
+        capacity = limit - previous * (1 - elapsed)
+        if current < capacity:
+            cursor = connection.execute(
+                'INSERT INTO throttle (key, window, hits, expires) '
+                'VALUES (?, ?, 1, ?) ON CONFLICT (key, window) '
+                'DO UPDATE SET hits = hits + 1 WHERE hits < ?',
+                (key, window, (window + 2) * duration, capacity))
+            if cursor.rowcount:
+                if random.random() < self.cleanup_probability:
+                    connection.execute(
+                        'DELETE FROM throttle WHERE expires < ?', (now,))
+                return True, None
+            # Параллельный запрос занял последнее место.
+            current, = connection.execute(
+                'SELECT hits FROM throttle WHERE key = ? AND window = ?',
+                (key, window)).fetchone()
+        return False, self.get_wait(
+            limit, duration, elapsed, current, previous)
+
+    @staticmethod
+    def get_wait(limit, duration, elapsed, current, previous):
+        if current >= limit:
+            return (1 - elapsed) * duration
+        # Ждать, пока вес предыдущего окна не опустится ниже остатка.
+        return (1 - (limit - current) / previous - elapsed) * duration
+
+    def clear(self):
+        self.get_connection().execute('DELETE FROM throttle')
+
+
+_storages = {}
+
+
+def get_storage():
+    path = settings.THROTTLE_DATABASE
+    if path not in _storages:
+        _storages[path] = SlidingWindowStorage(path)
+    return _storages[path]
+
+
+class SharedRateThrottle(throttling.SimpleRateThrottle):
+    """Базовый класс лимитов с общими для процессов счётчиками."""
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        allowed, self.wait_seconds = get_storage().hit(
+            self.key, self.num_requests, self.duration)
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+    def get_user_or_ip(self, request):
+        if request.user and request.user.is_authenticated:
+            return f'user-{request.user.pk}'
+        return f'ip-{self.get_ident(request)}'
+
+
+class AnonRateThrottle(SharedRateThrottle):
+    """Общий лимит для анонимных запросов по IP."""
+
+    scope = 'anon'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return self.cache_format % {
+            'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class UserRateThrottle(SharedRateThrottle):
+    """Общий лимит для авторизованных пользователей."""
+
+    scope = 'user'
+
+    def get_cache_key(self, request, view):
+        if not (request.user and request.user.is_authenticated):
+            return None
+        return self.cache_format % {
+            'scope': self.scope, 'ident': request.user.pk}
+
+
+class WriteRateThrottle(SharedRateThrottle):
+    """Лимит изменяющих запросов к эндпоинту для пользователя или IP.
+
+    Эндпоинт задаёт свой лимит атрибутом throttle_scope, остальные
+    эндпоинты этот класс пропускает.
+    """
+
+    scope = None
+
+    def get_rate(self):
+        # Лимит зависит от вьюсета и определяется в allow_request.
+        if self.scope is None:
+            return None
+        return super().get_rate()
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, 'throttle_scope', None)
+        if not self.scope or request.method in permissions.SAFE_METHODS:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            'scope': self.scope, 'ident': self.get_user_or_ip(request)}
+
+
+class SignupRateThrottle(SharedRateThrottle):
+    """Лимит регистраций с одного IP."""
+
+    scope = 'signup'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class TokenRateThrottle(SignupRateThrottle):
+    """Лимит запросов токена с одного IP."""
+
+    scope = 'token'
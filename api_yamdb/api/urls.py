@@ -3,6 +3,7 @@ from rest_framework import routers
 
 from api.views import (CategoryViewSet,
                        CommentViewSet,
+                       export_data,
                        GenreViewSet,
                        get_token,
                        ReviewViewSet, signup_user, TitleViewSet,
@@ -30,4 +31,5 @@ urlpatterns = [
     path('v1/', include(router_v1.urls)),
     path('v1/auth/signup/', signup_user),
     path('v1/auth/token/', get_token),
+    path('v1/export/<str:file_name>', export_data),
 ]
@@ -2,18 +2,52 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.tokens import default_token_generator
 from django.core.mail import send_mail
+from django.db import IntegrityError, transaction
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+
+from reviews.models import OutgoingEmail
 
 
 User = get_user_model()
 
 
+def enqueue_email(user, subject, body):
+    """Ставит письмо в очередь; неотправленное письмо заменяется новым."""
+    defaults = {
+        'recipient': user.email,
+        'subject': subject,
+        'body': body,
+        'attempts': 0,
+        'next_attempt_at': timezone.now(),
+        'last_error': '',
+    }
+    try:
+        with transaction.atomic():
+            OutgoingEmail.objects.update_or_create(
+                user=user, status=OutgoingEmail.STATUS_PENDING,
+                defaults=defaults)
+    except IntegrityError:
+        # Параллельный запрос регистрации успел поставить письмо
+        # этому пользователю, повторная попытка заменит его.
+        OutgoingEmail.objects.update_or_create(
+            user=user, status=OutgoingEmail.STATUS_PENDING,
+            defaults=defaults)
+
+
 def generate_and_send_confirmation_code(username):
     user = get_object_or_404(User, username=username)
     user.confirmation_code = default_token_generator.make_token(user)
+    subject = 'Код подтверждения'
+    body = f'confirmation_code {user.confirmation_code}'
+    if settings.EMAIL_DELIVERY == 'outbox':
+        with transaction.atomic():
+            user.save()
+            enqueue_email(user, subject, body)
+        return
     send_mail(
-        'Код подтверждения',
-        f'confirmation_code {user.confirmation_code}',
+        subject,
+        body,
         settings.ADMIN_EMAIL,
         [f'{user.email}'],
         fail_silently=False,
@@ -1,78 +1,130 @@
 from django.contrib.auth import get_user_model
-from django.db.models import Avg
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, viewsets
-from rest_framework.decorators import api_view, action
+from rest_framework.decorators import (action, api_view, permission_classes,
+                                       throttle_classes)
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
-from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import (IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
-from rest_framework_simplejwt.tokens import RefreshToken
 
-from reviews.models import Category, Genre, Review, Title
-from .filters import TitleFilter
-from .mixins import CreateListDestroyMixinSet
+from reviews.export import CONTENT_TYPES, export_table, get_table
+from reviews.models import Category, Genre, Review, SimilarTitle, Title
+from .authentication import get_access_token
+from .facets import title_index
+from .filters import TitleFilter, TitleSearchFilter
+from .mixins import (BulkCreateMixin, CachedListMixin, CachedRetrieveMixin,
+                     ConditionalListMixin, ConditionalRetrieveMixin,
+                     CreateListDestroyMixinSet, FacetIndexMixin,
+                     HideOnDestroyMixin, ValuesListMixin)
+from .pagination import CachedCountPagination, LimitOffsetOrCursorPagination
 from .permissions import (AdminOrReadOnly, IsAdminPermission,
                           IsAuthorOrAdminOrModeratorOrReadOnly)
-from .serializers import (CategorySerializer, CommentSerializer,
-                          GenreSerializer, ReviewSerializer,
+from .read_serializers import (CommentValuesSerializer,
+                               ReviewValuesSerializer, TitleValuesSerializer)
+from .serializers import (CategorySerializer, CommentBulkSerializer,
+                          CommentSerializer, GenreSerializer,
+                          ReviewBulkSerializer, ReviewSerializer,
                           SignUpUserSerializer,
                           TitleCOESerializer, TitleSerializer,
                           TokenSerializer, UserSerializer)
+from .throttling import SignupRateThrottle, TokenRateThrottle
 from .utils import generate_and_send_confirmation_code
 
 
 User = get_user_model()
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(BulkCreateMixin, ConditionalListMixin,
+                    ConditionalRetrieveMixin, ValuesListMixin,
+                    viewsets.ModelViewSet):
     """Вьюсет отзывов."""
 
     serializer_class = ReviewSerializer
+    values_serializer_class = ReviewValuesSerializer
+    bulk_serializer_class = ReviewBulkSerializer
     permission_classes = (IsAuthorOrAdminOrModeratorOrReadOnly,
                           IsAuthenticatedOrReadOnly)
-    pagination_class = LimitOffsetPagination
+    pagination_class = LimitOffsetOrCursorPagination
+    list_last_modified = True
+    throttle_scope = 'review_write'
+
+    def get_title(self):
+        if not hasattr(self, '_title'):
+            self._title = get_object_or_404(
+                Title.objects.visible(), pk=self.kwargs.get('title_id'))
+        return self._title
 
     def get_queryset(self):
-        title_id = self.kwargs.get('title_id')
-        title = get_object_or_404(Title, pk=title_id)
-        return title.reviews.select_related('author', 'title')
+        # Отзывы скрытых до удаления пользователей не показываются.
+        return self.get_title().reviews.filter(
+            author__is_hidden=False).select_related(
+            'author', 'title').order_by('pub_date', 'id')
+
+    def get_list_last_modified(self):
+        return self.get_title().updated_at
 
     def perform_create(self, serializer):
-        title_id = self.kwargs.get('title_id')
-        title = get_object_or_404(Title, pk=title_id)
-        serializer.save(title=title, author=self.request.user)
+        serializer.save(title=self.get_title(), author=self.request.user)
+
+    def perform_bulk_create(self, serializer):
+        serializer.save(title=self.get_title())
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(BulkCreateMixin, ConditionalListMixin,
+                     ConditionalRetrieveMixin, ValuesListMixin,
+                     viewsets.ModelViewSet):
     """Вьюсет комменариев."""
 
     serializer_class = CommentSerializer
+    values_serializer_class = CommentValuesSerializer
+    bulk_serializer_class = CommentBulkSerializer
     permission_classes = (IsAuthorOrAdminOrModeratorOrReadOnly,
                           IsAuthenticatedOrReadOnly)
-    pagination_class = LimitOffsetPagination
+    pagination_class = LimitOffsetOrCursorPagination
+    list_last_modified = True
+    throttle_scope = 'comment_write'
+
+    def get_review(self):
+        if not hasattr(self, '_review'):
+            self._review = get_object_or_404(
+                Review, pk=self.kwargs.get('review_id'),
+                title__is_hidden=False, author__is_hidden=False)
+        return self._review
 
     def get_queryset(self):
-        review_id = self.kwargs.get('review_id')
-        review = get_object_or_404(Review, pk=review_id)
-        return review.comments.select_related('author', 'review')
+        return self.get_review().comments.filter(
+            author__is_hidden=False).select_related(
+            'author', 'review').order_by('pub_date', 'id')
+
+    def get_list_last_modified(self):
+        return self.get_review().updated_at
 
     def perform_create(self, serializer):
         title_id = self.kwargs.get('title_id')
-        title = get_object_or_404(Title, pk=title_id)
+        title = get_object_or_404(Title.objects.visible(), pk=title_id)
         review_id = self.kwargs.get('review_id')
-        review = get_object_or_404(Review, pk=review_id, title=title)
+        review = get_object_or_404(
+            Review, pk=review_id, title=title, author__is_hidden=False)
         serializer.save(review=review, author=self.request.user)
 
+    def perform_bulk_create(self, serializer):
+        review = get_object_or_404(
+            Review, pk=self.kwargs.get('review_id'),
+            title_id=self.kwargs.get('title_id'), title__is_hidden=False,
+            author__is_hidden=False)
+        serializer.save(review=review)
+
 
-class UserViewset(viewsets.ModelViewSet):
+class UserViewset(HideOnDestroyMixin, viewsets.ModelViewSet):
     """Вьюсет для юзеров."""
 
-    queryset = User.objects.all()
+    queryset = User.objects.filter(is_hidden=False)
     serializer_class = UserSerializer
     permission_classes = (IsAdminPermission,)
-    pagination_class = LimitOffsetPagination
+    pagination_class = CachedCountPagination
     lookup_field = 'username'
     search_fields = ('=username',)
 
@@ -81,22 +133,26 @@ class UserViewset(viewsets.ModelViewSet):
         detail=False, url_path='me',
         permission_classes=(IsAuthenticated,))
     def user_me(self, request):
+        # request.user собран из токена и не содержит профиля.
+        user = get_object_or_404(User, pk=request.user.pk)
         if request.method == 'PATCH':
             serializer = UserSerializer(
-                request.user,
+                user,
                 data=request.data,
                 partial=True)
             serializer.is_valid(raise_exception=True)
-            serializer.save(role=request.user.role)
+            serializer.save(role=user.role)
             return Response(serializer.data, status=status.HTTP_200_OK)
-        serializer = UserSerializer(request.user)
+        serializer = UserSerializer(user)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
 @api_view(['POST'])
+@throttle_classes([SignupRateThrottle])
 def signup_user(request):
     username = request.data.get('username')
-    if not User.objects.filter(username=username).exists():
+    user = User.objects.filter(username=username).first()
+    if user is None:
         serializer = SignUpUserSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         if serializer.validated_data['username'] != 'me':
@@ -106,7 +162,11 @@ def signup_user(request):
         return Response(
             'Username указан неверно!', status=status.HTTP_400_BAD_REQUEST)
 
-    user = get_object_or_404(User, username=username)
+    if user.is_hidden:
+        # Удалённый пользователь ждёт purge_hidden и не регистрируется
+        # заново.
+        return Response(
+            'Пользователь удалён', status=status.HTTP_400_BAD_REQUEST)
     serializer = SignUpUserSerializer(user, data=request.data, partial=True)
     serializer.is_valid(raise_exception=True)
 
@@ -120,45 +180,97 @@ def signup_user(request):
 
 
 @api_view(['POST'])
+@throttle_classes([TokenRateThrottle])
 def get_token(request):
     serializer = TokenSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
     username = serializer.validated_data['username']
     confirmation_code = serializer.validated_data['confirmation_code']
-    if not User.objects.filter(username=username).exists():
+    user = User.objects.filter(username=username, is_hidden=False).first()
+    if user is None:
         return Response(
             'Пользователь не найден', status=status.HTTP_404_NOT_FOUND
         )
-    user = get_object_or_404(User, username=username)
     if user.confirmation_code == confirmation_code:
-        refresh = RefreshToken.for_user(user)
-        token_data = {'token': str(refresh.access_token)}
+        token_data = {'token': str(get_access_token(user))}
         return Response(token_data, status=status.HTTP_200_OK)
     return Response(
         'Неверный код подтверждения', status=status.HTTP_400_BAD_REQUEST)
 
 
-class TitleViewSet(viewsets.ModelViewSet):
+@api_view(['GET'])
+@permission_classes([IsAdminPermission])
+def export_data(request, file_name):
+    """Потоковая выгрузка таблицы: /export/titles.csv, /export/review.ndjson.
+
+    CSV в формате load_from_csv, память не зависит от размера таблицы.
+    """
+    name, _, export_format = file_name.rpartition('.')
+    table = get_table(name)
+    if table is None or export_format not in CONTENT_TYPES:
+        raise NotFound('Неизвестная таблица или формат выгрузки')
+    response = StreamingHttpResponse(
+        export_table(table, export_format),
+        content_type=CONTENT_TYPES[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{file_name}"'
+    return response
+
+
+class TitleViewSet(BulkCreateMixin, CachedListMixin, CachedRetrieveMixin,
+                   FacetIndexMixin, ConditionalListMixin,
+                   ConditionalRetrieveMixin, HideOnDestroyMixin,
+                   ValuesListMixin, viewsets.ModelViewSet):
     """Вьюсет для произведений."""
 
-    queryset = Title.objects.all().annotate(rating=Avg('reviews__score'))
+    queryset = Title.objects.visible().select_related(
+        'category').prefetch_related('genre')
     serializer_class = TitleSerializer
+    values_serializer_class = TitleValuesSerializer
     permission_classes = (AdminOrReadOnly,)
-    filter_backends = (DjangoFilterBackend,)
+    filter_backends = (DjangoFilterBackend, TitleSearchFilter)
     filterset_class = TitleFilter
-    pagination_class = LimitOffsetPagination
+    pagination_class = CachedCountPagination
+    cache_resource = 'titles'
+    facet_index = title_index
+    unindexed_query_params = (TitleSearchFilter.search_param,)
+    bulk_serializer_class = TitleCOESerializer
 
     def get_serializer_class(self):
         if self.request.method in ['POST', 'PATCH']:
             return TitleCOESerializer
         return TitleSerializer
 
+    @action(detail=True)
+    def similar(self, request, pk=None):
+        """Похожие произведения, рассчитанные командой build_similar."""
+        title = get_object_or_404(Title.objects.visible(), pk=pk)
+        neighbours = list(SimilarTitle.objects.filter(
+            title=title, similar__is_hidden=False
+        ).order_by('rank').values_list('similar_id', 'score'))
+        serializer = TitleValuesSerializer()
+        rows = {
+            row['id']: row for row in serializer.get_rows(
+                Title.objects.visible().filter(
+                    pk__in=[similar_id for similar_id, _ in neighbours]))
+        }
+        # Между запросами произведение могло быть скрыто или удалено.
+        neighbours = [
+            (similar_id, score) for similar_id, score in neighbours
+            if similar_id in rows
+        ]
+        data = serializer.to_representation(
+            [rows[similar_id] for similar_id, _ in neighbours])
+        for item, (_, score) in zip(data, neighbours):
+            item['similarity'] = round(score, 4)
+        return Response(data)
+
 
 class CategoryViewSet(CreateListDestroyMixinSet):
     """Вьюсет для категорий."""
 
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    cache_resource = 'categories'
 
 
 class GenreViewSet(CreateListDestroyMixinSet):
@@ -166,3 +278,4 @@ class GenreViewSet(CreateListDestroyMixinSet):
 
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
+    cache_resource = 'genres'
@@ -23,6 +23,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
+    'api.profiling.ProfilingMiddleware',
+    'api.routers.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -61,10 +64,67 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', default='levon'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', default='zaqwsx321'),
         'HOST': os.getenv('DB_HOST', default='db'),
-        'PORT': os.getenv('DB_PORT', default='5432')
+        'PORT': os.getenv('DB_PORT', default='5432'),
+        # Постоянное соединение живёт DB_CONN_MAX_AGE секунд и
+        # проверяется перед каждым запросом (api.db.pool).
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', default=60)),
+        'CONN_HEALTH_CHECKS': os.getenv(
+            'DB_CONN_HEALTH_CHECKS', default='True') == 'True',
     }
 }
 
+# Реплики для чтения: DB_REPLICAS=host1,host2 с теми же остальными
+# параметрами, что у основной базы (для SQLite — имена файлов).
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+        filter(None, os.getenv('DB_REPLICAS', default='').split(','))):
+    DATABASES[f'replica_{number}'] = dict(DATABASES['default'], **{
+        'NAME' if DATABASES['default']['ENGINE'].endswith('sqlite3')
+        else 'HOST': replica.strip(),
+    })
+    DATABASE_REPLICAS.append(f'replica_{number}')
+
+# Пул соединений процесса вместо постоянного соединения потока.
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', default=0))
+if DB_POOL_SIZE:
+    for database in DATABASES.values():
+        database.update({
+            'ENGINE': 'api.db.' + database['ENGINE'].rsplit('.', 1)[-1],
+            'CONN_MAX_AGE': 0,
+            'POOL': {
+                'SIZE': DB_POOL_SIZE,
+                'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', default=10)),
+                'MAX_AGE': int(os.getenv('DB_POOL_MAX_AGE', default=1800)),
+                'CHECK_AFTER': float(
+                    os.getenv('DB_POOL_CHECK_AFTER', default=0)),
+            },
+        })
+
+DATABASE_ROUTERS = ['api.routers.ReplicaRouter']
+
+# Сколько секунд после записи клиент читает из основной базы.
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', default=5))
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='yamdb'),
+    }
+}
+
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', default=300))
+
+# Через сколько секунд справочники жанров и категорий в памяти процесса
+# перечитываются из базы (api.cache.get_slug_objects).
+SLUG_TABLE_TIMEOUT = int(os.getenv('SLUG_TABLE_TIMEOUT', default=30))
+
+# Выше этого числа строк пагинация отдаёт оценку планировщика вместо
+# COUNT(*) (api.pagination.CachedCountPagination), 0 — всегда точно.
+PAGINATION_ESTIMATE_THRESHOLD = int(
+    os.getenv('PAGINATION_ESTIMATE_THRESHOLD', default=100000))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -106,19 +166,102 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.'
                                 'PageNumberPagination',
     'PAGE_SIZE': 20,
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.AnonRateThrottle',
+        'api.throttling.UserRateThrottle',
+        'api.throttling.WriteRateThrottle',
+    ],
+    # Адрес клиента для лимитов берётся из X-Forwarded-For, который
+    # дописывает nginx; адреса левее подставлены клиентом.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', default=1)),
+    'DEFAULT_THROTTLE_RATES': {
+        'anon': os.getenv('THROTTLE_RATE_ANON', default='1200/minute'),
+        'user': os.getenv('THROTTLE_RATE_USER', default='2400/minute'),
+        'signup': os.getenv('THROTTLE_RATE_SIGNUP', default='10/hour'),
+        'token': os.getenv('THROTTLE_RATE_TOKEN', default='30/hour'),
+        'review_write': os.getenv(
+            'THROTTLE_RATE_REVIEW_WRITE', default='30/hour'),
+        'comment_write': os.getenv(
+            'THROTTLE_RATE_COMMENT_WRITE', default='120/hour'),
+    },
 }
 
+THROTTLE_DATABASE = os.getenv(
+    'THROTTLE_DATABASE', default=os.path.join(BASE_DIR, 'throttle.sqlite3'))
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv('AUTH_USER_CACHE_TIMEOUT', default=60))
+
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 ADMIN_EMAIL = 'admin@yamdb.admin'
+
+# Профилирование запросов (api.profiling.ProfilingMiddleware).
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', default='') == 'True'
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', default=0))
+PROFILING_HEADER = os.getenv('PROFILING_HEADER', default='X-Profile')
+PROFILING_DIR = os.getenv('PROFILING_DIR', default='')
+
+# Метрики Prometheus (api.metrics), общие для воркеров через METRICS_DIR.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', default='True') == 'True'
+METRICS_DIR = os.getenv(
+    'METRICS_DIR', default=os.path.join(BASE_DIR, 'metrics'))
+METRICS_FLUSH_INTERVAL = float(
+    os.getenv('METRICS_FLUSH_INTERVAL', default=1))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', default='')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api.profiling': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# Удаление произведений и пользователей через API только скрывает их,
+# отзывы и комментарии удаляет пачками команда purge_hidden.
+BACKGROUND_DELETION = os.getenv(
+    'BACKGROUND_DELETION', default='True') == 'True'
+
+# Фильтры произведений по жанрам, категориям и годам считаются по
+# индексу в памяти процесса (api/facets.py), а не запросом с JOIN.
+TITLE_FACET_INDEX = os.getenv(
+    'TITLE_FACET_INDEX', default='True') == 'True'
+TITLE_FACET_INDEX_MAX_AGE = int(
+    os.getenv('TITLE_FACET_INDEX_MAX_AGE', default=60))
+
+# outbox — письма ставятся в очередь и отправляются командой send_emails,
+# sync — отправляются прямо во время запроса.
+EMAIL_DELIVERY = os.getenv('EMAIL_DELIVERY', default='outbox')
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(
+    os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', default=5))
+EMAIL_OUTBOX_RETRY_DELAY = int(
+    os.getenv('EMAIL_OUTBOX_RETRY_DELAY', default=30))
+EMAIL_OUTBOX_CLAIM_TIMEOUT = int(
+    os.getenv('EMAIL_OUTBOX_CLAIM_TIMEOUT', default=300))
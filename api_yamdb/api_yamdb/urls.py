@@ -2,10 +2,13 @@ from django.contrib import admin
 from django.views.generic import TemplateView
 from django.urls import include, path
 
+from api.metrics import metrics_view
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
+    path('metrics', metrics_view, name='metrics'),
     path(
         'redoc/',
         TemplateView.as_view(template_name='redoc.html'),
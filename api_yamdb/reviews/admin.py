@@ -1,7 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth import get_user_model
 
-from .models import Title, Category, Genre
+from .models import Title, Category, Genre, OutgoingEmail
+from .search import search_titles
 
 User = get_user_model()
 
@@ -32,6 +33,11 @@ class TitleAdmin(admin.ModelAdmin):
     search_fields = ('name', 'description')
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search_titles(queryset, search_term), False
+
 
 class CategoryAdmin(admin.ModelAdmin):
     """Админка для категории."""
@@ -49,7 +55,20 @@ class GenreAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    """Админка для очереди писем."""
+
+    list_display = (
+        'pk', 'recipient', 'subject', 'status', 'attempts',
+        'next_attempt_at', 'sent_at',
+    )
+    list_filter = ('status',)
+    search_fields = ('recipient',)
+    empty_value_display = '-пусто-'
+
+
 admin.site.register(User, UserAdmin)
 admin.site.register(Title, TitleAdmin)
 admin.site.register(Category, CategoryAdmin)
 admin.site.register(Genre, GenreAdmin)
+admin.site.register(OutgoingEmail, OutgoingEmailAdmin)
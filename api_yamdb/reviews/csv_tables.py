@@ -0,0 +1,47 @@
+from collections import namedtuple
+
+from django.contrib.auth import get_user_model
+
+from .models import Category, Comment, Genre, GenresTitle, Review, Title
+
+User = get_user_model()
+
+CsvTable = namedtuple(
+    'CsvTable', ('label', 'file_name', 'model', 'columns', 'optional'),
+    defaults=((),))
+CsvTable.__doc__ = """Описание CSV-файла с данными одной модели.
+
+columns — имена атрибутов модели (attname) в порядке колонок файла.
+optional — последние из columns, которых может не быть в файлах,
+выгруженных до их появления.
+"""
+
+# Порядок важен: таблицы загружаются после тех, на которые ссылаются.
+CSV_TABLES = (
+    CsvTable('Users', 'users.csv', User, (
+        'id', 'username', 'email', 'role', 'bio', 'first_name', 'last_name',
+    )),
+    CsvTable('Categories', 'category.csv', Category, ('id', 'name', 'slug')),
+    CsvTable('Genres', 'genre.csv', Genre, ('id', 'name', 'slug')),
+    CsvTable('Titles', 'titles.csv', Title, (
+        'id', 'name', 'year', 'category_id', 'description',
+    ), optional=('description',)),
+    CsvTable('Genre_Titles', 'genre_title.csv', GenresTitle, (
+        'id', 'title_id', 'genre_id',
+    )),
+    CsvTable('Reviews', 'review.csv', Review, (
+        'id', 'title_id', 'text', 'author_id', 'score', 'pub_date',
+    )),
+    CsvTable('Comments', 'comments.csv', Comment, (
+        'id', 'review_id', 'text', 'author_id', 'pub_date',
+    )),
+)
+
+
+def get_foreign_keys(table):
+    """Возвращает {attname: модель} для внешних ключей таблицы."""
+    return {
+        field.attname: field.related_model
+        for field in table.model._meta.concrete_fields
+        if field.is_relation and field.attname in table.columns
+    }
@@ -0,0 +1,89 @@
+"""Потоковая выгрузка таблиц CSV_TABLES в CSV и NDJSON.
+
+Строки читаются через .iterator(chunk_size), на PostgreSQL это
+серверный курсор, поэтому память не зависит от размера таблицы.
+CSV совпадает по формату с файлами, которые читает load_from_csv.
+Скрытые до удаления произведения и пользователи вместе с их отзывами
+и комментариями не выгружаются.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from itertools import islice
+
+from django.db.models import Q
+
+from .csv_tables import CSV_TABLES, User
+from .models import Comment, GenresTitle, Review, Title
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+VISIBLE_ROWS = {
+    User: Q(is_hidden=False),
+    Title: Q(is_hidden=False),
+    GenresTitle: Q(title__is_hidden=False),
+    Review: Q(title__is_hidden=False, author__is_hidden=False),
+    Comment: Q(
+        review__title__is_hidden=False, review__author__is_hidden=False,
+        author__is_hidden=False),
+}
+
+
+def get_table(name):
+    """Таблица по имени файла без расширения (titles, review, ...)."""
+    for table in CSV_TABLES:
+        if table.file_name.rsplit('.', 1)[0] == name:
+            return table
+    return None
+
+
+def get_file_name(table, export_format):
+    return f'{table.file_name.rsplit(".", 1)[0]}.{export_format}'
+
+
+def iter_rows(table, chunk_size):
+    queryset = table.model.objects.filter(
+        VISIBLE_ROWS.get(table.model, Q()))
+    return queryset.order_by('pk').values_list(*table.columns).iterator(
+        chunk_size=chunk_size)
+
+
+def to_text(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def format_csv(table, rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(
+        ['' if value is None else to_text(value) for value in row]
+        for row in rows)
+    return buffer.getvalue()
+
+
+def format_ndjson(table, rows):
+    return ''.join(
+        json.dumps(
+            dict(zip(table.columns, map(to_text, row))),
+            ensure_ascii=False) + '\n'
+        for row in rows)
+
+
+FORMATTERS = {'csv': format_csv, 'ndjson': format_ndjson}
+
+
+def export_table(table, export_format, chunk_size=2000):
+    """Генератор кусков текста файла, по куску на chunk_size строк."""
+    formatter = FORMATTERS[export_format]
+    if export_format == 'csv':
+        yield format_csv(table, [table.columns])
+    rows = iter_rows(table, chunk_size)
+    chunk = list(islice(rows, chunk_size))
+    while chunk:
+        yield formatter(table, chunk)
+        chunk = list(islice(rows, chunk_size))
@@ -0,0 +1,84 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from reviews.models import SimilarTitle, Title
+from reviews.similarity import MEASURES, RatingMatrix
+
+
+class Command(BaseCommand):
+    help = "Computes similar titles from review scores"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Пересчитать все произведения, а не только изменившиеся')
+        parser.add_argument(
+            '--k', type=int, default=10,
+            help='Количество похожих произведений у каждого')
+        parser.add_argument(
+            '--measure', choices=MEASURES, default='adjusted',
+            help='Мера сходства: скорректированный или обычный косинус')
+        parser.add_argument(
+            '--chunk-size', type=int, default=256,
+            help='Количество произведений, считаемых одним блоком')
+
+    def handle(self, *args, **options):
+        # Отзывы, изменённые во время расчёта, попадут в следующий.
+        started = timezone.now()
+        titles = Title.objects.visible()
+        changed = None
+        if not options['full']:
+            changed = titles.filter(
+                Q(similar_computed_at__isnull=True)
+                | Q(updated_at__gt=F('similar_computed_at')))
+            if not changed.exists():
+                self.stdout.write('Nothing to update')
+                return
+        matrix = RatingMatrix.from_reviews(options['measure'])
+        title_ids = self.get_title_ids(
+            titles, changed, matrix, options['measure'])
+        for chunk in matrix.neighbours(
+                title_ids, options['k'], options['chunk_size']):
+            self.save_chunk(chunk, started)
+        self.stdout.write(f'Updated {len(title_ids)} titles')
+
+    def get_title_ids(self, titles, changed, matrix, measure):
+        """Произведения для пересчёта.
+
+        changed — произведения, у которых после прошлого расчёта
+        менялись отзывы (сигналы рейтинга обновляют updated_at), None —
+        пересчитать все. Оценка произведения меняет его сходство со
+        всеми произведениями, у которых с ним есть общий оценивший.
+        В скорректированном косинусе она ещё сдвигает среднюю оценку
+        автора, то есть строки всех оценённых им произведений, поэтому
+        пересчитываются и их соседи. Произведения, в чьих списках уже
+        есть изменившееся, пересчитываются всегда: общих оценивших
+        у них могло не остаться.
+        """
+        if changed is None:
+            return list(titles.order_by('pk').values_list('pk', flat=True))
+        title_ids = set(changed.values_list('pk', flat=True))
+        rows = matrix.related(sorted(title_ids))
+        if measure == 'adjusted':
+            rows = matrix.related(rows)
+        title_ids.update(int(pk) for pk in rows)
+        title_ids.update(SimilarTitle.objects.filter(
+            similar__in=changed.values('pk'), title__in=titles.values('pk'),
+        ).values_list('title_id', flat=True))
+        return sorted(title_ids)
+
+    def save_chunk(self, chunk, started):
+        title_ids = [title_id for title_id, _ in chunk]
+        with transaction.atomic():
+            SimilarTitle.objects.filter(title_id__in=title_ids).delete()
+            SimilarTitle.objects.bulk_create([
+                SimilarTitle(
+                    title_id=title_id, similar_id=similar_id, score=score,
+                    rank=rank)
+                for title_id, neighbours in chunk
+                for rank, (similar_id, score) in enumerate(neighbours, 1)
+            ])
+            Title.objects.filter(pk__in=title_ids).update(
+                similar_computed_at=started)
@@ -0,0 +1,34 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from reviews.csv_tables import CSV_TABLES
+from reviews.export import CONTENT_TYPES, export_table, get_file_name
+
+
+class Command(BaseCommand):
+    help = "Exports tables to csv files readable by load_from_csv or ndjson"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', default='export',
+            help='Каталог для файлов выгрузки')
+        parser.add_argument(
+            '--format', dest='export_format', choices=sorted(CONTENT_TYPES),
+            default='csv', help='Формат файлов')
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Количество строк, читаемых из базы за раз')
+
+    def handle(self, *args, **options):
+        os.makedirs(options['path'], exist_ok=True)
+        for table in CSV_TABLES:
+            file_name = get_file_name(table, options['export_format'])
+            self.stdout.write(f'Exporting {file_name} ... ', ending='')
+            path = os.path.join(options['path'], file_name)
+            with open(path, 'w', encoding='utf-8', newline='') as file:
+                for chunk in export_table(
+                        table, options['export_format'],
+                        options['chunk_size']):
+                    file.write(chunk)
+            self.stdout.write('Done')
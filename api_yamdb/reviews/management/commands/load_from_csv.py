@@ -1,115 +1,333 @@
 import csv
-from django.contrib.auth import get_user_model
-from django.core.management.base import BaseCommand
-from reviews.models import (Category, Comment, Genre, GenresTitle,
-                            Review, Title)
+import hashlib
+import io
+import os
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
 
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, IntegrityError, transaction
+from django.utils import timezone
 
-User = get_user_model()
+from reviews.csv_tables import CSV_TABLES, get_foreign_keys
+from reviews.models import Category, Genre, GenresTitle, Review, Title
+from reviews.signals import rows_loaded
+
+
+def read_rows(path):
+    """Построчно читает CSV-файл, пропуская заголовок."""
+    with open(path, encoding='utf-8', newline='') as csvfile:
+        reader = csv.reader(csvfile)
+        next(reader, None)
+        yield from reader
+
+
+def with_file_columns(table, path):
+    """Оставляет в описании таблицы только колонки, которые есть в файле.
+
+    Отсутствующие необязательные колонки не загружаются и при
+    синхронизации не меняются.
+    """
+    with open(path, encoding='utf-8', newline='') as csvfile:
+        header = next(csv.reader(csvfile), [])
+    required = len(table.columns) - len(table.optional)
+    if len(header) < required:
+        raise CommandError(
+            f'{table.file_name}: ожидается колонок не меньше {required}')
+    return table._replace(columns=table.columns[:len(header)])
+
+
+def batched(rows, batch_size):
+    rows = iter(rows)
+    batch = list(islice(rows, batch_size))
+    while batch:
+        yield batch
+        batch = list(islice(rows, batch_size))
+
+
+def content_hash(fields, values, from_csv=False):
+    """Хеш содержимого строки, одинаковый для данных из CSV и из базы."""
+    normalized = []
+    for field, value in zip(fields, values):
+        if from_csv and value == '' and field.null:
+            value = None
+        value = field.to_python(value)
+        if isinstance(value, datetime):
+            if timezone.is_naive(value):
+                value = timezone.make_aware(value, timezone.utc)
+            value = value.astimezone(timezone.utc).isoformat()
+        normalized.append(value)
+    return hashlib.blake2b(
+        repr(normalized).encode(), digest_size=16).digest()
+
+
+@contextmanager
+def keep_auto_now_add(model):
+    """Сохраняет даты из файла вместо подстановки auto_now_add."""
+    fields = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False)
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
 
 
 class Command(BaseCommand):
     help = "Loads data to database from csv files"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', default=os.path.join('static', 'data'),
+            help='Каталог с CSV-файлами')
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Количество строк в одной пачке вставки')
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Не использовать COPY в PostgreSQL, только bulk_create')
+        parser.add_argument(
+            '--sync', action='store_true',
+            help='Синхронизировать с уже загруженными данными: вставить '
+                 'и обновить только изменившиеся строки')
+        parser.add_argument(
+            '--prune', action='store_true',
+            help='С --sync удалить категории, жанры, произведения и их '
+                 'связи, которых нет в файлах; пользователи, отзывы '
+                 'и комментарии не удаляются')
+
     def handle(self, *args, **options):
+        self.path = options['path']
+        self.batch_size = options['batch_size']
+        self.use_copy = (
+            connection.vendor == 'postgresql' and not options['no_copy'])
+        self.known_ids = {}
+        self.prune = options['prune']
+        try:
+            with transaction.atomic():
+                if options['sync']:
+                    self.sync_tables()
+                else:
+                    self.load_tables()
+                self.reset_sequences()
+                for table in CSV_TABLES:
+                    rows_loaded.send(sender=table.model)
+        except IntegrityError as error:
+            raise CommandError(
+                f'Данные конфликтуют с уже загруженными: {error}. '
+                'Для повторной загрузки используйте --sync.')
+
+    def load_tables(self):
+        for table in CSV_TABLES:
+            self.stdout.write(f'Loading {table.label} ... ', ending='')
+            loaded = self.load_table(self.get_file_table(table))
+            self.stdout.write(f'Done ({loaded})')
+        Title.objects.refresh_ratings()
+
+    def sync_tables(self):
+        self.rating_title_ids = set()
+        stale_ids = {}
+        pruners = self.get_pruners() if self.prune else {}
+        for table in CSV_TABLES:
+            self.stdout.write(f'Syncing {table.label} ... ', ending='')
+            inserted, updated, stale = self.sync_table(
+                self.get_file_table(table))
+            stale_ids[table] = stale if table.model in pruners else set()
+            self.stdout.write(
+                f'Done (+{inserted} ~{updated} -{len(stale_ids[table])})')
+        # Удаление идёт в обратном порядке: сначала зависимые строки.
+        for table in reversed(CSV_TABLES):
+            ids = sorted(stale_ids[table])
+            for start in range(0, len(ids), self.batch_size):
+                pruners[table.model](ids[start:start + self.batch_size])
+        Title.objects.filter(
+            pk__in=self.rating_title_ids).refresh_ratings()
+
+    def get_pruners(self):
+        """Функции удаления пачки строк каталога по id.
+
+        Пользователи, отзывы и комментарии создаются и через API,
+        поэтому из файлов не удаляются. Жанры, категории и связи
+        удаляются запросами DELETE без загрузки зависимых объектов,
+        произведения скрываются и удаляются командой purge_hidden.
+        """
+        return {
+            GenresTitle: self.prune_genre_links,
+            Title: self.prune_titles,
+            Genre: self.prune_genres,
+            Category: self.prune_categories,
+        }
+
+    def prune_genre_links(self, ids):
+        links = GenresTitle.objects.filter(pk__in=ids)
+        Title.objects.filter(pk__in=links.values('title_id')).touch()
+        links._raw_delete(links.db)
+
+    def prune_titles(self, ids):
+        Title.objects.filter(pk__in=ids).update(
+            is_hidden=True, updated_at=timezone.now())
+
+    def prune_genres(self, ids):
+        links = GenresTitle.objects.filter(genre_id__in=ids)
+        Title.objects.filter(pk__in=links.values('title_id')).touch()
+        links.update(genre=None)
+        genres = Genre.objects.filter(pk__in=ids)
+        genres._raw_delete(genres.db)
+
+    def prune_categories(self, ids):
+        Title.objects.filter(category_id__in=ids).update(
+            category=None, updated_at=timezone.now())
+        categories = Category.objects.filter(pk__in=ids)
+        categories._raw_delete(categories.db)
+
+    def sync_table(self, table):
+        """Сравнивает файл с таблицей по id и хешу содержимого.
+
+        Возвращает количество вставленных и обновлённых строк
+        и множество id, которых больше нет в файле.
+        """
+        model = table.model
+        fields = [model._meta.get_field(name) for name in table.columns]
+        existing = {
+            row[0]: content_hash(fields, row)
+            for row in model.objects.values_list(*table.columns)
+            .order_by().iterator(chunk_size=self.batch_size)
+        }
+        self.known_ids[model] = set(existing)
+        inserted = updated = 0
+        rows = read_rows(os.path.join(self.path, table.file_name))
+        with keep_auto_now_add(model):
+            for batch in batched(rows, self.batch_size):
+                new_rows, changed_rows = [], []
+                for row in batch:
+                    pk = int(row[0])
+                    digest = existing.pop(pk, None)
+                    if digest is None:
+                        new_rows.append(row)
+                    elif digest != content_hash(fields, row, from_csv=True):
+                        changed_rows.append(row)
+                inserted += self.insert_rows(table, new_rows)
+                updated += self.update_rows(table, changed_rows)
+        return inserted, updated, set(existing)
+
+    def insert_rows(self, table, rows):
+        objects = self.build_objects(table, rows, first_line=None)
+        if self.use_copy:
+            self.copy_objects(table.model, objects)
+        else:
+            table.model.objects.bulk_create(objects)
+        self.known_ids[table.model].update(int(obj.pk) for obj in objects)
+        if table.model is Review:
+            self.rating_title_ids.update(int(obj.title_id) for obj in objects)
+        return len(objects)
+
+    def update_rows(self, table, rows):
+        objects = self.build_objects(table, rows, first_line=None)
+        if table.model is Review:
+            self.rating_title_ids.update(
+                Review.objects.filter(pk__in=[obj.pk for obj in objects])
+                .values_list('title_id', flat=True))
+            self.rating_title_ids.update(int(obj.title_id) for obj in objects)
+        # bulk_update не вызывает pre_save, поэтому auto_now
+        # заполняется вручную.
+        now = timezone.now()
+        auto_now = [
+            field.attname for field in table.model._meta.concrete_fields
+            if getattr(field, 'auto_now', False)
+        ]
+        for obj in objects:
+            for attname in auto_now:
+                setattr(obj, attname, now)
+        table.model.objects.bulk_update(
+            objects, list(table.columns[1:]) + auto_now)
+        return len(objects)
+
+    def get_file_table(self, table):
+        return with_file_columns(
+            table, os.path.join(self.path, table.file_name))
+
+    def get_known_ids(self, model):
+        if model not in self.known_ids:
+            self.known_ids[model] = set(
+                model._default_manager.values_list('pk', flat=True))
+        return self.known_ids[model]
+
+    def build_objects(self, table, rows, first_line):
+        foreign_keys = {
+            column: self.get_known_ids(model)
+            for column, model in get_foreign_keys(table).items()
+        }
+        # Пустые значения загружаются как NULL, как их считает
+        # content_hash при синхронизации.
+        nullable = {
+            name for name in table.columns
+            if table.model._meta.get_field(name).null
+        }
+        objects = []
+        for line, row in enumerate(rows, start=first_line or 0):
+            values = {
+                column: None if value == '' and column in nullable else value
+                for column, value in zip(table.columns, row)
+            }
+            for column, ids in foreign_keys.items():
+                value = values[column]
+                if value in (None, ''):
+                    values[column] = None
+                elif int(value) not in ids:
+                    where = f', строка {line}' if first_line else ''
+                    raise CommandError(
+                        f'{table.file_name}{where}: '
+                        f'{column}={value} не найден')
+            objects.append(table.model(**values))
+        return objects
+
+    def load_table(self, table):
+        ids = self.get_known_ids(table.model)
+        loaded = 0
+        rows = read_rows(os.path.join(self.path, table.file_name))
+        with keep_auto_now_add(table.model):
+            for batch in batched(rows, self.batch_size):
+                objects = self.build_objects(table, batch, loaded + 2)
+                if self.use_copy:
+                    self.copy_objects(table.model, objects)
+                else:
+                    table.model.objects.bulk_create(objects)
+                ids.update(int(obj.pk) for obj in objects)
+                loaded += len(objects)
+        return loaded
+
+    def copy_objects(self, model, objects):
+        """Вставляет пачку объектов через COPY ... FROM STDIN."""
+        fields = model._meta.concrete_fields
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for obj in objects:
+            writer.writerow([
+                field.get_db_prep_save(
+                    field.pre_save(obj, add=True), connection)
+                for field in fields
+            ])
+        buffer.seek(0)
+        quote = connection.ops.quote_name
+        columns = ', '.join(quote(field.column) for field in fields)
+        not_null = ', '.join(
+            quote(field.column) for field in fields if not field.null)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {quote(model._meta.db_table)} ({columns}) '
+                f'FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL ({not_null}))',
+                buffer,
+            )
 
-        print("Loading Users ... ", end="")
-        with open('static/data/users.csv') as csvfile:
-            users_reader = csv.reader(csvfile)
-            next(users_reader)
-            for row in users_reader:
-                User(
-                    id=row[0],
-                    username=row[1],
-                    email=row[2],
-                    role=row[3],
-                    bio=row[4],
-                    first_name=row[5],
-                    last_name=row[6],
-                ).save()
-            print('Done')
-
-        print("Loading Categories ... ", end="")
-        with open('static/data/category.csv') as csvfile:
-            categories_reader = csv.reader(csvfile)
-            next(categories_reader)
-            for row in categories_reader:
-                Category(
-                    id=row[0],
-                    name=row[1],
-                    slug=row[2],
-                ).save()
-            print('Done')
-
-        print("Loading Genres ... ", end="")
-        with open('static/data/genre.csv') as csvfile:
-            genres_reader = csv.reader(csvfile)
-            next(genres_reader)
-            for row in genres_reader:
-                Genre(
-                    id=row[0],
-                    name=row[1],
-                    slug=row[2],
-                ).save()
-            print('Done')
-
-        print("Loading Titles ... ", end="")
-        with open('static/data/titles.csv') as csvfile:
-            titles_reader = csv.reader(csvfile)
-            next(titles_reader)
-            for row in titles_reader:
-                category = Category.objects.get(id=row[3])
-                Title(
-                    id=row[0],
-                    name=row[1],
-                    year=row[2],
-                    category=category
-                ).save()
-            print('Done')
-
-        print("Loading Genre_Titles ... ", end="")
-        with open('static/data/genre_title.csv') as csvfile:
-            genre_titles_reader = csv.reader(csvfile)
-            next(genre_titles_reader)
-            for row in genre_titles_reader:
-                title = Title.objects.get(id=row[1])
-                genre = Genre.objects.get(id=row[2])
-                GenresTitle(
-                    id=row[0],
-                    title=title,
-                    genre=genre
-                ).save()
-            print('Done')
-
-        print("Loading Reviews ... ", end="")
-        with open('static/data/review.csv') as csvfile:
-            reviews_reader = csv.reader(csvfile)
-            next(reviews_reader)
-            for row in reviews_reader:
-                title = Title.objects.get(id=row[1])
-                author = User.objects.get(id=row[3])
-                Review(
-                    id=row[0],
-                    title_id=title.id,
-                    text=row[2],
-                    author=author,
-                    score=row[4],
-                    pub_date=row[5],
-                ).save()
-            print('Done')
-
-        print("Loading Comments ... ", end="")
-        with open('static/data/comments.csv') as csvfile:
-            comments_reader = csv.reader(csvfile)
-            next(comments_reader)
-            for row in comments_reader:
-                review = Review.objects.get(id=row[1])
-                author = User.objects.get(id=row[3])
-                Comment.objects.create(
-                    id=row[0],
-                    review=review,
-                    text=row[2],
-                    author=author,
-                    pub_date=row[4]
-                ).save()
-            print('Done')
+    def reset_sequences(self):
+        models = [table.model for table in CSV_TABLES]
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
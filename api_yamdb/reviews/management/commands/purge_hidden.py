@@ -0,0 +1,104 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from reviews.models import Comment, Review, Title
+from reviews.signals import rows_purged
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Deletes hidden titles and users with their reviews and comments"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество строк, удаляемых одной транзакцией')
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Работать постоянно, проверяя скрытые объекты с интервалом')
+        parser.add_argument(
+            '--interval', type=float, default=10,
+            help='Пауза между проверками, когда удалять нечего, секунд')
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        while True:
+            deleted = self.purge_batch()
+            if deleted:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def purge_batch(self):
+        """Удаляет одну пачку строк, возвращает их число.
+
+        Дочерние строки удаляются запросами DELETE без загрузки
+        объектов, сам объект — обычным delete(), когда у него
+        не осталось отзывов и комментариев.
+        """
+        title_id = Title.objects.filter(is_hidden=True).values_list(
+            'pk', flat=True).first()
+        if title_id is not None:
+            return (
+                self.delete_comments(
+                    Comment.objects.filter(review__title_id=title_id))
+                or self.delete_reviews(
+                    Review.objects.filter(title_id=title_id))
+                or Title.objects.filter(pk=title_id).delete()[0]
+            )
+        user_id = User.objects.filter(is_hidden=True).values_list(
+            'pk', flat=True).first()
+        if user_id is not None:
+            return (
+                self.delete_comments(
+                    Comment.objects.filter(author_id=user_id))
+                or self.delete_comments(
+                    Comment.objects.filter(review__author_id=user_id))
+                or self.delete_reviews(
+                    Review.objects.filter(author_id=user_id))
+                or User.objects.filter(pk=user_id).delete()[0]
+            )
+        return 0
+
+    def delete_comments(self, queryset):
+        with transaction.atomic():
+            rows = list(
+                queryset.select_for_update(of=('self',))
+                .values_list('pk', 'review_id')[:self.batch_size])
+            if not rows:
+                return 0
+            Comment.objects.filter(
+                pk__in=[pk for pk, _ in rows])._raw_delete(queryset.db)
+            # Как и сигнал удаления комментария, отмечает отзывы
+            # изменёнными для Last-Modified списка комментариев.
+            Review.objects.filter(
+                pk__in={review_id for _, review_id in rows}
+            ).update(updated_at=timezone.now())
+            rows_purged.send(sender=Comment)
+        return len(rows)
+
+    def delete_reviews(self, queryset):
+        with transaction.atomic():
+            rows = list(
+                queryset.select_for_update(of=('self',))
+                .values_list('pk', 'title_id')[:self.batch_size])
+            if not rows:
+                return 0
+            review_ids = [pk for pk, _ in rows]
+            # Комментарии, появившиеся после удаления предыдущих пачек.
+            Comment.objects.filter(
+                review_id__in=review_ids)._raw_delete(queryset.db)
+            Review.objects.filter(pk__in=review_ids)._raw_delete(queryset.db)
+            # Рейтинг меняется в той же транзакции, что и отзывы.
+            # Пересчёт, а не сдвиг: оценки скрытого автора уже
+            # исключены из рейтинга при скрытии.
+            Title.objects.filter(
+                pk__in={title_id for _, title_id in rows}).refresh_ratings()
+            rows_purged.send(sender=Review)
+        return len(rows)
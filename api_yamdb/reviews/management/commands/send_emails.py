@@ -0,0 +1,111 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from reviews.models import OutgoingEmail
+
+
+class Command(BaseCommand):
+    help = "Sends queued emails from the outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Количество писем, отправляемых через одно соединение')
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Работать постоянно, проверяя очередь с интервалом')
+        parser.add_argument(
+            '--interval', type=float, default=5,
+            help='Пауза между проверками пустой очереди, секунд')
+
+    def handle(self, *args, **options):
+        while True:
+            sent = self.send_batch(options['batch_size'])
+            if sent:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def send_batch(self, batch_size):
+        """Отправляет одну пачку писем, возвращает число обработанных."""
+        emails = self.claim(batch_size)
+        if not emails:
+            return 0
+        connection = get_connection(fail_silently=False)
+        try:
+            connection.open()
+        except Exception as error:
+            for email in emails:
+                self.mark_failed(email, error)
+            return len(emails)
+        try:
+            for email in emails:
+                self.send_one(connection, email)
+        finally:
+            connection.close()
+        return len(emails)
+
+    def claim(self, batch_size):
+        """Забирает пачку писем на отправку и фиксирует это сразу.
+
+        Блокировки строк держатся только на время короткой транзакции,
+        а не на время работы с SMTP. Письма, которые не отправил
+        упавший процесс, снова берутся через EMAIL_OUTBOX_CLAIM_TIMEOUT.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            ids = list(
+                OutgoingEmail.objects.select_for_update(skip_locked=True)
+                .filter(status__in=(OutgoingEmail.STATUS_PENDING,
+                                    OutgoingEmail.STATUS_SENDING),
+                        next_attempt_at__lte=now)
+                .order_by('next_attempt_at')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            OutgoingEmail.objects.filter(pk__in=ids).update(
+                status=OutgoingEmail.STATUS_SENDING,
+                next_attempt_at=now + timedelta(
+                    seconds=settings.EMAIL_OUTBOX_CLAIM_TIMEOUT))
+        return list(OutgoingEmail.objects.filter(pk__in=ids))
+
+    def send_one(self, connection, email):
+        message = EmailMessage(
+            email.subject, email.body, settings.ADMIN_EMAIL,
+            [email.recipient], connection=connection)
+        try:
+            message.send()
+        except Exception as error:
+            self.mark_failed(email, error)
+            return
+        OutgoingEmail.objects.filter(
+            pk=email.pk, status=OutgoingEmail.STATUS_SENDING,
+        ).update(status=OutgoingEmail.STATUS_SENT, sent_at=timezone.now())
+
+    def mark_failed(self, email, error):
+        attempts = email.attempts + 1
+        delay = settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (attempts - 1)
+        status = OutgoingEmail.STATUS_PENDING
+        if attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+            status = OutgoingEmail.STATUS_FAILED
+        emails = OutgoingEmail.objects.filter(
+            pk=email.pk, status=OutgoingEmail.STATUS_SENDING)
+        fields = {
+            'attempts': attempts,
+            'next_attempt_at': timezone.now() + timedelta(seconds=delay),
+            'last_error': repr(error),
+        }
+        try:
+            with transaction.atomic():
+                emails.update(status=status, **fields)
+        except IntegrityError:
+            # Пока письмо отправлялось, повторная регистрация поставила
+            # в очередь новое с другим кодом, старое больше не нужно.
+            emails.update(status=OutgoingEmail.STATUS_FAILED, **fields)
+        self.stderr.write(f'Не удалось отправить письмо {email.pk}: {error}')
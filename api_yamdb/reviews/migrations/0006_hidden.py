@@ -0,0 +1,23 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0005_outgoing_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='is_hidden',
+            field=models.BooleanField(db_index=True, default=False, verbose_name='Ожидает удаления'),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='is_hidden',
+            field=models.BooleanField(db_index=True, default=False, verbose_name='Ожидает удаления'),
+        ),
+    ]
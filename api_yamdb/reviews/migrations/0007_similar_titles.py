@@ -0,0 +1,38 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0006_hidden'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='title',
+            name='similar_computed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Дата расчёта похожих произведений'),
+        ),
+        migrations.CreateModel(
+            name='SimilarTitle',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Сходство')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Место')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='reviews.Title', verbose_name='Похожее произведение')),
+                ('title', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_titles', to='reviews.Title', verbose_name='Произведение')),
+            ],
+            options={
+                'verbose_name': 'Похожее произведение',
+                'verbose_name_plural': 'Похожие произведения',
+                'ordering': ('title', 'rank'),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='similartitle',
+            constraint=models.UniqueConstraint(fields=('title', 'rank'), name='unique_similar_rank'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0007_similar_titles'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='outgoingemail',
+            name='status',
+            field=models.CharField(choices=[('pending', 'ожидает отправки'), ('sending', 'отправляется'), ('sent', 'отправлено'), ('failed', 'не отправлено')], default='pending', max_length=16, verbose_name='Статус'),
+        ),
+    ]
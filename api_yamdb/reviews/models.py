@@ -1,7 +1,10 @@
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
 from reviews.validators import year_validator
 
@@ -49,6 +52,11 @@ class CustomUser(AbstractUser):
         blank=True,
         null=True
     )
+    is_hidden = models.BooleanField(
+        verbose_name='Ожидает удаления',
+        default=False,
+        db_index=True
+    )
 
     class Meta:
         verbose_name = 'Пользователь'
@@ -62,6 +70,23 @@ class CustomUser(AbstractUser):
     def is_moderator(self):
         return self.role == self.USER_ROLE_MODERATOR
 
+    def hide(self):
+        """Скрывает пользователя до удаления командой purge_hidden.
+
+        Его оценки сразу перестают учитываться в рейтинге, а
+        произведения и отзывы, под которыми он писал, отмечаются
+        изменёнными для Last-Modified их списков.
+        """
+        with transaction.atomic():
+            self.is_hidden = True
+            self.is_active = False
+            self.save(update_fields=('is_hidden', 'is_active'))
+            Title.objects.filter(pk__in=Review.objects.filter(
+                author=self).values('title_id')).refresh_ratings()
+            Review.objects.filter(pk__in=Comment.objects.filter(
+                author=self).values('review_id')).update(
+                    updated_at=timezone.now())
+
 
 class Category(models.Model):
     """Модель Категории."""
@@ -97,6 +122,36 @@ class Genre(models.Model):
         return self.name
 
 
+class TitleQuerySet(models.QuerySet):
+    """Запросы к произведениям."""
+
+    def refresh_ratings(self):
+        """Пересчитывает сохранённые суммы и количества оценок по отзывам.
+
+        Нужен после массовых операций, которые не вызывают сигналы модели
+        Review (bulk_create, QuerySet.update). Оценки скрытых
+        пользователей не учитываются.
+        """
+        reviews = Review.objects.filter(
+            title=OuterRef('pk'), author__is_hidden=False,
+        ).order_by().values('title')
+        return self.update(
+            rating_sum=Coalesce(Subquery(
+                reviews.annotate(total=Sum('score')).values('total')), 0),
+            rating_count=Coalesce(Subquery(
+                reviews.annotate(total=Count('pk')).values('total')), 0),
+            updated_at=timezone.now(),
+        )
+
+    def visible(self):
+        """Произведения, кроме скрытых до удаления."""
+        return self.filter(is_hidden=False)
+
+    def touch(self):
+        """Отмечает произведения изменёнными, например после смены жанра."""
+        return self.update(updated_at=timezone.now())
+
+
 class Title(models.Model):
     """Модель Произведения."""
 
@@ -111,6 +166,19 @@ class Title(models.Model):
     category = models.ForeignKey(
         Category, related_name='title', blank=True, null=True,
         on_delete=models.SET_NULL)
+    rating_sum = models.PositiveIntegerField(
+        verbose_name='Сумма оценок', default=0, editable=False)
+    rating_count = models.PositiveIntegerField(
+        verbose_name='Количество оценок', default=0, editable=False)
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения', auto_now=True)
+    is_hidden = models.BooleanField(
+        verbose_name='Ожидает удаления', default=False, db_index=True)
+    similar_computed_at = models.DateTimeField(
+        verbose_name='Дата расчёта похожих произведений', blank=True,
+        null=True, editable=False)
+
+    objects = TitleQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Произведение'
@@ -119,6 +187,18 @@ class Title(models.Model):
     def __str__(self):
         return self.name
 
+    @property
+    def rating(self):
+        """Средняя оценка произведения или None, если отзывов нет."""
+        if not self.rating_count:
+            return None
+        return self.rating_sum / self.rating_count
+
+    def hide(self):
+        """Скрывает произведение до удаления командой purge_hidden."""
+        self.is_hidden = True
+        self.save(update_fields=('is_hidden', 'updated_at'))
+
 
 class GenresTitle(models.Model):
     """Промежуточная модель для реализации отношения многие ко многим."""
@@ -130,6 +210,31 @@ class GenresTitle(models.Model):
         return f'{self.title} {self.genre}'
 
 
+class SimilarTitle(models.Model):
+    """Похожее произведение, рассчитанное командой build_similar."""
+
+    title = models.ForeignKey(
+        Title, on_delete=models.CASCADE, related_name='similar_titles',
+        verbose_name='Произведение')
+    similar = models.ForeignKey(
+        Title, on_delete=models.CASCADE, related_name='+',
+        verbose_name='Похожее произведение')
+    score = models.FloatField(verbose_name='Сходство')
+    rank = models.PositiveSmallIntegerField(verbose_name='Место')
+
+    class Meta:
+        verbose_name = 'Похожее произведение'
+        verbose_name_plural = 'Похожие произведения'
+        ordering = ('title', 'rank')
+        constraints = [
+            models.UniqueConstraint(
+                fields=('title', 'rank'), name='unique_similar_rank')
+        ]
+
+    def __str__(self):
+        return f'{self.title} ~ {self.similar}'
+
+
 class Review(models.Model):
     """Модель отзывов."""
 
@@ -149,6 +254,10 @@ class Review(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации отзыва'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения отзыва'
+    )
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -168,10 +277,31 @@ class Review(models.Model):
                 fields=('author', 'title'),
                 name='unique_review_on_title')
         ]
+        indexes = [
+            models.Index(
+                fields=('title', 'pub_date', 'id'),
+                name='review_title_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:25]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_rating()
+        return instance
+
+    def remember_rating(self):
+        """Запоминает произведение и оценку, учтённые в рейтинге."""
+        self._rating_snapshot = (self.title_id, self.score)
+
+    def save(self, *args, **kwargs):
+        # Рейтинг произведения обновляется сигналом post_save,
+        # поэтому отзыв и рейтинг сохраняются в одной транзакции.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
     """Модель комментариев."""
@@ -190,6 +320,10 @@ class Comment(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации комментария'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения комментария'
+    )
     review = models.ForeignKey(
         Review,
         on_delete=models.CASCADE,
@@ -197,5 +331,73 @@ class Comment(models.Model):
         related_name='comments'
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=('review', 'pub_date', 'id'),
+                name='comment_review_pub_date_idx'),
+        ]
+
     def __str__(self):
         return self.text[:25]
+
+
+class OutgoingEmail(models.Model):
+    """Модель письма в очереди на отправку."""
+
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    CHOICE_STATUS = (
+        (STATUS_PENDING, 'ожидает отправки'),
+        (STATUS_SENDING, 'отправляется'),
+        (STATUS_SENT, 'отправлено'),
+        (STATUS_FAILED, 'не отправлено'),
+    )
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        verbose_name='Получатель',
+        related_name='outgoing_emails'
+    )
+    recipient = models.EmailField(
+        verbose_name='Адрес получателя', max_length=254)
+    subject = models.CharField(verbose_name='Тема', max_length=255)
+    body = models.TextField(verbose_name='Текст письма')
+    status = models.CharField(
+        verbose_name='Статус',
+        max_length=16,
+        choices=CHOICE_STATUS,
+        default=STATUS_PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(
+        verbose_name='Попыток отправки', default=0)
+    next_attempt_at = models.DateTimeField(
+        verbose_name='Следующая попытка', default=timezone.now)
+    last_error = models.TextField(verbose_name='Последняя ошибка', blank=True)
+    created_at = models.DateTimeField(
+        verbose_name='Дата создания', auto_now_add=True)
+    sent_at = models.DateTimeField(
+        verbose_name='Дата отправки', blank=True, null=True)
+
+    class Meta:
+        verbose_name = 'Исходящее письмо'
+        verbose_name_plural = 'Исходящие письма'
+        constraints = [
+            # Повторная регистрация заменяет неотправленное письмо,
+            # а не добавляет второе.
+            models.UniqueConstraint(
+                fields=('user',),
+                condition=models.Q(status='pending'),
+                name='unique_pending_email_per_user'),
+        ]
+        indexes = [
+            models.Index(
+                fields=('status', 'next_attempt_at'),
+                name='outgoing_email_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.recipient}: {self.subject}'
@@ -0,0 +1,120 @@
+"""Полнотекстовый поиск по произведениям.
+
+PostgreSQL: хранимая генерируемая колонка tsvector с GIN-индексом
+и триграммный индекс по названию (ускоряет и name__contains).
+SQLite: внешняя таблица FTS5, которую поддерживают триггеры.
+Остальные базы ищут через icontains без индекса.
+
+Индексы создаются идемпотентно после каждой миграции: SQLite
+пересоздаёт таблицу при изменении схемы и теряет триггеры.
+"""
+import re
+
+from django.db import connections
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = 'russian'
+FTS_TABLE = 'reviews_title_fts'
+
+POSTGRES_INDEX_SQL = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    f'''ALTER TABLE reviews_title ADD COLUMN IF NOT EXISTS search_document
+        tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(name, '')), 'A')
+            || setweight(
+                to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'B')
+        ) STORED''',
+    '''CREATE INDEX IF NOT EXISTS title_search_document_idx
+        ON reviews_title USING gin (search_document)''',
+    '''CREATE INDEX IF NOT EXISTS title_name_trgm_idx
+        ON reviews_title USING gin (name gin_trgm_ops)''',
+)
+
+SQLITE_INDEX_SQL = (
+    f'''CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, description, content='reviews_title', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2')''',
+    f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert
+        AFTER INSERT ON reviews_title BEGIN
+            INSERT INTO {FTS_TABLE} (rowid, name, description)
+            VALUES (new.id, new.name, new.description);
+        END''',
+    f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete
+        AFTER DELETE ON reviews_title BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, name, description)
+            VALUES ('delete', old.id, old.name, old.description);
+        END''',
+    f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update
+        AFTER UPDATE OF name, description ON reviews_title BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, name, description)
+            VALUES ('delete', old.id, old.name, old.description);
+            INSERT INTO {FTS_TABLE} (rowid, name, description)
+            VALUES (new.id, new.name, new.description);
+        END''',
+    f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')",
+)
+
+
+def install_search_index(connection):
+    """Создаёт поисковые индексы, если их ещё нет."""
+    statements = {
+        'postgresql': POSTGRES_INDEX_SQL,
+        'sqlite': SQLITE_INDEX_SQL,
+    }.get(connection.vendor, ())
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def search_titles(queryset, query):
+    """Фильтрует произведения по запросу и сортирует по релевантности.
+
+    Добавляет к выборке аннотацию search_rank.
+    """
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        queryset = _search_postgresql(queryset, query)
+    elif vendor == 'sqlite':
+        queryset = _search_sqlite(queryset, query)
+    else:
+        queryset = queryset.filter(
+            Q(name__icontains=query) | Q(description__icontains=query)
+        ).annotate(search_rank=Value(0.0, output_field=FloatField()))
+    return queryset.order_by('-search_rank', 'pk')
+
+
+def _search_postgresql(queryset, query):
+    tsquery = f"plainto_tsquery('{SEARCH_CONFIG}', %s)"
+    pattern = '%{}%'.format(re.sub(r'([\\%_])', r'\\\1', query))
+    return queryset.extra(
+        where=[
+            f'(reviews_title.search_document @@ {tsquery} '
+            'OR reviews_title.name ILIKE %s)'
+        ],
+        params=[query, pattern],
+    ).annotate(search_rank=RawSQL(
+        f'ts_rank(reviews_title.search_document, {tsquery}) '
+        '+ similarity(reviews_title.name, %s)',
+        (query, query), output_field=FloatField(),
+    ))
+
+
+def _search_sqlite(queryset, query):
+    words = re.findall(r'\w+', query)
+    if not words:
+        return queryset.none().annotate(
+            search_rank=Value(0.0, output_field=FloatField()))
+    # Каждое слово ищется как префикс, слова объединяются через AND.
+    match = ' '.join('"{}"*'.format(word) for word in words)
+    return queryset.extra(
+        where=[
+            f'reviews_title.id IN (SELECT rowid FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s)'
+        ],
+        params=[match],
+    ).annotate(search_rank=RawSQL(
+        f'(SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} '
+        f'WHERE {FTS_TABLE} MATCH %s AND rowid = reviews_title.id)',
+        (match,), output_field=FloatField(),
+    ))
@@ -0,0 +1,100 @@
+from django.db import connections, transaction
+from django.db.models import F
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from .models import Category, Comment, Genre, GenresTitle, Review, Title
+from .search import install_search_index
+
+# Строки модели sender удалены запросом DELETE в обход сигналов
+# post_delete (команда purge_hidden).
+rows_purged = Signal()
+
+# Строки модели sender вставлены, изменены или удалены пачками
+# в обход сигналов post_save (команда load_from_csv).
+rows_loaded = Signal()
+
+
+def shift_title_rating(title_id, score_delta, count_delta):
+    """Сдвигает сохранённые сумму и количество оценок произведения."""
+    Title.objects.filter(pk=title_id).update(
+        rating_sum=F('rating_sum') + score_delta,
+        rating_count=F('rating_count') + count_delta,
+        updated_at=timezone.now(),
+    )
+
+
+def recount_title_ratings(*title_ids):
+    """Пересчитывает рейтинги произведений по отзывам в базе.
+
+    Строки произведений сначала блокируются: блокировка дожидается
+    параллельных правок их отзывов, и пересчёт видит их оценки.
+    """
+    with transaction.atomic():
+        titles = Title.objects.filter(pk__in=title_ids)
+        list(titles.select_for_update().order_by('pk').values_list('pk'))
+        titles.refresh_ratings()
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_review_save(sender, instance, created, **kwargs):
+    if created:
+        shift_title_rating(instance.title_id, int(instance.score), 1)
+    else:
+        # Оценка из снимка могла устареть после параллельной правки
+        # отзыва, поэтому при изменении рейтинг не сдвигается,
+        # а пересчитывается.
+        snapshot = getattr(instance, '_rating_snapshot', None)
+        old_title_id = snapshot[0] if snapshot else instance.title_id
+        recount_title_ratings(old_title_id, instance.title_id)
+    instance.remember_rating()
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_review_delete(sender, instance, **kwargs):
+    shift_title_rating(instance.title_id, -int(instance.score), -1)
+
+
+@receiver(post_delete, sender=Comment)
+def touch_review_on_comment_delete(sender, instance, **kwargs):
+    # Удаление не меняет максимальную дату изменения комментариев,
+    # поэтому для Last-Modified списка отмечается сам отзыв.
+    Review.objects.filter(pk=instance.review_id).update(
+        updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_save, sender=Category)
+def touch_titles_on_rename(sender, instance, created, **kwargs):
+    if not created:
+        touch_related_titles(sender, instance)
+
+
+@receiver(pre_delete, sender=Genre)
+@receiver(pre_delete, sender=Category)
+def touch_related_titles(sender, instance, **kwargs):
+    field = 'genre' if sender is Genre else 'category'
+    Title.objects.filter(**{field: instance}).touch()
+
+
+@receiver(post_save, sender=GenresTitle)
+@receiver(post_delete, sender=GenresTitle)
+def touch_title_on_genre_link(sender, instance, **kwargs):
+    Title.objects.filter(pk=instance.title_id).touch()
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def touch_titles_on_genre_set(sender, instance, action, reverse, pk_set,
+                              **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        Title.objects.filter(pk=instance.pk).touch()
+    elif pk_set:
+        Title.objects.filter(pk__in=pk_set).touch()
+
+
+def install_search_index_after_migrate(sender, using, **kwargs):
+    install_search_index(connections[using])
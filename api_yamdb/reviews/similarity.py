@@ -0,0 +1,142 @@
+"""Похожие произведения по оценкам пользователей (item-to-item).
+
+Оценки из Review образуют разреженную матрицу «произведение ×
+пользователь», которая хранится как два набора массивов NumPy: по
+строкам (CSR) и по столбцам (CSC). Строки нормируются, поэтому
+сходство пары произведений — скалярное произведение их строк.
+
+Для пачки произведений произведения строк со всеми остальными
+считаются без циклов Python: каждая оценка пачки размножается на
+оценки того же пользователя в CSC, суммы по парам набираются
+np.bincount в плотный блок «пачка × все произведения», из которого
+np.argpartition выбирает k соседей. Размер блока ограничивает
+chunk_size.
+
+cosine — косинус исходных оценок, adjusted — скорректированный
+косинус: из оценки вычитается средняя оценка её автора.
+"""
+import numpy as np
+
+from .models import Review
+
+MEASURES = ('adjusted', 'cosine')
+
+
+def expand(starts, counts):
+    """Позиции всех элементов отрезков [start, start + count)."""
+    offsets = np.cumsum(counts) - counts
+    return (np.arange(counts.sum(), dtype=np.int64)
+            + np.repeat(starts - offsets, counts))
+
+
+def compress(keys, size):
+    """Порядок сортировки по keys и указатели начала групп."""
+    order = np.argsort(keys, kind='stable')
+    pointers = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=size), out=pointers[1:])
+    return order, pointers
+
+
+class RatingMatrix:
+    """Нормированная разреженная матрица оценок."""
+
+    def __init__(self, title_ids, user_ids, scores, measure='adjusted'):
+        self.title_ids, rows = np.unique(title_ids, return_inverse=True)
+        _, columns = np.unique(user_ids, return_inverse=True)
+        rows, columns = rows.ravel(), columns.ravel()
+        values = np.asarray(scores, dtype=np.float64)
+        if measure == 'adjusted' and len(values):
+            sums = np.bincount(columns, weights=values)
+            values = values - (sums / np.bincount(columns))[columns]
+        norms = np.sqrt(np.bincount(
+            rows, weights=values ** 2, minlength=len(self.title_ids)))
+        values = values / np.where(norms > 0, norms, 1)[rows]
+
+        order, self.row_pointers = compress(rows, len(self.title_ids))
+        self.row_columns, self.row_values = columns[order], values[order]
+        order, self.column_pointers = compress(
+            columns, columns.max() + 1 if len(columns) else 0)
+        self.column_rows, self.column_values = rows[order], values[order]
+
+    @classmethod
+    def from_reviews(cls, measure='adjusted'):
+        """Матрица по отзывам видимых пользователей на видимые произведения."""
+        ratings = np.array(list(Review.objects.filter(
+            title__is_hidden=False, author__is_hidden=False,
+        ).order_by().values_list('title_id', 'author_id', 'score')),
+            dtype=np.int64).reshape(-1, 3)
+        return cls(ratings[:, 0], ratings[:, 1], ratings[:, 2], measure)
+
+    def similarities(self, rows):
+        """Плотный блок сходства строк rows со всеми строками."""
+        size = len(self.title_ids)
+        counts = np.diff(self.row_pointers)[rows]
+        entries = expand(self.row_pointers[rows], counts)
+        owners = np.repeat(np.arange(len(rows)), counts)
+        columns = self.row_columns[entries]
+        partner_counts = np.diff(self.column_pointers)[columns]
+        partners = expand(self.column_pointers[columns], partner_counts)
+        pairs = np.repeat(np.arange(len(entries)), partner_counts)
+        block = np.bincount(
+            owners[pairs] * size + self.column_rows[partners],
+            weights=self.row_values[entries][pairs]
+            * self.column_values[partners],
+            minlength=len(rows) * size,
+        ).reshape(len(rows), size)
+        block[np.arange(len(rows)), rows] = -np.inf
+        return block
+
+    def locate(self, title_ids):
+        """Строки произведений и маска тех, у которых есть оценки."""
+        positions = np.searchsorted(self.title_ids, title_ids)
+        positions = np.minimum(positions, max(len(self.title_ids) - 1, 0))
+        known = (self.title_ids[positions] == title_ids
+                 if len(self.title_ids) else np.zeros(len(title_ids), bool))
+        return positions, known
+
+    def related(self, title_ids):
+        """id произведений, у которых есть общий оценивший с title_ids.
+
+        Сами title_ids с оценками тоже входят в результат.
+        """
+        positions, known = self.locate(
+            np.asarray(title_ids, dtype=np.int64))
+        rows = positions[known]
+        columns = np.unique(self.row_columns[expand(
+            self.row_pointers[rows], np.diff(self.row_pointers)[rows])])
+        partners = self.column_rows[expand(
+            self.column_pointers[columns],
+            np.diff(self.column_pointers)[columns])]
+        return self.title_ids[np.unique(partners)]
+
+    def neighbours(self, title_ids, k=10, chunk_size=256):
+        """Пачки списков [(id похожего, сходство), ...] по убыванию.
+
+        Отдаёт пары (id произведения, список) пачками по chunk_size.
+        В список попадают до k произведений с положительным сходством,
+        у произведений без оценок он пуст.
+        """
+        title_ids = np.asarray(title_ids, dtype=np.int64)
+        positions, known = self.locate(title_ids)
+        k = min(k, len(self.title_ids) - 1)
+        for start in range(0, len(title_ids), chunk_size):
+            ids = title_ids[start:start + chunk_size]
+            found = known[start:start + chunk_size]
+            result = {int(pk): [] for pk in ids}
+            if k > 0 and found.any():
+                rows = positions[start:start + chunk_size][found]
+                block = self.similarities(rows)
+                top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+                top_scores = np.take_along_axis(block, top, axis=1)
+                # По убыванию сходства, при равенстве — по id.
+                order = np.lexsort((top, -top_scores), axis=1)
+                top = np.take_along_axis(top, order, axis=1)
+                top_scores = np.take_along_axis(top_scores, order, axis=1)
+                for pk, similar, scores in zip(
+                        ids[found], self.title_ids[top], top_scores):
+                    result[int(pk)] = [
+                        (int(similar_id), float(score))
+                        for similar_id, score in zip(similar, scores)
+                        if score > 1e-9
+                    ]
+            yield list(result.items())
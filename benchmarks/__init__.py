@@ -0,0 +1,36 @@
+"""Бенчмарки YaMDb, запускаются из корня репозитория:
+
+    python -m benchmarks.<имя>
+"""
+import os
+import sys
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django(**environ):
+    """Настраивает Django на отдельной базе SQLite во временном каталоге."""
+    sys.path.insert(0, os.path.join(ROOT_DIR, 'api_yamdb'))
+    workdir = tempfile.mkdtemp(prefix='yamdb-bench-')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api_yamdb.settings')
+    os.environ.setdefault('DB_ENGINE', 'django.db.backends.sqlite3')
+    os.environ.setdefault('DB_NAME', os.path.join(workdir, 'db.sqlite3'))
+    os.environ.setdefault(
+        'THROTTLE_DATABASE', os.path.join(workdir, 'throttle.sqlite3'))
+    os.environ.update(environ)
+
+    import django
+    django.setup()
+    return workdir
+
+
+def migrate():
+    from django.core.management import call_command
+    from django.db import connection
+
+    if connection.vendor == 'sqlite':
+        # WAL позволяет читать во время записи из других потоков.
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode=WAL')
+    call_command('migrate', verbosity=0)
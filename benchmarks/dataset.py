@@ -0,0 +1,95 @@
+"""Синтетический набор данных для бенчмарков."""
+import random
+from dataclasses import dataclass, field
+
+WORDS = (
+    'ночь', 'город', 'море', 'время', 'дорога', 'звезда', 'песня', 'огонь',
+    'ветер', 'память', 'сад', 'тень', 'зима', 'свет', 'река', 'остров',
+)
+
+
+@dataclass
+class Dataset:
+    """Идентификаторы сгенерированных объектов."""
+
+    title_ids: list
+    genre_slugs: list
+    category_slugs: list
+    usernames: list
+    review_ids: list = field(default_factory=list)
+    # Пары (id произведения, id отзыва) для вложенных URL комментариев.
+    review_paths: list = field(default_factory=list)
+    comment_paths: list = field(default_factory=list)
+
+
+def phrase(rng, size):
+    return ' '.join(rng.choice(WORDS) for _ in range(size))
+
+
+def seed_dataset(titles=1000, genres=20, categories=5, users=200,
+                 reviews_per_title=5, comments_per_review=2, seed=0):
+    """Заполняет пустую базу пачками bulk_create с явными id."""
+    from django.contrib.auth import get_user_model
+
+    from reviews.models import (Category, Comment, Genre, GenresTitle,
+                                Review, Title)
+
+    user_model = get_user_model()
+    rng = random.Random(seed)
+    reviews_per_title = min(reviews_per_title, users)
+    user_model.objects.bulk_create([
+        user_model(
+            id=number, username=f'user{number}',
+            email=f'user{number}@yamdb.fake', confirmation_code='code',
+            role=user_model.USER_ROLE_ADMIN if number == 1
+            else user_model.USER_ROLE_USER)
+        for number in range(1, users + 1)
+    ])
+    Category.objects.bulk_create([
+        Category(id=number, name=f'Категория {number}',
+                 slug=f'category-{number}')
+        for number in range(1, categories + 1)
+    ])
+    Genre.objects.bulk_create([
+        Genre(id=number, name=f'Жанр {number}', slug=f'genre-{number}')
+        for number in range(1, genres + 1)
+    ])
+    Title.objects.bulk_create([
+        Title(id=number, name=phrase(rng, 3).capitalize(),
+              year=rng.randint(1950, 2022), description=phrase(rng, 12),
+              category_id=rng.randint(1, categories))
+        for number in range(1, titles + 1)
+    ])
+    GenresTitle.objects.bulk_create([
+        GenresTitle(title_id=title_id, genre_id=genre_id)
+        for title_id in range(1, titles + 1)
+        for genre_id in rng.sample(range(1, genres + 1), min(3, genres))
+    ])
+
+    dataset = Dataset(
+        title_ids=list(range(1, titles + 1)),
+        genre_slugs=[f'genre-{number}' for number in range(1, genres + 1)],
+        category_slugs=[
+            f'category-{number}' for number in range(1, categories + 1)],
+        usernames=[f'user{number}' for number in range(1, users + 1)],
+    )
+    reviews, comments = [], []
+    for title_id in dataset.title_ids:
+        first_author = rng.randrange(users)
+        for offset in range(reviews_per_title):
+            review_id = len(reviews) + 1
+            reviews.append(Review(
+                id=review_id, title_id=title_id,
+                author_id=(first_author + offset) % users + 1,
+                text=phrase(rng, 20), score=rng.randint(1, 10)))
+            dataset.review_paths.append((title_id, review_id))
+            for _ in range(comments_per_review):
+                comments.append(Comment(
+                    id=len(comments) + 1, review_id=review_id,
+                    author_id=rng.randint(1, users), text=phrase(rng, 8)))
+                dataset.comment_paths.append(
+                    (title_id, review_id, len(comments)))
+    Review.objects.bulk_create(reviews)
+    Comment.objects.bulk_create(comments)
+    Title.objects.refresh_ratings()
+    return dataset
@@ -0,0 +1,94 @@
+"""Накладные расходы соединения с базой на запрос.
+
+    python -m benchmarks.db_connections [--requests N] [--threads N]
+
+Выполняет одинаковые «запросы» (сигналы request_started и
+request_finished вокруг одного SELECT) в трёх режимах: новое соединение
+на каждый запрос (CONN_MAX_AGE=0), постоянное соединение потока с
+проверкой перед запросом и пул api.db. По умолчанию работает на SQLite;
+чтобы замерить PostgreSQL, задайте DB_ENGINE, DB_NAME, DB_HOST и
+остальные переменные базы, как для проекта.
+"""
+import argparse
+import statistics
+import threading
+import time
+
+from benchmarks import migrate, setup_django
+
+
+def run_requests(alias, count, timings):
+    from django.core.signals import request_finished, request_started
+    from django.db import connections
+
+    from reviews.models import Title
+
+    for _ in range(count):
+        started = time.perf_counter()
+        request_started.send(sender=None)
+        Title.objects.using(alias).filter(pk=1).first()
+        request_finished.send(sender=None)
+        timings.append(time.perf_counter() - started)
+    connections[alias].close()
+
+
+def measure(alias, requests, threads):
+    timings = []
+    workers = [
+        threading.Thread(target=run_requests, args=(alias, requests, timings))
+        for _ in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    timings.sort()
+    return (statistics.mean(timings), timings[len(timings) // 2],
+            timings[int(len(timings) * 0.99)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=2000,
+                        help='запросов на поток')
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--pool-size', type=int, default=2)
+    options = parser.parse_args()
+    setup_django()
+    migrate()
+
+    from django.conf import settings
+    from django.db import connections
+
+    from api.db.pool import get_pool_stats
+    from benchmarks.dataset import seed_dataset
+
+    seed_dataset(titles=10, users=10, reviews_per_title=0)
+    primary = settings.DATABASES['default']
+    engine = primary['ENGINE']
+    settings.DATABASES.update({
+        'reconnect': dict(primary, CONN_MAX_AGE=0),
+        'persistent': dict(
+            primary, CONN_MAX_AGE=None, CONN_HEALTH_CHECKS=True),
+        'pooled': dict(
+            primary, CONN_MAX_AGE=0,
+            ENGINE='api.db.' + engine.rsplit('.', 1)[-1],
+            POOL={'SIZE': options.pool_size}),
+    })
+    connections.__dict__.pop('databases', None)
+    connections.__init__(settings.DATABASES)
+
+    print(f'{engine}, {options.threads} потоков по '
+          f'{options.requests} запросов')
+    baseline = None
+    for alias in ('reconnect', 'persistent', 'pooled'):
+        mean, median, p99 = measure(alias, options.requests, options.threads)
+        baseline = baseline or mean
+        print(f'  {alias:<11} среднее {mean * 1e6:8.1f} мкс  '
+              f'p50 {median * 1e6:8.1f} мкс  p99 {p99 * 1e6:8.1f} мкс  '
+              f'экономия {(baseline - mean) * 1e6:7.1f} мкс/запрос')
+    print(f'  пул: {get_pool_stats()["pooled"]}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Сравнение JSON-рендереров на страницах по 1000 объектов.
+
+    python -m benchmarks.json_render [--items N] [--repeat N]
+
+Рендерит вывод TitleSerializer и ReviewSerializer стандартным
+JSONRenderer DRF и FastJSONRenderer (с orjson, если он установлен,
+и с откатом на json), печатает время и пиковую память рендеринга
+и проверяет, что вывод совпадает побайтно.
+"""
+import argparse
+import time
+import tracemalloc
+from contextlib import nullcontext
+from unittest import mock
+
+from benchmarks import migrate, setup_django
+from benchmarks.dataset import seed_dataset
+
+
+def measure(render, data, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        render(data)
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    output = render(data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return output, min(timings), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    options = parser.parse_args()
+    setup_django()
+    migrate()
+
+    from rest_framework.renderers import JSONRenderer
+
+    from api import renderers
+    from api.serializers import ReviewSerializer, TitleSerializer
+    from reviews.models import Review, Title
+
+    seed_dataset(titles=options.items, reviews_per_title=1,
+                 comments_per_review=0)
+    pages = {
+        'TitleSerializer': TitleSerializer(
+            Title.objects.select_related('category')
+            .prefetch_related('genre')[:options.items], many=True).data,
+        'ReviewSerializer': ReviewSerializer(
+            Review.objects.select_related('author', 'title')
+            [:options.items], many=True).data,
+    }
+    candidates = [('JSONRenderer (DRF)', JSONRenderer().render, None)]
+    if renderers.orjson is not None:
+        candidates.append(('FastJSONRenderer (orjson)',
+                           renderers.FastJSONRenderer().render, None))
+    candidates.append(('FastJSONRenderer (json)',
+                       renderers.FastJSONRenderer().render,
+                       mock.patch.object(renderers, 'orjson', None)))
+
+    for page, data in pages.items():
+        print(f'{page}, {len(data)} объектов')
+        expected = None
+        for name, render, patch in candidates:
+            with patch or nullcontext():
+                output, seconds, peak = measure(render, data, options.repeat)
+            expected = expected or output
+            same = 'совпадает' if output == expected else 'ОТЛИЧАЕТСЯ'
+            print(f'  {name:<28} {seconds * 1000:8.2f} мс  '
+                  f'пик {peak / 1024:8.0f} КиБ  {len(output)} байт, {same}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Сравнение сериализаторов списков на страницах по 1000 объектов.
+
+    python -m benchmarks.list_serializers [--items N] [--repeat N]
+
+Строит страницу произведений и отзывов обычными сериализаторами DRF
+(с загрузкой моделей) и облегчёнными из api.read_serializers (через
+.values()), печатает время, число SQL-запросов и проверяет, что JSON
+совпадает побайтно.
+"""
+import argparse
+import time
+
+from benchmarks import migrate, setup_django
+from benchmarks.dataset import seed_dataset
+
+
+def measure(build, repeat):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        build()
+        timings.append(time.perf_counter() - started)
+    with CaptureQueriesContext(connection) as queries:
+        data = build()
+    return data, min(timings), len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    options = parser.parse_args()
+    setup_django()
+    migrate()
+
+    from api.read_serializers import (ReviewValuesSerializer,
+                                      TitleValuesSerializer)
+    from api.renderers import FastJSONRenderer
+    from api.serializers import ReviewSerializer, TitleSerializer
+    from reviews.models import Review, Title
+
+    seed_dataset(titles=options.items, reviews_per_title=1,
+                 comments_per_review=0)
+    titles = Title.objects.select_related('category').prefetch_related(
+        'genre').order_by('pk')
+    reviews = Review.objects.select_related('author', 'title').order_by(
+        'pub_date', 'id')
+    pages = (
+        (titles, TitleSerializer, TitleValuesSerializer),
+        (reviews, ReviewSerializer, ReviewValuesSerializer),
+    )
+    render = FastJSONRenderer().render
+    for queryset, serializer_class, values_class in pages:
+        page = slice(0, options.items)
+        candidates = (
+            (serializer_class.__name__, lambda: serializer_class(
+                queryset[page], many=True).data),
+            (values_class.__name__, lambda: values_class().to_representation(
+                values_class().get_rows(queryset)[page])),
+        )
+        print(f'{options.items} объектов')
+        expected = baseline = None
+        for name, build in candidates:
+            data, seconds, queries = measure(build, options.repeat)
+            output = render(data)
+            expected = expected or output
+            baseline = baseline or seconds
+            same = 'совпадает' if output == expected else 'ОТЛИЧАЕТСЯ'
+            print(f'  {name:<24} {seconds * 1000:8.2f} мс  '
+                  f'x{baseline / seconds:4.1f}  {queries} SQL, {same}')
+
+
+if __name__ == '__main__':
+    main()
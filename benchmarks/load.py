@@ -0,0 +1,405 @@
+"""Нагрузочный прогон API через WSGI-приложение без сети.
+
+    python -m benchmarks.load [--titles N] [--requests N] [--concurrency N]
+                              [--output results.json] [--compare old.json]
+
+Заполняет отдельную базу SQLite синтетическими данными, выполняет
+перемешанную смесь запросов ко всем маршрутам api/urls.py в нескольких
+потоках и печатает пропускную способность, p50/p95/p99 задержки
+и количество SQL-запросов по каждому эндпоинту. Результат сохраняется
+в JSON для сравнения между прогонами.
+
+По умолчанию используется SQLite, где параллельные записи могут
+завершаться ошибкой database is locked; исключения сервера
+перечисляются в отчёте. Для другой базы задайте DB_ENGINE, DB_NAME
+и остальные переменные окружения, как для проекта.
+"""
+import argparse
+import io
+import json
+import queue
+import random
+import statistics
+import sys
+import threading
+import time
+from collections import Counter, namedtuple
+from datetime import datetime, timezone
+from urllib.parse import quote
+from wsgiref.util import setup_testing_defaults
+
+from benchmarks import migrate, setup_django
+from benchmarks.dataset import phrase, seed_dataset
+
+UNLIMITED_RATE = '1000000/second'
+
+Scenario = namedtuple('Scenario', 'name route method build')
+Result = namedtuple('Result', 'name status seconds queries')
+
+
+def percentile(values, fraction):
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+class Harness:
+    """Сценарии запросов и их выполнение через WSGI."""
+
+    def __init__(self, application, dataset, requests, seed):
+        self.application = application
+        self.dataset = dataset
+        self.requests = requests
+        self.seed = seed
+        self.tokens = {}
+        self.exceptions = Counter()
+        self.prepare_disposable()
+
+    def prepare_disposable(self):
+        """Объекты, которые сценарии записи расходуют по одному."""
+        from reviews.models import Category, Genre, Title
+
+        first = max(self.dataset.title_ids) + 1
+        self.fresh_title_ids = list(range(first, first + 2 * self.requests))
+        Title.objects.bulk_create([
+            Title(id=title_id, name=f'Новинка {title_id}', year=2022)
+            for title_id in self.fresh_title_ids
+        ])
+        for model, prefix in ((Category, 'category'), (Genre, 'genre')):
+            model.objects.bulk_create([
+                model(name=f'Временный {number}',
+                      slug=f'{prefix}-tmp-{number}')
+                for number in range(self.requests)
+            ])
+
+    def get_token(self, username):
+        if username not in self.tokens:
+            from django.contrib.auth import get_user_model
+
+            from api.authentication import get_access_token
+
+            user = get_user_model().objects.get(username=username)
+            self.tokens[username] = str(get_access_token(user))
+        return self.tokens[username]
+
+    def scenarios(self):
+        data = self.dataset
+        admin = data.usernames[0]
+        fresh = self.fresh_title_ids
+
+        def user(rng):
+            return rng.choice(data.usernames[1:] or data.usernames)
+
+        def title_payload(rng):
+            return {
+                'name': phrase(rng, 2), 'year': rng.randint(1950, 2022),
+                'genre': rng.sample(data.genre_slugs,
+                                    min(2, len(data.genre_slugs))),
+                'category': rng.choice(data.category_slugs),
+            }
+
+        def review_path(rng):
+            return 'titles/{}/reviews/{}/'.format(
+                *rng.choice(data.review_paths))
+
+        return [
+            Scenario('api-root', 'api-root', 'GET',
+                     lambda i, rng: ('', None, None)),
+            Scenario('titles-list', 'titles-list', 'GET',
+                     lambda i, rng: (
+                         f'titles/?limit=10&offset={rng.randrange(100)}',
+                         None, None)),
+            Scenario('titles-list-filter', 'titles-list', 'GET',
+                     lambda i, rng: (
+                         f'titles/?genre={rng.choice(data.genre_slugs)}'
+                         f'&category={rng.choice(data.category_slugs)}',
+                         None, None)),
+            Scenario('titles-search', 'titles-list', 'GET',
+                     lambda i, rng: (
+                         f'titles/?search={phrase(rng, 1)}', None, None)),
+            Scenario('titles-detail', 'titles-detail', 'GET',
+                     lambda i, rng: (
+                         f'titles/{rng.choice(data.title_ids)}/',
+                         None, None)),
+            Scenario('titles-similar', 'titles-similar', 'GET',
+                     lambda i, rng: (
+                         f'titles/{rng.choice(data.title_ids)}/similar/',
+                         None, None)),
+            Scenario('titles-create', 'titles-list', 'POST',
+                     lambda i, rng: ('titles/', title_payload(rng), admin)),
+            Scenario('titles-bulk', 'titles-bulk', 'POST',
+                     lambda i, rng: (
+                         'titles/bulk/',
+                         [title_payload(rng) for _ in range(10)], admin)),
+            Scenario('categories-list', 'categories-list', 'GET',
+                     lambda i, rng: ('categories/', None, None)),
+            Scenario('categories-delete', 'categories-detail', 'DELETE',
+                     lambda i, rng: (
+                         f'categories/category-tmp-{i}/', None, admin)),
+            Scenario('genres-list', 'genres-list', 'GET',
+                     lambda i, rng: ('genres/', None, None)),
+            Scenario('genres-delete', 'genres-detail', 'DELETE',
+                     lambda i, rng: (f'genres/genre-tmp-{i}/', None, admin)),
+            Scenario('review-list', 'review-list', 'GET',
+                     lambda i, rng: (
+                         f'titles/{rng.choice(data.title_ids)}/reviews/',
+                         None, None)),
+            Scenario('review-detail', 'review-detail', 'GET',
+                     lambda i, rng: (review_path(rng), None, None)),
+            Scenario('review-create', 'review-list', 'POST',
+                     lambda i, rng: (
+                         f'titles/{fresh[i]}/reviews/',
+                         {'text': phrase(rng, 10),
+                          'score': rng.randint(1, 10)}, user(rng))),
+            Scenario('review-bulk', 'review-bulk', 'POST',
+                     lambda i, rng: (
+                         f'titles/{fresh[self.requests + i]}/reviews/bulk/',
+                         [{'author': author, 'text': phrase(rng, 10),
+                           'score': rng.randint(1, 10)}
+                          for author in rng.sample(
+                              data.usernames, min(5, len(data.usernames)))],
+                         admin)),
+            Scenario('comment-list', 'comment-list', 'GET',
+                     lambda i, rng: (
+                         review_path(rng) + 'comments/', None, None)),
+            Scenario('comment-detail', 'comment-detail', 'GET',
+                     lambda i, rng: (
+                         'titles/{}/reviews/{}/comments/{}/'.format(
+                             *rng.choice(data.comment_paths)),
+                         None, None)),
+            Scenario('comment-create', 'comment-list', 'POST',
+                     lambda i, rng: (
+                         review_path(rng) + 'comments/',
+                         {'text': phrase(rng, 6)}, user(rng))),
+            Scenario('comment-bulk', 'comment-bulk', 'POST',
+                     lambda i, rng: (
+                         review_path(rng) + 'comments/bulk/',
+                         [{'author': user(rng), 'text': phrase(rng, 6)}
+                          for _ in range(10)], admin)),
+            Scenario('users-list', 'users-list', 'GET',
+                     lambda i, rng: ('users/', None, admin)),
+            Scenario('users-detail', 'users-detail', 'GET',
+                     lambda i, rng: (f'users/{user(rng)}/', None, admin)),
+            Scenario('users-me', 'users-user-me', 'GET',
+                     lambda i, rng: ('users/me/', None, user(rng))),
+            Scenario('users-me-update', 'users-user-me', 'PATCH',
+                     lambda i, rng: (
+                         'users/me/', {'bio': phrase(rng, 5)}, user(rng))),
+            Scenario('auth-signup', 'auth-signup', 'POST',
+                     lambda i, rng: (
+                         'auth/signup/',
+                         {'username': f'newcomer{i}',
+                          'email': f'newcomer{i}@yamdb.fake'}, None)),
+            Scenario('auth-token', 'auth-token', 'POST',
+                     lambda i, rng: (
+                         'auth/token/',
+                         {'username': user(rng),
+                          'confirmation_code': 'code'}, None)),
+        ]
+
+    def check_coverage(self, scenarios):
+        from api.urls import router_v1
+
+        routes = {url.name for url in router_v1.urls}
+        routes.update(('auth-signup', 'auth-token'))
+        missing = routes - {scenario.route for scenario in scenarios}
+        if missing:
+            print(f'Маршруты без сценариев: {", ".join(sorted(missing))}',
+                  file=sys.stderr)
+
+    def call(self, method, path, body, username):
+        """Выполняет запрос к WSGI-приложению, возвращает код ответа."""
+        payload = b'' if body is None else json.dumps(body).encode()
+        path, _, query_string = f'/api/v1/{path}'.partition('?')
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': quote(query_string, safe='=&'),
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(payload)),
+            'wsgi.input': io.BytesIO(payload),
+        }
+        if username is not None:
+            environ['HTTP_AUTHORIZATION'] = (
+                f'Bearer {self.get_token(username)}')
+        setup_testing_defaults(environ)
+        status = []
+        chunks = self.application(
+            environ, lambda line, headers, exc_info=None: status.append(line))
+        try:
+            for _ in chunks:
+                pass
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+        return int(status[0].split()[0])
+
+    def worker(self, tasks, results):
+        from django.db import connection
+
+        queries = []
+
+        def count(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            while True:
+                try:
+                    scenario, number, rng = tasks.get_nowait()
+                except queue.Empty:
+                    break
+                path, body, username = scenario.build(number, rng)
+                queries.clear()
+                started = time.perf_counter()
+                status = self.call(scenario.method, path, body, username)
+                results.append(Result(
+                    scenario.name, status,
+                    time.perf_counter() - started, len(queries)))
+        connection.close()
+
+    def record_exception(self, sender, **kwargs):
+        error = sys.exc_info()[1]
+        self.exceptions[f'{type(error).__name__}: {error}'] += 1
+
+    def run(self, concurrency):
+        from django.core.signals import got_request_exception
+
+        got_request_exception.connect(self.record_exception)
+        scenarios = self.scenarios()
+        self.check_coverage(scenarios)
+        rng = random.Random(self.seed)
+        tasks = [
+            (scenario, number, random.Random(rng.random()))
+            for scenario in scenarios for number in range(self.requests)
+        ]
+        rng.shuffle(tasks)
+        # Токены выдаются до замера, чтобы не учитывать их в задержках.
+        for username in self.dataset.usernames:
+            self.get_token(username)
+        task_queue = queue.Queue()
+        for task in tasks:
+            task_queue.put(task)
+        results = []
+        threads = [
+            threading.Thread(target=self.worker, args=(task_queue, results))
+            for _ in range(concurrency)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return scenarios, results, time.perf_counter() - started
+
+
+def summarize(scenarios, results, seconds):
+    by_name = {scenario.name: [] for scenario in scenarios}
+    for result in results:
+        by_name[result.name].append(result)
+    endpoints = {}
+    for scenario in scenarios:
+        items = by_name[scenario.name]
+        timings = sorted(item.seconds * 1000 for item in items)
+        queries = [item.queries for item in items]
+        statuses = Counter(str(item.status) for item in items)
+        endpoints[scenario.name] = {
+            'route': scenario.route,
+            'method': scenario.method,
+            'requests': len(items),
+            'errors': sum(item.status >= 400 for item in items),
+            'statuses': dict(statuses),
+            'throughput': len(items) / seconds,
+            'mean_ms': statistics.mean(timings),
+            'p50_ms': percentile(timings, 0.50),
+            'p95_ms': percentile(timings, 0.95),
+            'p99_ms': percentile(timings, 0.99),
+            'queries_mean': statistics.mean(queries),
+            'queries_max': max(queries),
+        }
+    return {
+        'requests': len(results),
+        'errors': sum(result.status >= 400 for result in results),
+        'seconds': seconds,
+        'throughput': len(results) / seconds,
+        'endpoints': endpoints,
+    }
+
+
+def print_summary(summary, previous=None):
+    print(f'{"эндпоинт":<20} {"rps":>7} {"p50":>8} {"p95":>8} {"p99":>8} '
+          f'{"SQL":>5} {"ошибки":>7}')
+    for name, item in summary['endpoints'].items():
+        line = (f'{name:<20} {item["throughput"]:7.1f} '
+                f'{item["p50_ms"]:8.2f} {item["p95_ms"]:8.2f} '
+                f'{item["p99_ms"]:8.2f} {item["queries_mean"]:5.1f} '
+                f'{item["errors"]:7}')
+        old = (previous or {}).get('endpoints', {}).get(name)
+        if old:
+            change = (item['p95_ms'] / old['p95_ms'] - 1) * 100
+            line += f'   p95 {change:+.0f}%'
+        print(line)
+    print(f'Всего {summary["requests"]} запросов за '
+          f'{summary["seconds"]:.1f} с: {summary["throughput"]:.1f} rps, '
+          f'ошибок {summary["errors"]}')
+    for error, count in summary.get('exceptions', {}).items():
+        print(f'{count:5} × {error}')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--titles', type=int, default=1000)
+    parser.add_argument('--genres', type=int, default=20)
+    parser.add_argument('--categories', type=int, default=5)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--reviews-per-title', type=int, default=5)
+    parser.add_argument('--comments-per-review', type=int, default=2)
+    parser.add_argument(
+        '--requests', type=int, default=50,
+        help='Количество запросов каждого сценария')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='load-results.json')
+    parser.add_argument(
+        '--compare', help='JSON предыдущего прогона для сравнения')
+    options = parser.parse_args()
+
+    setup_django(**{
+        f'THROTTLE_RATE_{scope}': UNLIMITED_RATE for scope in (
+            'ANON', 'USER', 'SIGNUP', 'TOKEN', 'REVIEW_WRITE',
+            'COMMENT_WRITE')
+    })
+    migrate()
+    from django.core.management import call_command
+    from django.core.wsgi import get_wsgi_application
+
+    dataset = seed_dataset(
+        titles=options.titles, genres=options.genres,
+        categories=options.categories, users=options.users,
+        reviews_per_title=options.reviews_per_title,
+        comments_per_review=options.comments_per_review, seed=options.seed)
+    # Похожие произведения рассчитываются заранее, как из cron.
+    call_command('build_similar', stdout=io.StringIO())
+    harness = Harness(
+        get_wsgi_application(), dataset, options.requests, options.seed)
+    scenarios, results, seconds = harness.run(options.concurrency)
+    summary = summarize(scenarios, results, seconds)
+    summary['exceptions'] = dict(harness.exceptions)
+    summary['config'] = {
+        key: value for key, value in vars(options).items()
+        if key not in ('output', 'compare')
+    }
+    summary['finished_at'] = datetime.now(timezone.utc).isoformat()
+
+    previous = None
+    if options.compare:
+        with open(options.compare, encoding='utf-8') as file:
+            previous = json.load(file)
+    print_summary(summary, previous)
+    with open(options.output, 'w', encoding='utf-8') as file:
+        json.dump(summary, file, ensure_ascii=False, indent=2)
+    print(f'Результаты сохранены в {options.output}')
+
+
+if __name__ == '__main__':
+    main()
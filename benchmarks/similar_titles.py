@@ -0,0 +1,52 @@
+"""Расчёт похожих произведений при разных размерах пачки.
+
+    python -m benchmarks.similar_titles [--titles N] [--reviews N]
+
+Строит матрицу оценок из отзывов синтетического набора и считает
+top-10 соседей всех произведений через reviews.similarity, печатает
+время загрузки матрицы и расчёта для каждого --chunk-size.
+"""
+import argparse
+import time
+
+from benchmarks import migrate, setup_django
+from benchmarks.dataset import seed_dataset
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--titles', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--reviews', type=int, default=20,
+                        help='Отзывов на произведение')
+    parser.add_argument('--k', type=int, default=10)
+    options = parser.parse_args()
+    setup_django()
+    migrate()
+
+    from reviews.similarity import RatingMatrix
+
+    seed_dataset(titles=options.titles, users=options.users,
+                 reviews_per_title=options.reviews, comments_per_review=0)
+    for measure in ('cosine', 'adjusted'):
+        started = time.perf_counter()
+        matrix = RatingMatrix.from_reviews(measure)
+        loaded = time.perf_counter() - started
+        print(f'{measure}: матрица {len(matrix.title_ids)} x '
+              f'{len(matrix.column_pointers) - 1}, '
+              f'{len(matrix.row_values)} оценок, {loaded * 1000:.0f} мс')
+        for chunk_size in (64, 256, 1024):
+            started = time.perf_counter()
+            found = sum(
+                len(neighbours)
+                for chunk in matrix.neighbours(
+                    matrix.title_ids, options.k, chunk_size)
+                for _, neighbours in chunk)
+            seconds = time.perf_counter() - started
+            print(f'  chunk-size {chunk_size:<5} {seconds:7.2f} с  '
+                  f'{len(matrix.title_ids) / seconds:8.0f} произв./с  '
+                  f'{found} соседей')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Накладные расходы проверки лимитов запросов.
+
+    python -m benchmarks.throttling [--iterations N] [--processes N]
+
+Измеряет время одной проверки SharedRateThrottle: на одном ключе,
+на разных ключах и при одновременной работе нескольких процессов
+с общим файлом счётчиков, как у воркеров gunicorn.
+"""
+import argparse
+import multiprocessing
+import statistics
+import time
+
+from benchmarks import setup_django
+
+
+def measure(check, iterations):
+    timings = []
+    for number in range(iterations):
+        started = time.perf_counter()
+        check(number)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {
+        'mean': statistics.mean(timings),
+        'p50': timings[len(timings) // 2],
+        'p99': timings[int(len(timings) * 0.99)],
+    }
+
+
+def report(name, result):
+    print(f'{name:<32} ' + '  '.join(
+        f'{key} {value * 1e6:8.1f} мкс' for key, value in result.items()))
+
+
+def worker(iterations):
+    from api.throttling import get_storage
+
+    storage = get_storage()
+    return measure(
+        lambda i: storage.hit(f'shared-{i % 50}', 10 ** 9, 60), iterations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=5000)
+    parser.add_argument('--processes', type=int, default=4)
+    options = parser.parse_args()
+    setup_django()
+
+    from rest_framework.test import APIRequestFactory
+    from rest_framework.views import APIView
+
+    from api.throttling import AnonRateThrottle, get_storage
+
+    storage = get_storage()
+    iterations = options.iterations
+    report('без проверки', measure(lambda i: None, iterations))
+    report('один ключ', measure(
+        lambda i: storage.hit('hot', 10 ** 9, 60), iterations))
+    report('разные ключи', measure(
+        lambda i: storage.hit(f'key-{i}', 10 ** 9, 60), iterations))
+
+    request = APIView().initialize_request(APIRequestFactory().get('/'))
+    request.user  # Аутентификация не входит в замер.
+    AnonRateThrottle.THROTTLE_RATES['anon'] = f'{10 ** 9}/minute'
+    report('AnonRateThrottle', measure(
+        lambda i: AnonRateThrottle().allow_request(request, None),
+        iterations))
+
+    with multiprocessing.Pool(options.processes) as pool:
+        results = pool.map(worker, [iterations] * options.processes)
+    for number, result in enumerate(results):
+        report(f'процесс {number + 1}/{options.processes}', result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Фильтры произведений: запросы с JOIN против фасетного индекса.
+
+    python -m benchmarks.title_filters [--titles N] [--repeat N]
+
+Для нескольких сочетаний фильтров считает число произведений и первую
+страницу id через TitleFilter (COUNT и выборка в базе) и через
+api.facets.TitleIndex (битовые карты и выборка страницы по id),
+печатает время, число SQL-запросов и проверяет совпадение результатов.
+Отдельно меряются построение индекса и числа по фасетам.
+"""
+import argparse
+import time
+
+from benchmarks import migrate, setup_django
+from benchmarks.dataset import seed_dataset
+
+QUERIES = (
+    {'genre': 'genre-1'},
+    {'genre': 'genre-1,genre-2,genre-3'},
+    {'genre': 'genre-1,genre-2', 'genre_mode': 'and'},
+    {'category': 'category-1', 'year_min': '1990', 'year_max': '2000'},
+)
+PAGE_SIZE = 20
+
+
+def measure(run, repeat):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    with CaptureQueriesContext(connection) as queries:
+        result = run()
+    return result, min(timings), len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--titles', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=10)
+    options = parser.parse_args()
+    setup_django()
+    migrate()
+
+    from api.facets import BitmapIds, title_index
+    from api.filters import TitleFilter
+    from reviews.models import Title
+
+    seed_dataset(titles=options.titles, reviews_per_title=0,
+                 comments_per_review=0)
+    titles = Title.objects.visible()
+
+    def filter_in_database(params):
+        queryset = TitleFilter(params, queryset=titles).qs
+        return queryset.count(), list(queryset.order_by('pk').values_list(
+            'pk', flat=True)[:PAGE_SIZE])
+
+    def filter_in_index(params):
+        filterset = TitleFilter(params, queryset=titles)
+        filterset.is_valid()
+        ids = BitmapIds(title_index.select(
+            **filterset.get_index_criteria()))
+        return len(ids), list(titles.filter(
+            pk__in=ids[:PAGE_SIZE]).order_by('pk').values_list(
+            'pk', flat=True))
+
+    _, seconds, queries = measure(title_index.build, 1)
+    print(f'{options.titles} произведений, построение индекса '
+          f'{seconds * 1000:.1f} мс, {queries} SQL')
+    for params in QUERIES:
+        print('  ' + '&'.join(f'{key}={value}'
+                              for key, value in params.items()))
+        expected = baseline = None
+        for name, run in (('TitleFilter', filter_in_database),
+                          ('TitleIndex', filter_in_index)):
+            result, seconds, queries = measure(
+                lambda: run(params), options.repeat)
+            expected = expected or result
+            baseline = baseline or seconds
+            same = 'совпадает' if result == expected else 'ОТЛИЧАЕТСЯ'
+            print(f'    {name:<12} {seconds * 1000:8.2f} мс  '
+                  f'x{baseline / seconds:5.1f}  {queries} SQL, '
+                  f'{result[0]} шт., {same}')
+    _, seconds, _ = measure(
+        lambda: title_index.facets(title_index.titles), options.repeat)
+    print(f'Фасеты по всем произведениям {seconds * 1000:.2f} мс')
+
+
+if __name__ == '__main__':
+    main()
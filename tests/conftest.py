@@ -1,9 +1,46 @@
 import sys
+import tempfile
 from os.path import abspath, dirname, join
 
+import pytest
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from api.facets import title_index
+from api.throttling import get_storage
+
 root_dir = dirname(dirname(abspath(__file__)))
 sys.path.append(root_dir)
 infra_dir_path = join(root_dir, 'infra')
 
+# Тесты с базой данных выполняются на SQLite в памяти, чтобы не требовать
+# запущенного PostgreSQL. Модуль настроек при этом не изменяется.
+settings.DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+    # Отдельная база для тестов чтения с реплик (tests/test_replicas.py),
+    # по умолчанию DATABASE_REPLICAS пуст и запросы в неё не идут.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+}
+connections.__dict__.pop('databases', None)
+connections.__init__(settings.DATABASES)
+settings.THROTTLE_DATABASE = ':memory:'
+settings.METRICS_DIR = tempfile.mkdtemp(prefix='yamdb-metrics-')
+
 pytest_plugins = [
+    'tests.fixtures.fixture_user',
+    'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    get_storage().clear()
+    title_index.version = None
@@ -0,0 +1,53 @@
+import pytest
+
+from reviews.models import Category, Comment, Genre, Review, Title
+
+
+@pytest.fixture
+def categories():
+    return [
+        Category.objects.create(name=f'Категория {i}', slug=f'category-{i}')
+        for i in range(2)
+    ]
+
+
+@pytest.fixture
+def genres():
+    return [
+        Genre.objects.create(name=f'Жанр {i}', slug=f'genre-{i}')
+        for i in range(3)
+    ]
+
+
+@pytest.fixture
+def titles(categories, genres):
+    result = []
+    for i in range(3):
+        title = Title.objects.create(
+            name=f'Произведение {i}', year=2000 + i,
+            description=f'Описание {i}', category=categories[i % 2]
+        )
+        title.genre.set(genres[:i + 1])
+        result.append(title)
+    return result
+
+
+@pytest.fixture
+def reviews(titles, user, moderator):
+    return [
+        Review.objects.create(
+            title=titles[0], author=user, text='Отзыв пользователя', score=4),
+        Review.objects.create(
+            title=titles[0], author=moderator, text='Отзыв модератора',
+            score=9),
+    ]
+
+
+@pytest.fixture
+def comments(reviews, user, moderator):
+    return [
+        Comment.objects.create(
+            review=reviews[0], author=moderator, text='Комментарий'),
+        Comment.objects.create(
+            review=reviews[0], author=user, text='Ответ'),
+    ]
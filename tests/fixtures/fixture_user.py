@@ -0,0 +1,50 @@
+import pytest
+from rest_framework.test import APIClient
+
+from api.authentication import get_access_token
+
+
+@pytest.fixture
+def admin(django_user_model):
+    return django_user_model.objects.create_user(
+        username='TestAdmin', email='admin@yamdb.fake', role='admin',
+        bio='admin bio'
+    )
+
+
+@pytest.fixture
+def moderator(django_user_model):
+    return django_user_model.objects.create_user(
+        username='TestModerator', email='moderator@yamdb.fake',
+        role='moderator', bio='moderator bio'
+    )
+
+
+@pytest.fixture
+def user(django_user_model):
+    return django_user_model.objects.create_user(
+        username='TestUser', email='user@yamdb.fake', role='user',
+        bio='user bio'
+    )
+
+
+def _client_for(user):
+    client = APIClient()
+    token = get_access_token(user)
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    return client
+
+
+@pytest.fixture
+def admin_client(admin):
+    return _client_for(admin)
+
+
+@pytest.fixture
+def moderator_client(moderator):
+    return _client_for(moderator)
+
+
+@pytest.fixture
+def user_client(user):
+    return _client_for(user)
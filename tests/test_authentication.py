@@ -0,0 +1,52 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from tests.fixtures.fixture_user import _client_for as client_for
+
+
+@pytest.mark.django_db
+class TestCachedJWTAuthentication:
+
+    def test_no_queries_for_authentication(self, user_client):
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.get('/api/v1/')
+        assert response.status_code == 200
+        assert not context.captured_queries
+
+    def test_role_change_applies_immediately(self, admin_client,
+                                             user_client, user):
+        assert user_client.get('/api/v1/users/').status_code == 403
+        response = admin_client.patch(
+            f'/api/v1/users/{user.username}/', {'role': 'admin'})
+        assert response.status_code == 200
+        assert user_client.get('/api/v1/users/').status_code == 200
+
+    def test_deleted_user_rejected(self, admin_client, user_client, user):
+        response = admin_client.delete(f'/api/v1/users/{user.username}/')
+        assert response.status_code == 204
+        assert user_client.get('/api/v1/users/me/').status_code == 401
+
+    def test_me_returns_full_profile(self, user_client, user):
+        response = user_client.patch('/api/v1/users/me/', {'bio': 'Новое'})
+        assert response.json()['email'] == user.email
+        user.refresh_from_db()
+        assert (user.bio, user.email) == ('Новое', 'user@yamdb.fake')
+
+    def test_claims_rejected_without_stamp(self, admin):
+        # Токен выдан, когда штампа не было в кеше, затем роль изменена
+        # в обход сигналов и штамп снова потерян: claims токена не
+        # принимаются, пользователь читается из базы.
+        cache.clear()
+        client = client_for(admin)
+        type(admin).objects.filter(pk=admin.pk).update(role='user')
+        cache.clear()
+        assert client.get('/api/v1/users/').status_code == 403
+
+    def test_inactive_user_rejected(self, user):
+        cache.clear()
+        client = client_for(user)
+        type(user).objects.filter(pk=user.pk).update(is_active=False)
+        cache.clear()
+        assert client.get('/api/v1/users/me/').status_code == 401
@@ -0,0 +1,126 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Comment, GenresTitle, Review, Title
+
+
+@pytest.mark.django_db
+class TestBulkCreate:
+
+    def test_titles_created_with_genres(self, admin_client, genres,
+                                        categories):
+        data = [
+            {'name': f'Сборник {i}', 'year': 2000 + i,
+             'genre': [genre.slug for genre in genres[:i + 1]],
+             'category': categories[i % 2].slug}
+            for i in range(3)
+        ]
+        response = admin_client.post(
+            '/api/v1/titles/bulk/', data, format='json')
+        assert response.status_code == 201
+        assert [item['genre'] for item in response.data] == [
+            item['genre'] for item in data]
+        assert Title.objects.count() == 3
+        assert GenresTitle.objects.count() == 6
+
+    def test_large_batch(self, admin_client, genres, categories):
+        data = [
+            {'name': f'Сборник {i}', 'year': 2000,
+             'genre': [genre.slug for genre in genres],
+             'category': categories[0].slug}
+            for i in range(300)
+        ]
+        response = admin_client.post(
+            '/api/v1/titles/bulk/', data, format='json')
+        assert response.status_code == 201
+        assert GenresTitle.objects.count() == 300 * len(genres)
+
+    def test_slugs_resolved_once_per_batch(self, admin_client, genres,
+                                           categories):
+        data = [
+            {'name': f'Сборник {i}', 'year': 2000,
+             'genre': [genre.slug for genre in genres],
+             'category': categories[0].slug}
+            for i in range(10)
+        ]
+        with CaptureQueriesContext(connection) as context:
+            response = admin_client.post(
+                '/api/v1/titles/bulk/', data, format='json')
+        assert response.status_code == 201
+        selects = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('SELECT')
+        ]
+        # Загрузка справочников жанров и категорий, жанры для ответа.
+        assert len(selects) == 3
+
+    def test_errors_reported_per_item(self, admin_client, genres,
+                                      categories):
+        data = [
+            {'name': 'Верно', 'year': 2000, 'genre': [genres[0].slug],
+             'category': categories[0].slug},
+            {'name': 'Неверно', 'year': 2000, 'genre': ['unknown'],
+             'category': categories[0].slug},
+        ]
+        response = admin_client.post(
+            '/api/v1/titles/bulk/', data, format='json')
+        assert response.status_code == 400
+        assert response.data[0] == {}
+        assert 'genre' in response.data[1]
+        assert not Title.objects.exists()
+
+    def test_only_admin_allowed(self, user_client):
+        response = user_client.post(
+            '/api/v1/titles/bulk/', [], format='json')
+        assert response.status_code == 403
+
+    def test_reviews_refresh_rating(self, admin_client, titles, user,
+                                    moderator, admin):
+        url = f'/api/v1/titles/{titles[1].pk}/reviews/bulk/'
+        data = [
+            {'author': user.username, 'text': 'Хорошо', 'score': 8},
+            {'author': moderator.username, 'text': 'Плохо', 'score': 2},
+        ]
+        response = admin_client.post(url, data, format='json')
+        assert response.status_code == 201
+        titles[1].refresh_from_db()
+        assert titles[1].rating == 5
+
+        data = [
+            {'author': admin.username, 'text': 'Снова', 'score': 5},
+            {'author': user.username, 'text': 'Снова', 'score': 5},
+        ]
+        response = admin_client.post(url, data, format='json')
+        assert response.status_code == 400
+        assert response.data[0] == {}
+        assert 'non_field_errors' in response.data[1]
+        assert Review.objects.filter(title=titles[1]).count() == 2
+
+    def test_hidden_author_rejected(self, admin_client, reviews, user):
+        review = reviews[0]
+        user.hide()
+        urls = (
+            f'/api/v1/titles/{review.title_id}/reviews/bulk/',
+            f'/api/v1/titles/{review.title_id}/reviews/'
+            f'{review.pk}/comments/bulk/',
+        )
+        for url in urls:
+            response = admin_client.post(url, [
+                {'author': user.username, 'text': 'Скрыт', 'score': 5},
+            ], format='json')
+            assert response.status_code == 400
+            assert 'author' in response.data[0]
+        assert not Review.objects.filter(text='Скрыт').exists()
+        assert not Comment.objects.filter(text='Скрыт').exists()
+
+    def test_comments_created(self, admin_client, reviews, user):
+        review = reviews[0]
+        url = (f'/api/v1/titles/{review.title_id}/reviews/'
+               f'{review.pk}/comments/bulk/')
+        data = [{'author': user.username, 'text': f'Текст {i}'}
+                for i in range(3)]
+        response = admin_client.post(url, data, format='json')
+        assert response.status_code == 201
+        assert Comment.objects.filter(
+            review=review, author=user, text__startswith='Текст ').count() == 3
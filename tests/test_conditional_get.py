@@ -0,0 +1,61 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Comment
+
+
+@pytest.mark.django_db
+class TestConditionalGet:
+
+    def test_reviews_list_not_modified(self, client, titles, reviews):
+        url = f'/api/v1/titles/{titles[0].pk}/reviews/'
+        response = client.get(url)
+        etag = response['ETag']
+        assert etag.startswith('W/"')
+        assert response.has_header('Last-Modified')
+
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert not response.content
+
+        reviews[1].delete()
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.json()['count'] == 1
+
+    @pytest.mark.parametrize('query', ('count=false', 'cursor='))
+    def test_uncounted_list_skips_count(self, client, titles, reviews,
+                                        query):
+        url = f'/api/v1/titles/{titles[0].pk}/reviews/?{query}'
+        with CaptureQueriesContext(connection) as context:
+            etag = client.get(url)['ETag']
+        assert not any(
+            'COUNT' in query['sql'] for query in context.captured_queries)
+        assert client.get(
+            url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+        # Удаление не меняет Max(updated_at), но меняет версию.
+        reviews[0].delete()
+        assert client.get(
+            url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    def test_comment_detail_not_modified(self, client, titles, comments):
+        comment = comments[0]
+        url = (f'/api/v1/titles/{titles[0].pk}/reviews/'
+               f'{comment.review_id}/comments/{comment.pk}/')
+        last_modified = client.get(url)['Last-Modified']
+        response = client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == 304
+
+        Comment.objects.filter(pk=comment.pk).update(
+            updated_at=comment.updated_at.replace(year=2100))
+        response = client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == 200
+
+    def test_cached_title_not_modified(self, client, titles):
+        url = f'/api/v1/titles/{titles[0].pk}/'
+        etag = client.get(url)['ETag']
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert response['ETag'] == etag
@@ -0,0 +1,113 @@
+import sqlite3
+import threading
+
+import pytest
+from django.db.utils import ConnectionHandler
+
+from api.db import pool as pool_module
+from api.db.pool import ConnectionPool, PoolTimeout, get_pool_stats
+
+
+@pytest.fixture
+def database(tmp_path):
+    return str(tmp_path / 'pool.sqlite3')
+
+
+@pytest.fixture
+def make_pool(database):
+    def make(**options):
+        options = {'size': 2, 'timeout': 0.05, 'max_age': 60,
+                   'check_after': 0, **options}
+        return ConnectionPool(
+            lambda: sqlite3.connect(database, check_same_thread=False),
+            **options)
+    return make
+
+
+@pytest.fixture
+def pooled(database, django_db_blocker):
+    handler = ConnectionHandler({'default': {}, 'pooled': {
+        'ENGINE': 'api.db.sqlite3',
+        'NAME': database,
+        'POOL': {'SIZE': 2},
+    }})
+    with django_db_blocker.unblock():
+        yield handler['pooled']
+        handler['pooled'].close()
+    pool_module._pools.pop('pooled').close()
+
+
+class TestConnectionPool:
+
+    def test_connection_reused(self, make_pool):
+        pool = make_pool()
+        connection = pool.acquire()
+        pool.release(connection)
+        assert pool.acquire() is connection
+        assert pool.stats()['created'] == 1
+        assert pool.stats()['reused'] == 1
+
+    def test_size_limit_and_timeout(self, make_pool):
+        pool = make_pool()
+        connections = [pool.acquire(), pool.acquire()]
+        with pytest.raises(PoolTimeout):
+            pool.acquire()
+        threading.Timer(0.01, pool.release, [connections[0]]).start()
+        assert pool.acquire() is connections[0]
+        stats = pool.stats()
+        assert stats['opened'] == 2
+        assert stats['in_use'] == 2
+        assert stats['timeout'] == 1
+
+    def test_unhealthy_connection_replaced(self, make_pool):
+        pool = make_pool()
+        connection = pool.acquire()
+        pool.release(connection)
+        connection.close()
+        assert pool.acquire() is not connection
+        assert pool.stats()['unhealthy'] == 1
+        assert pool.stats()['opened'] == 1
+
+    def test_old_connection_recycled(self, make_pool):
+        pool = make_pool(max_age=0)
+        connection = pool.acquire()
+        pool.release(connection)
+        assert pool.acquire() is not connection
+        assert pool.stats()['expired'] == 1
+
+    def test_release_rolls_back(self, make_pool):
+        pool = make_pool()
+        connection = pool.acquire()
+        connection.execute('CREATE TABLE item (id INTEGER)')
+        connection.commit()
+        connection.execute('INSERT INTO item VALUES (1)')
+        pool.release(connection)
+        connection = pool.acquire()
+        count = connection.execute('SELECT COUNT(*) FROM item').fetchone()
+        assert count == (0,)
+
+
+class TestPooledBackend:
+
+    def test_close_returns_connection_to_pool(self, pooled):
+        with pooled.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        raw = pooled.connection
+        pooled.close()
+        assert pooled.connection is None
+        with pooled.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        assert pooled.connection is raw
+        stats = get_pool_stats()['pooled']
+        assert stats['created'] == 1
+        assert stats['reused'] == 1
+        assert stats['in_use'] == 1
+
+    def test_stats_in_metrics(self, pooled, client, settings, tmp_path):
+        settings.METRICS_DIR = str(tmp_path)
+        pooled.ensure_connection()
+        text = client.get('/metrics').content.decode()
+        assert ('yamdb_db_pool_connections'
+                '{database="pooled",state="in_use"} 1') in text
+        assert ('yamdb_db_pool_events_total'
+                '{database="pooled",event="created"} 1') in text
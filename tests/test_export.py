@@ -0,0 +1,71 @@
+import json
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.csv_tables import CSV_TABLES
+
+
+def read_streaming(response):
+    return b''.join(response.streaming_content).decode()
+
+
+def table_rows(table):
+    return list(table.model.objects.order_by('pk').values_list(
+        *table.columns))
+
+
+@pytest.mark.django_db
+class TestExport:
+
+    def test_csv_streamed_to_admin_only(self, admin_client, user_client,
+                                        titles):
+        assert user_client.get(
+            '/api/v1/export/titles.csv').status_code == 403
+        assert admin_client.get(
+            '/api/v1/export/titles.xml').status_code == 404
+        assert admin_client.get(
+            '/api/v1/export/secrets.csv').status_code == 404
+
+        with CaptureQueriesContext(connection) as context:
+            response = admin_client.get('/api/v1/export/titles.csv')
+        # Таблица читается только при отдаче тела.
+        assert not context.captured_queries
+        assert response.streaming
+        assert response['Content-Type'] == 'text/csv; charset=utf-8'
+        lines = read_streaming(response).splitlines()
+        assert lines[0] == 'id,name,year,category_id,description'
+        assert lines[1] == (
+            f'{titles[0].pk},Произведение 0,2000,{titles[0].category_id},'
+            'Описание 0')
+        assert len(lines) == len(titles) + 1
+
+    def test_ndjson(self, admin_client, reviews):
+        response = admin_client.get('/api/v1/export/review.ndjson')
+        rows = [
+            json.loads(line)
+            for line in read_streaming(response).splitlines()
+        ]
+        assert [row['id'] for row in rows] == [
+            review.pk for review in reviews]
+        assert rows[0]['text'] == 'Отзыв пользователя'
+        assert rows[0]['pub_date'] == reviews[0].pub_date.isoformat()
+
+    def test_hidden_rows_skipped(self, admin_client, titles, reviews):
+        titles[0].hide()
+        response = admin_client.get('/api/v1/export/review.csv')
+        assert read_streaming(response).splitlines() == [
+            'id,title_id,text,author_id,score,pub_date']
+
+    def test_round_trip_with_load_from_csv(self, tmp_path, comments,
+                                           admin):
+        expected = {table: table_rows(table) for table in CSV_TABLES}
+        call_command('export_data', path=str(tmp_path), chunk_size=1)
+        for table in reversed(CSV_TABLES):
+            table.model.objects.all().delete()
+
+        call_command('load_from_csv', path=str(tmp_path), no_copy=True)
+        for table in CSV_TABLES:
+            assert table_rows(table) == expected[table], table.label
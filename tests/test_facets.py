@@ -0,0 +1,124 @@
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api import facets
+from api.cache import get_version
+from api.facets import BitmapIds, title_index, to_bitmap
+from reviews.models import Title
+from tests.test_load_from_csv import CSV_DATA, write_csv
+
+FILTERS = (
+    ('genre=genre-0', [0, 1, 2]),
+    ('genre=genre-1,genre-2', [1, 2]),
+    ('genre=genre-1,genre-2&genre_mode=and', [2]),
+    ('genre=genre-0,missing&genre_mode=and', []),
+    ('category=category-0&genre=genre-1', [2]),
+    ('category=category-0,category-1&year=2001', [1]),
+    ('year_min=2001&year_max=2002', [1, 2]),
+    ('year_max=2001&genre=genre-2', []),
+)
+
+
+def get_ids(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    return [item['id'] for item in response.json()['results']]
+
+
+def test_bitmap_ids():
+    ids = [3, 8, 9, 64, 1000]
+    sequence = BitmapIds(to_bitmap(ids))
+    assert len(sequence) == 5
+    assert list(sequence) == ids
+    assert sequence[1:3] == [8, 9]
+    assert sequence[3:10] == [64, 1000]
+    assert sequence[5:7] == []
+
+
+@pytest.mark.django_db
+class TestFacetIndex:
+
+    @pytest.mark.parametrize('query, expected', FILTERS)
+    def test_matches_database_filters(self, client, titles, settings,
+                                      query, expected):
+        url = f'/api/v1/titles/?{query}'
+        assert get_ids(client, url) == [titles[i].pk for i in expected]
+        settings.TITLE_FACET_INDEX = False
+        settings.RESPONSE_CACHE_TIMEOUT = 0
+        assert get_ids(client, url) == [titles[i].pk for i in expected]
+
+    def test_page_fetched_by_primary_key(self, client, titles):
+        client.get('/api/v1/titles/?genre=genre-0&limit=1')
+        with CaptureQueriesContext(connection) as context:
+            data = client.get(
+                '/api/v1/titles/?genre=genre-0&limit=1&offset=1').json()
+        assert data['count'] == 3
+        assert [item['id'] for item in data['results']] == [titles[1].pk]
+        # Страница по id и жанры этой страницы.
+        assert len(context.captured_queries) == 2
+        assert 'COUNT' not in context.captured_queries[0]['sql']
+
+    def test_facet_counts(self, client, titles):
+        data = client.get('/api/v1/titles/?genre=genre-1&facets=true').json()
+        assert data['facets'] == {
+            'genre': {'genre-0': 2, 'genre-1': 2, 'genre-2': 1},
+            'category': {'category-0': 1, 'category-1': 1},
+            'year': {'2001': 1, '2002': 1},
+        }
+        # Фильтр не из индекса: выборка из базы, числа по индексу.
+        data = client.get('/api/v1/titles/?name=2&facets=true').json()
+        assert data['facets']['genre'] == {
+            'genre-0': 1, 'genre-1': 1, 'genre-2': 1}
+
+    def test_hidden_titles_skipped(self, client, titles):
+        titles[0].hide()
+        assert get_ids(client, '/api/v1/titles/?genre=genre-0') == [
+            titles[1].pk, titles[2].pk]
+
+    def test_rebuilt_after_max_age(self, client, titles, settings):
+        settings.RESPONSE_CACHE_TIMEOUT = 0
+        assert get_ids(client, '/api/v1/titles/?year=1990') == []
+        # Запись в обход сигналов, как из процесса с другим кешем.
+        Title.objects.filter(pk=titles[0].pk).update(year=1990)
+        assert get_ids(client, '/api/v1/titles/?year=1990') == []
+        settings.TITLE_FACET_INDEX_MAX_AGE = 0
+        assert get_ids(client, '/api/v1/titles/?year=1990') == [
+            titles[0].pk]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_rebuilt_after_load_from_csv(client, tmp_path):
+    assert get_ids(client, '/api/v1/titles/?genre=drama') == []
+    write_csv(tmp_path, CSV_DATA)
+    call_command('load_from_csv', path=str(tmp_path))
+    assert get_ids(client, '/api/v1/titles/?genre=drama') == [1, 2]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_updated_incrementally(admin_client, client, titles, monkeypatch):
+    assert get_ids(client, '/api/v1/titles/?genre=genre-2') == [
+        titles[2].pk]
+    monkeypatch.setattr(
+        facets.TitleIndex, 'build',
+        lambda index: pytest.fail('индекс перестроен'))
+
+    response = admin_client.post('/api/v1/titles/', {
+        'name': 'Новое', 'year': 2010, 'category': 'category-1',
+        'genre': ['genre-2'],
+    })
+    assert response.status_code == 201
+    new_pk = response.json()['id']
+    response = admin_client.patch(
+        f'/api/v1/titles/{titles[2].pk}/', {'genre': ['genre-0']})
+    assert response.status_code == 200
+    assert admin_client.delete(
+        f'/api/v1/titles/{titles[1].pk}/').status_code == 204
+
+    assert title_index.version == get_version(facets.INDEX_RESOURCE)
+    assert get_ids(client, '/api/v1/titles/?genre=genre-2') == [new_pk]
+    assert get_ids(client, '/api/v1/titles/?year_min=2001') == [
+        titles[2].pk, new_pk]
+    assert get_ids(client, '/api/v1/titles/?category=category-1') == [
+        new_pk]
@@ -0,0 +1,161 @@
+import csv
+import io
+from datetime import datetime, timezone
+
+import pytest
+from django.core.management import call_command, CommandError
+
+from reviews.models import (
+    Category, Comment, Genre, GenresTitle, Review, Title,
+)
+
+CSV_DATA = {
+    'users.csv': [
+        ('id', 'username', 'email', 'role', 'bio', 'first_name',
+         'last_name'),
+        ('100', 'bingobongo', 'bingobongo@yamdb.fake', 'user', '', '', ''),
+        ('101', 'capt_obvious', 'capt_obvious@yamdb.fake', 'admin', '', '',
+         ''),
+    ],
+    'category.csv': [('id', 'name', 'slug'), ('1', 'Фильм', 'movie')],
+    'genre.csv': [('id', 'name', 'slug'), ('1', 'Драма', 'drama')],
+    'titles.csv': [
+        ('id', 'name', 'year', 'category'),
+        ('1', 'Побег из Шоушенка', '1994', '1'),
+        ('2', 'Крестный отец', '1972', '1'),
+    ],
+    'genre_title.csv': [
+        ('id', 'title_id', 'genre_id'), ('1', '1', '1'), ('2', '2', '1'),
+    ],
+    'review.csv': [
+        ('id', 'title_id', 'text', 'author', 'score', 'pub_date'),
+        ('1', '1', 'Шедевр', '100', '10', '2019-09-24T21:08:21.567Z'),
+        ('2', '1', 'Неплохо', '101', '7', '2019-09-25T21:08:21.567Z'),
+    ],
+    'comments.csv': [
+        ('id', 'review_id', 'text', 'author', 'pub_date'),
+        ('1', '1', 'Согласен', '101', '2019-09-26T21:08:21.567Z'),
+    ],
+}
+
+
+def write_csv(path, data):
+    for file_name, rows in data.items():
+        with open(path / file_name, 'w', encoding='utf-8', newline='') as f:
+            csv.writer(f).writerows(rows)
+
+
+@pytest.mark.django_db
+class TestLoadFromCsv:
+
+    def test_load(self, tmp_path):
+        write_csv(tmp_path, CSV_DATA)
+        call_command('load_from_csv', path=str(tmp_path), batch_size=1)
+
+        assert GenresTitle.objects.count() == 2
+        assert Comment.objects.get().author.username == 'capt_obvious'
+        title = Title.objects.get(pk=1)
+        assert (title.rating_sum, title.rating_count) == (17, 2)
+        assert Review.objects.get(pk=1).pub_date == datetime(
+            2019, 9, 24, 21, 8, 21, 567000, tzinfo=timezone.utc)
+
+    def test_unknown_foreign_key(self, tmp_path):
+        data = dict(CSV_DATA)
+        data['review.csv'] = CSV_DATA['review.csv'] + [
+            ('3', '42', 'Нет такого', '100', '5', '2019-09-24T21:08:21Z'),
+        ]
+        write_csv(tmp_path, data)
+        with pytest.raises(CommandError, match='title_id=42'):
+            call_command('load_from_csv', path=str(tmp_path))
+        assert not Title.objects.exists()
+
+    def test_sync(self, tmp_path):
+        write_csv(tmp_path, CSV_DATA)
+        call_command('load_from_csv', path=str(tmp_path))
+        output = io.StringIO()
+        call_command(
+            'load_from_csv', path=str(tmp_path), sync=True, stdout=output)
+        assert output.getvalue().count('Done (+0 ~0 -0)') == len(CSV_DATA)
+
+        data = dict(CSV_DATA)
+        data['review.csv'] = [
+            CSV_DATA['review.csv'][0],
+            ('1', '1', 'Шедевр', '100', '4', '2019-09-24T21:08:21.567Z'),
+            ('3', '2', 'Классика', '100', '9', '2019-09-27T10:00:00Z'),
+        ]
+        data['comments.csv'] = CSV_DATA['comments.csv'][:1]
+        write_csv(tmp_path, data)
+        call_command('load_from_csv', path=str(tmp_path), sync=True)
+
+        assert sorted(Review.objects.values_list('id', 'score')) == [
+            (1, 4), (2, 7), (3, 9),
+        ]
+        assert Comment.objects.count() == 1
+        ratings = dict(Title.objects.values_list('id', 'rating_sum'))
+        assert ratings == {1: 11, 2: 9}
+
+    def test_optional_description(self, tmp_path):
+        data = dict(CSV_DATA)
+        data['titles.csv'] = [
+            CSV_DATA['titles.csv'][0] + ('description',),
+            ('1', 'Побег из Шоушенка', '1994', '1', 'Тюремная драма'),
+            ('2', 'Крестный отец', '1972', '1', ''),
+        ]
+        write_csv(tmp_path, data)
+        call_command('load_from_csv', path=str(tmp_path))
+        assert dict(Title.objects.values_list('id', 'description')) == {
+            1: 'Тюремная драма', 2: None,
+        }
+
+        write_csv(tmp_path, CSV_DATA)
+        output = io.StringIO()
+        call_command(
+            'load_from_csv', path=str(tmp_path), sync=True, stdout=output)
+        assert output.getvalue().count('Done (+0 ~0 -0)') == len(CSV_DATA)
+        assert Title.objects.get(pk=1).description == 'Тюремная драма'
+
+        data['titles.csv'] = [('id', 'name', 'year')]
+        write_csv(tmp_path, data)
+        with pytest.raises(CommandError, match='titles.csv'):
+            call_command('load_from_csv', path=str(tmp_path), sync=True)
+
+    def test_sync_prune(self, tmp_path):
+        data = dict(CSV_DATA)
+        data['category.csv'] = CSV_DATA['category.csv'] + [
+            ('2', 'Книга', 'book'),
+        ]
+        data['genre.csv'] = CSV_DATA['genre.csv'] + [
+            ('2', 'Комедия', 'comedy'),
+        ]
+        data['titles.csv'] = [
+            CSV_DATA['titles.csv'][0],
+            ('1', 'Побег из Шоушенка', '1994', '1'),
+            ('2', 'Крестный отец', '1972', '2'),
+            ('3', 'Мастер и Маргарита', '1967', '2'),
+        ]
+        data['genre_title.csv'] = CSV_DATA['genre_title.csv'] + [
+            ('3', '2', '2'), ('4', '3', '2'),
+        ]
+        data['review.csv'] = CSV_DATA['review.csv'] + [
+            ('3', '3', 'Роман', '100', '8', '2019-09-27T10:00:00Z'),
+        ]
+        write_csv(tmp_path, data)
+        call_command('load_from_csv', path=str(tmp_path))
+
+        write_csv(tmp_path, CSV_DATA)
+        call_command('load_from_csv', path=str(tmp_path), sync=True)
+        assert Category.objects.count() == 2
+        assert GenresTitle.objects.count() == 4
+
+        call_command(
+            'load_from_csv', path=str(tmp_path), sync=True, prune=True)
+        assert list(Category.objects.values_list('id', flat=True)) == [1]
+        assert list(Genre.objects.values_list('id', flat=True)) == [1]
+        assert sorted(GenresTitle.objects.values_list('id', flat=True)) == [
+            1, 2,
+        ]
+        assert Title.objects.get(pk=2).category_id == 1
+        hidden = Title.objects.get(pk=3)
+        assert (hidden.is_hidden, hidden.category_id) == (True, None)
+        assert Review.objects.count() == 3
+        assert Comment.objects.count() == 1
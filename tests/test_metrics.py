@@ -0,0 +1,49 @@
+import json
+import os
+
+import pytest
+
+from api.metrics import registry
+
+
+@pytest.fixture(autouse=True)
+def clear_registry(settings, tmp_path):
+    settings.METRICS_DIR = str(tmp_path)
+    registry.clear()
+
+
+@pytest.mark.django_db
+class TestMetrics:
+
+    def test_requests_counted_per_action(self, client, admin_client,
+                                         titles):
+        client.get('/api/v1/titles/')
+        client.get(f'/api/v1/titles/{titles[0].pk}/')
+        admin_client.get('/api/v1/users/me/')
+        text = client.get('/metrics').content.decode()
+        assert ('yamdb_requests_total{view="TitleViewSet.list",'
+                'method="GET",status="200"} 1') in text
+        assert 'view="TitleViewSet.retrieve"' in text
+        assert 'view="UserViewset.user_me"' in text
+        assert ('yamdb_request_duration_seconds_bucket'
+                '{view="TitleViewSet.list",le="+Inf"} 1') in text
+        assert 'yamdb_db_queries_sum{view="TitleViewSet.list"}' in text
+        assert 'yamdb_response_size_bytes_count' in text
+
+    def test_workers_aggregated(self, client, settings):
+        client.get('/api/v1/')
+        labels = [['view', 'APIRootView.get'], ['method', 'GET'],
+                  ['status', '200']]
+        path = os.path.join(settings.METRICS_DIR, 'metrics-1.json')
+        with open(path, 'w') as file:
+            json.dump([['yamdb_requests_total', labels, 4]], file)
+        text = client.get('/metrics').content.decode()
+        assert ('yamdb_requests_total{view="APIRootView.get",'
+                'method="GET",status="200"} 5') in text
+
+    def test_token_required(self, client, settings):
+        settings.METRICS_TOKEN = 'secret'
+        assert client.get('/metrics').status_code == 403
+        response = client.get(
+            '/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        assert response.status_code == 200
@@ -0,0 +1,124 @@
+from datetime import timedelta
+
+import pytest
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+
+from reviews.models import OutgoingEmail
+
+
+class FailingBackend(BaseEmailBackend):
+
+    def send_messages(self, email_messages):
+        raise ConnectionError('SMTP недоступен')
+
+
+class RecordingBackend(BaseEmailBackend):
+    """Запоминает статус писем в базе во время отправки."""
+
+    statuses = []
+
+    def send_messages(self, email_messages):
+        self.statuses.extend(OutgoingEmail.objects.values_list(
+            'status', flat=True))
+        return len(email_messages)
+
+
+class SupersedingBackend(BaseEmailBackend):
+    """Повторная регистрация во время недоступности SMTP."""
+
+    def send_messages(self, email_messages):
+        email = OutgoingEmail.objects.get()
+        OutgoingEmail.objects.create(
+            user_id=email.user_id, recipient=email.recipient,
+            subject=email.subject, body='confirmation_code new')
+        raise ConnectionError('SMTP недоступен')
+
+
+@pytest.mark.django_db
+class TestOutbox:
+
+    def signup(self, client):
+        response = client.post('/api/v1/auth/signup/', {
+            'username': 'newcomer', 'email': 'newcomer@yamdb.fake'})
+        assert response.status_code == 200
+
+    def test_signup_queues_single_email(self, client, django_user_model):
+        self.signup(client)
+        self.signup(client)
+        assert not mail.outbox
+        email = OutgoingEmail.objects.get()
+        code = django_user_model.objects.get(
+            username='newcomer').confirmation_code
+        assert email.body.endswith(code)
+
+        call_command('send_emails')
+        assert len(mail.outbox) == 1
+        assert mail.outbox[0].to == ['newcomer@yamdb.fake']
+        email.refresh_from_db()
+        assert email.status == OutgoingEmail.STATUS_SENT
+
+    @override_settings(
+        EMAIL_BACKEND='tests.test_outbox.FailingBackend',
+        EMAIL_OUTBOX_MAX_ATTEMPTS=2, EMAIL_OUTBOX_RETRY_DELAY=0)
+    def test_failed_email_is_retried(self, client):
+        self.signup(client)
+        call_command('send_emails')
+        email = OutgoingEmail.objects.get()
+        assert email.status == OutgoingEmail.STATUS_FAILED
+        assert email.attempts == 2
+        assert 'SMTP' in email.last_error
+
+    @override_settings(EMAIL_BACKEND='tests.test_outbox.RecordingBackend')
+    def test_claimed_before_sending(self, client):
+        self.signup(client)
+        RecordingBackend.statuses.clear()
+        call_command('send_emails')
+        assert RecordingBackend.statuses == [OutgoingEmail.STATUS_SENDING]
+        assert OutgoingEmail.objects.get().status == OutgoingEmail.STATUS_SENT
+
+    def test_stale_claim_is_resent(self, client):
+        self.signup(client)
+        OutgoingEmail.objects.update(
+            status=OutgoingEmail.STATUS_SENDING,
+            next_attempt_at=timezone.now() + timedelta(minutes=1))
+        call_command('send_emails')
+        assert not mail.outbox
+
+        OutgoingEmail.objects.update(
+            next_attempt_at=timezone.now() - timedelta(seconds=1))
+        call_command('send_emails')
+        assert len(mail.outbox) == 1
+
+    @override_settings(
+        EMAIL_BACKEND='tests.test_outbox.SupersedingBackend',
+        EMAIL_OUTBOX_RETRY_DELAY=60)
+    def test_superseded_email_not_retried(self, client):
+        self.signup(client)
+        call_command('send_emails')
+        old, new = OutgoingEmail.objects.order_by('pk')
+        assert old.status == OutgoingEmail.STATUS_FAILED
+        assert new.status == OutgoingEmail.STATUS_PENDING
+
+    def test_concurrent_signup_email_replaced(self, client, monkeypatch):
+        real_update_or_create = OutgoingEmail.objects.update_or_create
+        raced = []
+
+        def racing_update_or_create(defaults, **kwargs):
+            # Другой запрос успел вставить письмо после проверки.
+            if not raced:
+                raced.append(True)
+                OutgoingEmail.objects.create(**kwargs, **defaults)
+                return OutgoingEmail.objects.create(**kwargs, **defaults)
+            return real_update_or_create(defaults=defaults, **kwargs)
+
+        monkeypatch.setattr(
+            OutgoingEmail.objects, 'update_or_create',
+            racing_update_or_create)
+        self.signup(client)
+        assert raced
+        assert OutgoingEmail.objects.filter(
+            status=OutgoingEmail.STATUS_PENDING).count() == 1
@@ -0,0 +1,128 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api import pagination
+from reviews.models import Comment
+
+
+@pytest.mark.django_db
+class TestCursorPagination:
+
+    def test_cursor_walks_all_comments(self, client, titles, reviews,
+                                       user):
+        review = reviews[0]
+        Comment.objects.bulk_create(
+            Comment(review=review, author=user, text=f'Комментарий {i}')
+            for i in range(7)
+        )
+        url = f'/api/v1/titles/{titles[0].pk}/reviews/{review.pk}/comments/'
+        expected = list(
+            review.comments.order_by('pub_date', 'id')
+            .values_list('id', flat=True)
+        )
+
+        seen = []
+        next_url = f'{url}?cursor=&limit=3'
+        while next_url:
+            response = client.get(next_url)
+            assert response.status_code == 200
+            data = response.json()
+            assert 'count' not in data
+            seen.extend(item['id'] for item in data['results'])
+            next_url = data['next']
+        assert seen == expected
+
+    def test_cursor_keyset_on_equal_dates(self, client, titles, reviews,
+                                          user):
+        review = reviews[0]
+        Comment.objects.bulk_create(
+            Comment(review=review, author=user, text=f'Комментарий {i}')
+            for i in range(7)
+        )
+        review.comments.update(pub_date=review.pub_date)
+        expected = list(
+            review.comments.order_by('id').values_list('id', flat=True))
+        url = f'/api/v1/titles/{titles[0].pk}/reviews/{review.pk}/comments/'
+
+        pages = []
+        next_url = f'{url}?cursor=&limit=3'
+        while next_url:
+            with CaptureQueriesContext(connection) as context:
+                data = client.get(next_url).json()
+            assert not any(
+                'OFFSET' in query['sql'] for query in context.captured_queries)
+            pages.append([item['id'] for item in data['results']])
+            previous_url, next_url = data['previous'], data['next']
+        assert sum(pages, []) == expected
+
+        for page in reversed(pages[:-1]):
+            data = client.get(previous_url).json()
+            assert [item['id'] for item in data['results']] == page
+            previous_url = data['previous']
+        assert previous_url is None
+
+    def test_limit_offset_is_default(self, client, titles, reviews):
+        response = client.get(f'/api/v1/titles/{titles[0].pk}/reviews/')
+        data = response.json()
+        assert data['count'] == 2
+        assert [item['id'] for item in data['results']] == [
+            review.pk for review in reviews
+        ]
+
+
+def count_queries(client, url):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200
+    counts = [
+        query for query in context.captured_queries
+        if '"__count"' in query['sql']
+    ]
+    return response.json(), len(counts)
+
+
+@pytest.mark.django_db
+class TestCachedCount:
+
+    def test_count_cached_per_filter(self, client, titles, genres):
+        url = '/api/v1/titles/?limit=1'
+        data, counts = count_queries(client, url)
+        assert (data['count'], counts) == (3, 1)
+        data, counts = count_queries(client, f'{url}&offset=1')
+        assert (data['count'], counts) == (3, 0)
+        # Фильтр не из фасетного индекса, он считается запросом.
+        data, counts = count_queries(client, f'{url}&name=2')
+        assert (data['count'], counts) == (1, 1)
+        # Фильтры по индексу не делают COUNT вовсе.
+        data, counts = count_queries(
+            client, f'{url}&genre={genres[2].slug}')
+        assert (data['count'], counts) == (1, 0)
+
+    def test_write_invalidates_count(self, client, user_client, titles,
+                                     reviews):
+        url = f'/api/v1/titles/{titles[1].pk}/reviews/'
+        assert client.get(url).json()['count'] == 0
+        user_client.post(url, {'text': 'Отзыв', 'score': 5})
+        assert client.get(url).json()['count'] == 1
+
+    def test_count_opt_out(self, client, titles):
+        data, counts = count_queries(
+            client, '/api/v1/titles/?limit=2&count=false')
+        assert counts == 0
+        assert data['count'] is None
+        assert len(data['results']) == 2
+        assert 'offset=2' in data['next']
+        data, _ = count_queries(
+            client, '/api/v1/titles/?limit=2&offset=2&count=false')
+        assert len(data['results']) == 1
+        assert data['next'] is None
+
+    def test_planner_estimate(self, client, titles, settings, monkeypatch):
+        settings.PAGINATION_ESTIMATE_THRESHOLD = 1000
+        monkeypatch.setattr(
+            pagination, 'estimate_count', lambda queryset: 5000)
+        data = client.get('/api/v1/titles/?limit=2&offset=2').json()
+        assert data['count'] == 5000
+        assert data['count_estimated'] is True
+        assert len(data['results']) == 1
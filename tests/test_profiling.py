@@ -0,0 +1,58 @@
+import json
+
+import pytest
+from rest_framework.test import APIClient
+
+from api import profiling
+
+
+@pytest.fixture
+def records(monkeypatch):
+    logged = []
+    monkeypatch.setattr(
+        profiling.logger, 'info',
+        lambda message: logged.append(json.loads(message)))
+    return logged
+
+
+@pytest.mark.django_db
+def test_disabled_by_default(client, titles):
+    response = client.get('/api/v1/titles/')
+    assert 'Server-Timing' not in response
+
+
+@pytest.mark.django_db
+class TestProfilingMiddleware:
+
+    @pytest.fixture(autouse=True)
+    def enable_profiling(self, settings):
+        settings.PROFILING_ENABLED = True
+
+    def test_server_timing_and_log(self, titles, records):
+        response = APIClient().get('/api/v1/titles/')
+        assert response.status_code == 200
+        timing = response['Server-Timing']
+        for phase in ('db', 'auth', 'serialize', 'view', 'render', 'total'):
+            assert f'{phase};dur=' in timing
+        record, = records
+        assert record['view'] == 'titles-list'
+        assert record['queries'] > 0
+        assert 'profile' not in record
+
+    def test_profile_header_only_for_admin(self, admin, user, titles,
+                                           records):
+        from api.authentication import get_access_token
+
+        for account in (user, admin):
+            client = APIClient()
+            client.credentials(
+                HTTP_AUTHORIZATION=f'Bearer {get_access_token(account)}',
+                HTTP_X_PROFILE='1')
+            client.get('/api/v1/titles/')
+        assert 'profile' not in records[0]
+        assert 'cumulative' in records[1]['profile']
+
+    def test_sample_rate(self, titles, records, settings):
+        settings.PROFILING_SAMPLE_RATE = 1.0
+        APIClient().get('/api/v1/titles/')
+        assert 'profile' in records[0]
@@ -0,0 +1,127 @@
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from reviews.management.commands.purge_hidden import Command
+from reviews.models import Comment, Review, Title
+
+
+def assert_ratings_match_reviews():
+    for title in Title.objects.all():
+        state = title.reviews.filter(author__is_hidden=False).aggregate(
+            total=Sum('score'), count=Count('pk'))
+        assert (title.rating_sum, title.rating_count) == (
+            state['total'] or 0, state['count'])
+
+
+@pytest.mark.django_db
+class TestPurgeHidden:
+
+    def test_deleted_title_hidden_at_once(self, admin_client, client,
+                                          titles, reviews, comments):
+        title = titles[0]
+        url = f'/api/v1/titles/{title.pk}/'
+        assert admin_client.delete(url).status_code == 204
+        assert client.get(url).status_code == 404
+        assert client.get(f'{url}reviews/').status_code == 404
+        assert client.get(
+            f'{url}reviews/{reviews[0].pk}/comments/').status_code == 404
+        assert client.get('/api/v1/titles/').json()['count'] == 2
+        assert Review.objects.filter(title=title).count() == 2
+
+        call_command('purge_hidden', batch_size=1)
+        assert not Title.objects.filter(pk=title.pk).exists()
+        assert not Review.objects.exists()
+        assert not Comment.objects.exists()
+
+    def test_deleted_user_purged_in_batches(self, admin_client, titles,
+                                            reviews, comments, user,
+                                            moderator):
+        Review.objects.create(
+            title=titles[1], author=user, text='Ещё отзыв', score=2)
+        Comment.objects.create(
+            review=reviews[1], author=user, text='Комментарий')
+        response = admin_client.delete(f'/api/v1/users/{user.username}/')
+        assert response.status_code == 204
+        response = admin_client.get(f'/api/v1/users/{user.username}/')
+        assert response.status_code == 404
+
+        command = Command()
+        command.batch_size = 1
+        while command.purge_batch():
+            assert_ratings_match_reviews()
+        assert not type(user).objects.filter(pk=user.pk).exists()
+        assert list(Review.objects.all()) == [reviews[1]]
+        # Удалены комментарии пользователя и все комментарии под его
+        # отзывами.
+        assert not Comment.objects.exists()
+        titles[0].refresh_from_db()
+        assert (titles[0].rating_sum, titles[0].rating_count) == (9, 1)
+
+    def test_cascade_mode(self, admin_client, titles, reviews, settings):
+        settings.BACKGROUND_DELETION = False
+        response = admin_client.delete(f'/api/v1/titles/{titles[0].pk}/')
+        assert response.status_code == 204
+        assert not Title.objects.filter(pk=titles[0].pk).exists()
+        assert not Review.objects.exists()
+
+    def test_deleted_user_hidden_everywhere(self, admin_client, client,
+                                            user_client, titles, reviews,
+                                            comments, user, moderator):
+        response = admin_client.delete(f'/api/v1/users/{user.username}/')
+        assert response.status_code == 204
+        data = {'username': user.username, 'email': user.email}
+        assert client.post('/api/v1/auth/signup/', data).status_code == 400
+        assert client.post('/api/v1/auth/token/', {
+            'username': user.username,
+            'confirmation_code': user.confirmation_code or 'code',
+        }).status_code == 404
+        assert user_client.get('/api/v1/users/me/').status_code == 401
+
+        url = f'/api/v1/titles/{titles[0].pk}/reviews/'
+        assert [item['id'] for item in client.get(url).json()['results']] == [
+            reviews[1].pk]
+        # Комментарии к отзыву удалённого пользователя и его собственные.
+        assert client.get(
+            f'{url}{reviews[0].pk}/comments/').status_code == 404
+        review = Review.objects.create(
+            title=titles[1], author=moderator, text='Отзыв', score=5)
+        Comment.objects.create(review=review, author=user, text='Скрыт')
+        response = client.get(
+            f'/api/v1/titles/{titles[1].pk}/reviews/{review.pk}/comments/')
+        assert response.json()['count'] == 0
+
+    def test_lists_change_when_user_hidden(self, admin_client, client,
+                                           titles, reviews, comments, user):
+        reviews_url = f'/api/v1/titles/{titles[0].pk}/reviews/'
+        comments_url = f'{reviews_url}{reviews[1].pk}/comments/'
+        Comment.objects.create(review=reviews[1], author=user, text='Скрыт')
+        # Last-Modified с точностью до секунды.
+        past = timezone.now() - timedelta(hours=1)
+        for model in (Title, Review, Comment):
+            model.objects.update(updated_at=past)
+        validators = {}
+        for url in (reviews_url, comments_url, '/api/v1/titles/'):
+            response = client.get(url)
+            validators[url] = {
+                'HTTP_IF_NONE_MATCH': response['ETag'],
+                'HTTP_IF_MODIFIED_SINCE': response.get('Last-Modified'),
+            }
+        assert client.get(comments_url).json()['count'] == 1
+
+        response = admin_client.delete(f'/api/v1/users/{user.username}/')
+        assert response.status_code == 204
+        data = client.get(reviews_url).json()
+        assert data['count'] == len(data['results']) == 1
+        assert client.get(comments_url).json()['count'] == 0
+        for url, headers in validators.items():
+            for header, value in headers.items():
+                if value:
+                    response = client.get(url, **{header: value})
+                    assert response.status_code == 200, (url, header)
+        title = client.get(f'/api/v1/titles/{titles[0].pk}/').json()
+        assert title['rating'] == 9
+        assert_ratings_match_reviews()
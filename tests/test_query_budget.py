@@ -0,0 +1,130 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.cache import bump_version
+from api.signals import RESOURCES_BY_MODEL
+from api.urls import router_v1
+from reviews.models import Comment, Review, Title
+
+BULK_SIZE = 12
+ALL_RESOURCES = {
+    resource
+    for resources in RESOURCES_BY_MODEL.values() for resource in resources
+}
+
+# Допустимое количество SQL-запросов на каждый эндпоинт роутера.
+# Для списков бюджет проверяется на маленькой и большой странице.
+QUERY_BUDGETS = {
+    'api-root': ('get', '/api/v1/', 0),
+    'titles-list': ('get', '/api/v1/titles/', 4),
+    'titles-detail': ('get', '/api/v1/titles/{title}/', 3),
+    'titles-similar': ('get', '/api/v1/titles/{title}/similar/', 4),
+    'categories-list': ('get', '/api/v1/categories/', 2),
+    'categories-detail': ('delete', '/api/v1/categories/{category}/', 5),
+    'genres-list': ('get', '/api/v1/genres/', 2),
+    'genres-detail': ('delete', '/api/v1/genres/{genre}/', 5),
+    'review-list': ('get', '/api/v1/titles/{title}/reviews/', 4),
+    'review-detail': (
+        'get', '/api/v1/titles/{title}/reviews/{review}/', 3),
+    'comment-list': (
+        'get', '/api/v1/titles/{title}/reviews/{review}/comments/', 4),
+    'comment-detail': (
+        'get',
+        '/api/v1/titles/{title}/reviews/{review}/comments/{comment}/', 3),
+    'users-list': ('get', '/api/v1/users/', 2),
+    'users-detail': ('get', '/api/v1/users/{username}/', 1),
+    'users-user-me': ('get', '/api/v1/users/me/', 1),
+    # Тестовая SQLite не возвращает id из bulk_create, поэтому пакетные
+    # эндпоинты вставляют строки по одной и бюджет зависит от пакета.
+    'titles-bulk': ('post', '/api/v1/titles/bulk/', 9, [
+        {'name': 'Новое', 'year': 2000, 'genre': ['{genre}'],
+         'category': '{category}'},
+    ] * 2),
+    'review-bulk': ('post', '/api/v1/titles/{title}/reviews/bulk/', 10, [
+        {'author': '{username}', 'text': 'Отзыв', 'score': 5},
+    ]),
+    'comment-bulk': (
+        'post', '/api/v1/titles/{title}/reviews/{review}/comments/bulk/', 7,
+        [{'author': '{username}', 'text': 'Текст'}] * 2),
+}
+
+
+@pytest.fixture
+def catalogue(django_user_model, titles, genres, admin):
+    title = titles[-1]
+    for i in range(BULK_SIZE):
+        extra = Title.objects.create(
+            name=f'Серия {i}', year=1990, category=title.category)
+        extra.genre.set(genres)
+        author = django_user_model.objects.create_user(
+            username=f'reader{i}', email=f'reader{i}@yamdb.fake')
+        review = Review.objects.create(
+            title=title, author=author, text=f'Отзыв {i}', score=i % 10 + 1)
+        Comment.objects.create(review=review, author=author, text='Текст')
+    review = title.reviews.first()
+    for i in range(BULK_SIZE):
+        Comment.objects.create(review=review, author=admin, text=f'Ещё {i}')
+    return {
+        'title': title.pk,
+        'review': review.pk,
+        'comment': review.comments.first().pk,
+        'category': title.category.slug,
+        'genre': genres[0].slug,
+        'username': admin.username,
+    }
+
+
+def fill_placeholders(data, catalogue):
+    if isinstance(data, str):
+        return data.format(**catalogue)
+    if isinstance(data, list):
+        return [fill_placeholders(item, catalogue) for item in data]
+    if isinstance(data, dict):
+        return {
+            key: fill_placeholders(value, catalogue)
+            for key, value in data.items()
+        }
+    return data
+
+
+def count_queries(client, method, url, data=None):
+    with CaptureQueriesContext(connection) as context:
+        response = getattr(client, method)(url, data, format='json')
+    assert response.status_code < 400, (
+        f'Запрос {method.upper()} {url} вернул {response.status_code}'
+    )
+    return len(context.captured_queries)
+
+
+@pytest.mark.django_db
+class TestQueryBudget:
+
+    def test_every_router_endpoint_has_budget(self):
+        names = {url.name for url in router_v1.urls}
+        missing = names - set(QUERY_BUDGETS)
+        assert not missing, (
+            f'Добавьте бюджет запросов для эндпоинтов: {sorted(missing)}'
+        )
+
+    @pytest.mark.parametrize('name', sorted(QUERY_BUDGETS))
+    def test_query_budget(self, name, admin_client, catalogue):
+        method, url, budget, *data = QUERY_BUDGETS[name]
+        url = url.format(**catalogue)
+        if method != 'get':
+            data = fill_placeholders(data[0], catalogue) if data else None
+            queries = count_queries(admin_client, method, url, data)
+        else:
+            queries = count_queries(admin_client, method, f'{url}?limit=1')
+            # Второй запрос тоже считается без закешированного числа
+            # объектов.
+            bump_version(*ALL_RESOURCES)
+            queries_full = count_queries(
+                admin_client, method, f'{url}?limit={BULK_SIZE * 2}')
+            assert queries == queries_full, (
+                f'Количество запросов к {url} зависит от размера страницы: '
+                f'{queries} и {queries_full}'
+            )
+        assert queries <= budget, (
+            f'{method.upper()} {url}: {queries} запросов, бюджет {budget}'
+        )
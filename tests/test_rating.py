@@ -0,0 +1,60 @@
+import pytest
+
+from reviews.models import Review, Title
+
+
+@pytest.mark.django_db
+class TestStoredRating:
+
+    def test_rating_follows_review_changes(self, titles, reviews):
+        title = Title.objects.get(pk=titles[0].pk)
+        assert (title.rating_sum, title.rating_count) == (13, 2)
+        assert title.rating == 6.5
+
+        review = Review.objects.get(pk=reviews[0].pk)
+        review.score = 10
+        review.save()
+        title.refresh_from_db()
+        assert (title.rating_sum, title.rating_count) == (19, 2)
+
+        review.delete()
+        title.refresh_from_db()
+        assert (title.rating_sum, title.rating_count) == (9, 1)
+
+    def test_rating_after_stale_review_save(self, titles, reviews):
+        first = Review.objects.get(pk=reviews[0].pk)
+        second = Review.objects.get(pk=reviews[0].pk)
+        first.score = 5
+        first.save()
+        second.score = 6
+        second.save()
+        title = Title.objects.get(pk=titles[0].pk)
+        assert (title.rating_sum, title.rating_count) == (15, 2)
+
+        second.title = titles[1]
+        second.save()
+        title.refresh_from_db()
+        assert (title.rating_sum, title.rating_count) == (9, 1)
+        assert Title.objects.get(pk=titles[1].pk).rating_sum == 6
+
+    def test_rating_after_cascade_delete(self, titles, reviews, user,
+                                         moderator):
+        moderator.delete()
+        title = Title.objects.get(pk=titles[0].pk)
+        assert (title.rating_sum, title.rating_count) == (4, 1)
+        user.delete()
+        title.refresh_from_db()
+        assert title.rating is None
+
+    def test_refresh_ratings(self, titles, reviews):
+        Title.objects.update(rating_sum=0, rating_count=0)
+        Title.objects.all().refresh_ratings()
+        title = Title.objects.get(pk=titles[0].pk)
+        assert (title.rating_sum, title.rating_count) == (13, 2)
+
+    def test_rating_in_api(self, client, titles, reviews):
+        response = client.get(f'/api/v1/titles/{titles[0].pk}/')
+        assert response.status_code == 200
+        assert response.json()['rating'] == 6
+        response = client.get(f'/api/v1/titles/{titles[1].pk}/')
+        assert response.json()['rating'] is None
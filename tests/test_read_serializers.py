@@ -0,0 +1,38 @@
+import pytest
+
+from api.views import CommentViewSet, ReviewViewSet, TitleViewSet
+from reviews.models import Title
+
+LIST_URLS = (
+    (TitleViewSet, '/api/v1/titles/'),
+    (TitleViewSet, '/api/v1/titles/?genre={genre}&limit=2'),
+    (TitleViewSet, '/api/v1/titles/?search=Произведение'),
+    (ReviewViewSet, '/api/v1/titles/{title}/reviews/'),
+    (ReviewViewSet, '/api/v1/titles/{title}/reviews/?cursor=&limit=1'),
+    (CommentViewSet,
+     '/api/v1/titles/{title}/reviews/{review}/comments/?limit=1&offset=1'),
+)
+
+
+@pytest.fixture
+def catalogue(titles, genres, reviews, comments):
+    # Произведение без категории и жанров, с дробным рейтингом.
+    Title.objects.create(name='Без категории', year=2000)
+    return {
+        'title': reviews[0].title_id,
+        'review': reviews[0].pk,
+        'genre': genres[0].slug,
+    }
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('viewset, url', LIST_URLS)
+def test_output_matches_serializers(viewset, url, client, catalogue,
+                                    monkeypatch):
+    url = url.format(**catalogue)
+    fast = client.get(url)
+    assert fast.status_code == 200
+    monkeypatch.setattr(viewset, 'values_serializer_class', None)
+    monkeypatch.setattr(viewset, 'cache_resource', None, raising=False)
+    slow = client.get(url)
+    assert fast.content == slow.content
@@ -0,0 +1,73 @@
+import datetime
+import decimal
+import io
+import uuid
+
+import pytest
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+
+from api import parsers, renderers
+
+SAMPLE = ReturnList([
+    ReturnDict({
+        'id': 1,
+        'name': 'Сияние и тьма',
+        'rating': 6.5,
+        'price': decimal.Decimal('10.50'),
+        'pub_date': datetime.datetime(
+            2022, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc),
+        'naive': datetime.datetime(2022, 5, 1, 12, 30),
+        'day': datetime.date(2022, 5, 1),
+        'time': datetime.time(12, 30, 15, 123456),
+        'duration': datetime.timedelta(minutes=90),
+        'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'lazy': gettext_lazy('Произведения'),
+        'genre': ('drama', 'comedy'),
+        'empty': None,
+        'text': 'строка\u2028абзац\u2029',
+        1: 'числовой ключ',
+    }, serializer=None),
+], serializer=None)
+
+
+@pytest.fixture(params=['orjson', 'fallback'])
+def backend(request, monkeypatch):
+    if request.param == 'orjson':
+        pytest.importorskip('orjson')
+    else:
+        monkeypatch.setattr(renderers, 'orjson', None)
+        monkeypatch.setattr(parsers, 'orjson', None)
+    return request.param
+
+
+def test_output_matches_drf(backend):
+    expected = JSONRenderer().render(SAMPLE)
+    assert renderers.FastJSONRenderer().render(SAMPLE) == expected
+    indented = 'application/json; indent=2'
+    assert (renderers.FastJSONRenderer().render(SAMPLE, indented)
+            == JSONRenderer().render(SAMPLE, indented))
+
+    data = {'big': 2 ** 70}
+    assert (renderers.FastJSONRenderer().render(data)
+            == JSONRenderer().render(data))
+
+
+def test_parser(backend):
+    parser = parsers.FastJSONParser()
+    body = '{"name": "Сияние", "genre": [1]}'.encode()
+    data = parser.parse(io.BytesIO(body))
+    assert data == {'name': 'Сияние', 'genre': [1]}
+    for body in (b'{"score": NaN}', b'{"score":'):
+        with pytest.raises(ParseError):
+            parser.parse(io.BytesIO(body))
+
+
+@pytest.mark.django_db
+def test_api_uses_fast_renderer(client, titles):
+    response = client.get('/api/v1/titles/')
+    assert isinstance(
+        response.accepted_renderer, renderers.FastJSONRenderer)
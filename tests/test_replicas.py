@@ -0,0 +1,77 @@
+import pytest
+from django.core.cache import cache
+from django.db import connections
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from api.facets import BitmapIds, title_index
+from api.routers import get_pin_key
+
+# Реплика в тестах не получает данные основной базы, поэтому по ответу
+# видно, из какой базы он прочитан.
+pytestmark = pytest.mark.django_db(databases=['default', 'replica'])
+
+
+@pytest.fixture(autouse=True)
+def replicas(settings):
+    settings.DATABASE_REPLICAS = ['replica']
+    settings.REPLICA_PIN_SECONDS = 60
+
+
+def test_safe_methods_read_from_replica(client, titles):
+    with CaptureQueriesContext(connections['replica']) as queries:
+        response = client.get('/api/v1/titles/')
+    assert response.status_code == 200
+    assert response.json()['count'] == 0
+    assert len(queries) > 0
+
+
+def test_without_replicas_reads_from_primary(client, titles, settings):
+    settings.DATABASE_REPLICAS = []
+    assert client.get('/api/v1/titles/').json()['count'] == len(titles)
+
+
+def test_writes_go_to_primary_and_pin_the_client(user_client, client,
+                                                 titles):
+    url = f'/api/v1/titles/{titles[0].pk}/reviews/'
+    with CaptureQueriesContext(connections['replica']) as queries:
+        response = user_client.post(url, {'text': 'Отзыв', 'score': 7})
+    assert response.status_code == 201
+    assert len(queries) == 0
+
+    # Автор сразу видит свой отзыв, другой клиент читает с реплики.
+    assert user_client.get(url).json()['count'] == 1
+    assert client.get(url).status_code == 404
+
+    # Закрепление истекло.
+    cache.delete(get_pin_key(
+        RequestFactory().get(url, **user_client._credentials)))
+    assert user_client.get(url).status_code == 404
+
+
+def test_failed_write_does_not_pin(user_client, titles):
+    url = f'/api/v1/titles/{titles[0].pk}/reviews/'
+    response = user_client.post(url, {'score': 11})
+    assert response.status_code == 400
+    assert user_client.get('/api/v1/titles/').json()['count'] == 0
+
+
+def test_title_index_built_from_primary(client, titles):
+    assert client.get('/api/v1/titles/?genre=genre-0').status_code == 200
+    assert list(BitmapIds(title_index.titles)) == [
+        title.pk for title in titles]
+
+
+def test_replica_reads_not_cached(client, titles, settings):
+    urls = ('/api/v1/titles/', '/api/v1/titles/?name=Произведение')
+    etags = {}
+    for url in urls:
+        response = client.get(url)
+        assert response.json()['count'] == 0
+        etags[url] = response['ETag']
+    # Реплика догнала основную базу, версии ресурсов не менялись.
+    settings.DATABASE_REPLICAS = []
+    for url in urls:
+        response = client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+        assert response.status_code == 200
+        assert response.json()['count'] == len(titles)
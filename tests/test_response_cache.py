@@ -0,0 +1,31 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Genre, Review
+
+
+@pytest.mark.django_db(transaction=True)
+class TestResponseCache:
+
+    def test_title_list_is_cached_until_change(self, client, user_client,
+                                               titles, genres, user):
+        url = f'/api/v1/titles/{titles[0].pk}/'
+        first = client.get(url).json()
+        with CaptureQueriesContext(connection) as context:
+            assert client.get(url).json() == first
+        assert not context.captured_queries
+
+        Review.objects.create(
+            title=titles[0], author=user, text='Отзыв', score=8)
+        assert client.get(url).json()['rating'] == 8
+
+        genres[0].name = 'Новое имя'
+        genres[0].save()
+        response = user_client.get(url)
+        assert response.json()['genre'][0]['name'] == 'Новое имя'
+
+    def test_genre_list_invalidation(self, client, genres):
+        assert client.get('/api/v1/genres/').json()['count'] == 3
+        Genre.objects.create(name='Ещё жанр', slug='one-more')
+        assert client.get('/api/v1/genres/').json()['count'] == 4
@@ -0,0 +1,29 @@
+import pytest
+
+from reviews.models import Title
+
+
+@pytest.mark.django_db
+class TestTitleSearch:
+
+    def test_search_ranks_and_follows_updates(self, client, categories):
+        Title.objects.create(
+            name='Сияние', year=1977, category=categories[0],
+            description='Роман о заброшенном отеле')
+        hotel = Title.objects.create(
+            name='Отель «Гранд Будапешт»', year=2014,
+            category=categories[0], description='Отель и его консьерж')
+
+        response = client.get('/api/v1/titles/', {'search': 'отел'})
+        names = [item['name'] for item in response.json()['results']]
+        assert names == ['Отель «Гранд Будапешт»', 'Сияние']
+
+        hotel.name = 'Гранд Будапешт'
+        hotel.description = ''
+        hotel.save()
+        response = client.get('/api/v1/titles/', {'search': 'отел'})
+        assert response.json()['count'] == 1
+
+        hotel.delete()
+        response = client.get('/api/v1/titles/', {'search': 'будапешт'})
+        assert response.json()['count'] == 0
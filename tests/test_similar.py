@@ -0,0 +1,144 @@
+import math
+import random
+from io import StringIO
+
+import numpy as np
+import pytest
+from django.core.management import call_command
+
+from api.read_serializers import TitleValuesSerializer
+from reviews.models import Review, SimilarTitle, Title
+from reviews.similarity import RatingMatrix
+
+
+def reference_similarity(ratings, measure):
+    """Сходство всех пар произведений простыми циклами."""
+    if measure == 'adjusted':
+        by_user = {}
+        for _, user, score in ratings:
+            by_user.setdefault(user, []).append(score)
+        means = {user: sum(s) / len(s) for user, s in by_user.items()}
+        ratings = [(t, u, s - means[u]) for t, u, s in ratings]
+    vectors = {}
+    for title, user, score in ratings:
+        vectors.setdefault(title, {})[user] = score
+    result = {}
+    for first, a in vectors.items():
+        for second, b in vectors.items():
+            dot = sum(a[user] * b.get(user, 0) for user in a)
+            norm = (math.sqrt(sum(v * v for v in a.values()))
+                    * math.sqrt(sum(v * v for v in b.values())))
+            result[first, second] = dot / norm if norm else 0
+    return result
+
+
+@pytest.mark.parametrize('measure', ('cosine', 'adjusted'))
+def test_vectorized_matches_reference(measure):
+    rng = random.Random(1)
+    ratings = [
+        (title, user, rng.randint(1, 10))
+        for title in range(3, 40, 3) for user in range(10, 18)
+        if rng.random() < 0.4
+    ]
+    matrix = RatingMatrix(*zip(*ratings), measure=measure)
+    block = matrix.similarities(np.arange(len(matrix.title_ids)))
+    expected = reference_similarity(ratings, measure)
+    for i, first in enumerate(matrix.title_ids):
+        for j, second in enumerate(matrix.title_ids):
+            if i != j:
+                assert block[i, j] == pytest.approx(
+                    expected[first, second], abs=1e-9)
+
+    # Пачки по 4 дают тот же top-3, что и полный расчёт.
+    chunks = list(matrix.neighbours(matrix.title_ids, k=3, chunk_size=4))
+    assert len(chunks) == math.ceil(len(matrix.title_ids) / 4)
+    for title, neighbours in (pair for chunk in chunks for pair in chunk):
+        scores = sorted((
+            value for (first, second), value in expected.items()
+            if first == title != second and value > 1e-9
+        ), reverse=True)
+        assert [score for _, score in neighbours] == pytest.approx(
+            scores[:3])
+
+
+@pytest.mark.django_db
+class TestSimilarTitles:
+
+    @pytest.fixture
+    def rated(self, titles, user, moderator, admin):
+        for title, author, score in (
+            (titles[0], user, 5), (titles[0], moderator, 3),
+            (titles[1], user, 5), (titles[1], moderator, 3),
+            (titles[2], admin, 7),
+        ):
+            Review.objects.create(
+                title=title, author=author, text='Отзыв', score=score)
+        return titles
+
+    def test_endpoint_reads_built_table(self, client, rated):
+        url = '/api/v1/titles/{}/similar/'
+        assert client.get(url.format(rated[0].pk)).json() == []
+        call_command('build_similar', measure='cosine', stdout=StringIO())
+
+        data = client.get(url.format(rated[0].pk)).json()
+        assert [item['id'] for item in data] == [rated[1].pk]
+        assert data[0]['similarity'] == 1.0
+        assert data[0]['name'] == rated[1].name
+        assert client.get(url.format(rated[2].pk)).json() == []
+        assert client.get(url.format(999)).status_code == 404
+
+        rated[1].hide()
+        assert client.get(url.format(rated[0].pk)).json() == []
+
+    def test_endpoint_skips_title_removed_meanwhile(self, client, rated,
+                                                    monkeypatch):
+        call_command('build_similar', measure='cosine', stdout=StringIO())
+        get_rows = TitleValuesSerializer.get_rows
+
+        def remove_then_get_rows(serializer, queryset):
+            Title.objects.filter(pk=rated[1].pk).delete()
+            return get_rows(serializer, queryset)
+
+        monkeypatch.setattr(
+            TitleValuesSerializer, 'get_rows', remove_then_get_rows)
+        response = client.get(f'/api/v1/titles/{rated[0].pk}/similar/')
+        assert response.status_code == 200
+        assert response.json() == []
+
+    @pytest.mark.parametrize('measure, updated', (
+        ('cosine', 3), ('adjusted', 4)))
+    def test_refreshes_only_affected_titles(self, rated, user, moderator,
+                                            measure, updated):
+        lonely = Title.objects.create(
+            name='Без общих оценивших', year=2010, category=rated[0].category)
+        Review.objects.create(
+            title=lonely, author=moderator, text='Отзыв', score=6)
+        call_command('build_similar', measure=measure, stdout=StringIO())
+        computed_at = dict(
+            Title.objects.values_list('pk', 'similar_computed_at'))
+        Review.objects.create(
+            title=rated[2], author=user, text='Отзыв', score=5)
+
+        out = StringIO()
+        call_command('build_similar', measure=measure, stdout=out)
+        assert out.getvalue() == f'Updated {updated} titles\n'
+        # Новая оценка меняет сходство с третьим произведением всех,
+        # у кого с ним общий оценивший. lonely связано с ними только
+        # через модератора: его сосед меняется лишь в скорректированном
+        # косинусе, где сдвигается средняя оценка user.
+        recomputed = {
+            pk for pk, value in Title.objects.values_list(
+                'pk', 'similar_computed_at') if value != computed_at[pk]}
+        assert recomputed == {title.pk for title in rated[:3]} | (
+            {lonely.pk} if measure == 'adjusted' else set())
+
+        incremental = list(SimilarTitle.objects.values_list(
+            'title_id', 'similar_id', 'rank', 'score'))
+        call_command(
+            'build_similar', measure=measure, full=True, stdout=StringIO())
+        assert list(SimilarTitle.objects.values_list(
+            'title_id', 'similar_id', 'rank', 'score')) == incremental
+
+        out = StringIO()
+        call_command('build_similar', stdout=out)
+        assert out.getvalue() == 'Nothing to update\n'
@@ -0,0 +1,84 @@
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Genre
+from tests.test_load_from_csv import CSV_DATA, write_csv
+
+
+def create_title(client, genres, category):
+    return client.post('/api/v1/titles/', {
+        'name': 'Новое', 'year': 2000, 'category': category,
+        'genre': genres,
+    }, format='json')
+
+
+@pytest.mark.django_db
+class TestSlugFields:
+
+    def test_query_count_independent_of_genres(
+            self, admin_client, genres, categories):
+        # Первый запрос загружает справочники в кеш процесса.
+        create_title(admin_client, [genres[0].slug], categories[0].slug)
+        counts = []
+        for size in (1, len(genres)):
+            slugs = [genre.slug for genre in genres[:size]]
+            with CaptureQueriesContext(connection) as context:
+                response = create_title(
+                    admin_client, slugs, categories[0].slug)
+            assert response.status_code == 201
+            assert response.data['genre'] == slugs
+            counts.append(len(context.captured_queries))
+        assert counts[0] == counts[1]
+
+    def test_unknown_slugs_listed(self, admin_client, genres, categories):
+        response = create_title(
+            admin_client, [genres[0].slug, 'missing', 'absent'],
+            categories[0].slug)
+        assert response.status_code == 400
+        assert 'missing, absent' in str(response.data['genre'])
+
+        response = create_title(admin_client, [genres[0].slug], 'missing')
+        assert response.status_code == 400
+        assert 'category' in response.data
+
+    def test_cache_sees_new_genre(self, admin_client, genres, categories):
+        assert create_title(
+            admin_client, [genres[0].slug], categories[0].slug
+        ).status_code == 201
+        Genre.objects.create(name='Новый', slug='fresh')
+        response = create_title(
+            admin_client, ['fresh'], categories[0].slug)
+        assert response.status_code == 201
+
+    def test_cache_expires(self, admin_client, genres, categories,
+                           settings):
+        assert create_title(
+            admin_client, [genres[0].slug], categories[0].slug
+        ).status_code == 201
+        # Запись в обход сигналов, как из процесса с другим кешем.
+        Genre.objects.bulk_create([Genre(name='Новый', slug='fresh')])
+        Genre.objects.filter(pk=genres[1].pk).update(slug='renamed')
+        settings.SLUG_TABLE_TIMEOUT = 0
+        assert create_title(
+            admin_client, ['fresh'], categories[0].slug).status_code == 201
+        assert create_title(
+            admin_client, [genres[1].slug], categories[0].slug
+        ).status_code == 400
+
+    def test_cache_sees_loaded_genres(self, admin_client, tmp_path):
+        data = {
+            file_name: rows[:1] for file_name, rows in CSV_DATA.items()}
+        data['category.csv'] = CSV_DATA['category.csv']
+        write_csv(tmp_path, data)
+        call_command('load_from_csv', path=str(tmp_path))
+        assert create_title(
+            admin_client, ['drama'], 'movie').status_code == 400
+
+        data['category.csv'] = CSV_DATA['category.csv'][:1]
+        data['genre.csv'] = CSV_DATA['genre.csv']
+        write_csv(tmp_path, data)
+        call_command('load_from_csv', path=str(tmp_path))
+        assert create_title(
+            admin_client, ['drama'], 'movie').status_code == 201
@@ -0,0 +1,74 @@
+import pytest
+
+from api.throttling import (SignupRateThrottle, SlidingWindowStorage,
+                            WriteRateThrottle)
+
+
+def test_sliding_window_counts_previous_window():
+    storage = SlidingWindowStorage(':memory:')
+    assert storage.hit('key', 2, 60, now=0) == (True, None)
+    assert storage.hit('key', 2, 60, now=1) == (True, None)
+    allowed, wait = storage.hit('key', 2, 60, now=30)
+    assert not allowed
+    assert wait == pytest.approx(30)
+    # В середине следующего окна предыдущее учитывается наполовину.
+    assert storage.hit('key', 2, 60, now=90) == (True, None)
+    allowed, wait = storage.hit('key', 2, 60, now=90)
+    assert not allowed
+    assert storage.hit('other', 2, 60, now=91) == (True, None)
+
+
+def test_rejected_hits_not_written():
+    storage = SlidingWindowStorage(':memory:')
+    assert storage.hit('key', 1, 60, now=0) == (True, None)
+    for _ in range(3):
+        assert not storage.hit('key', 1, 60, now=1)[0]
+    assert list(storage.get_connection().execute(
+        'SELECT window, hits FROM throttle')) == [(0, 1)]
+
+
+def test_write_throttle_without_scope_allows():
+    assert WriteRateThrottle().rate is None
+
+
+@pytest.mark.django_db
+class TestThrottledEndpoints:
+
+    def test_signup_limited_by_ip(self, client, monkeypatch):
+        monkeypatch.setitem(
+            SignupRateThrottle.THROTTLE_RATES, 'signup', '1/minute')
+        data = {'username': 'newcomer', 'email': 'newcomer@yamdb.fake'}
+        assert client.post('/api/v1/auth/signup/', data).status_code == 200
+        response = client.post('/api/v1/auth/signup/', data)
+        assert response.status_code == 429
+        assert int(response['Retry-After']) > 0
+
+    def test_signup_ip_not_spoofed(self, client, monkeypatch):
+        monkeypatch.setitem(
+            SignupRateThrottle.THROTTLE_RATES, 'signup', '1/minute')
+        data = {'username': 'newcomer', 'email': 'newcomer@yamdb.fake'}
+        # nginx дописывает адрес клиента в конец заголовка.
+        for spoofed, status in (('10.0.0.1', 200), ('10.0.0.2', 429)):
+            response = client.post(
+                '/api/v1/auth/signup/', data,
+                HTTP_X_FORWARDED_FOR=f'{spoofed}, 203.0.113.7')
+            assert response.status_code == status
+        response = client.post(
+            '/api/v1/auth/signup/', data,
+            HTTP_X_FORWARDED_FOR='10.0.0.2, 198.51.100.9')
+        assert response.status_code == 200
+
+    def test_review_writes_limited_per_user(
+            self, user_client, moderator_client, titles, monkeypatch):
+        monkeypatch.setitem(
+            WriteRateThrottle.THROTTLE_RATES, 'review_write', '1/minute')
+        data = {'text': 'Отзыв', 'score': 5}
+        url = '/api/v1/titles/{}/reviews/'
+        response = user_client.post(url.format(titles[1].pk), data)
+        assert response.status_code == 201
+        response = user_client.post(url.format(titles[2].pk), data)
+        assert response.status_code == 429
+        response = moderator_client.post(url.format(titles[2].pk), data)
+        assert response.status_code == 201
+        response = user_client.get(url.format(titles[1].pk))
+        assert response.status_code == 200